@@ -0,0 +1,320 @@
+# SAGRA - API HTTP
+# Descrição: Expõe atletas, lesões, cronogramas e relatórios em uma API ASGI
+#            (Starlette), independente da interface Streamlit. As consultas
+#            rodam no pool de threads usando cursores do pool de banco.py.
+#
+# Uso: python api.py --porta 8000
+#      (ou: uvicorn api:app --workers 1)
+# Com a variável SAGRA_API_TOKEN definida, as rotas exigem o cabeçalho
+# "Authorization: Bearer <token>".
+# A API serve um único banco (SAGRA_DB) e não inicia no modo por clube (SAGRA_CLUBES).
+
+import argparse
+import contextlib
+import hmac
+import json
+import os
+from datetime import date, datetime
+
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from banco import obter_banco
+from cadastro import contador_escritas
+from clubes import PASTA_CLUBES
+from listas import buscar_atletas, tipos_lesao, tipos_lesao_registrados
+from protocolo import obter_registro
+from relatorios import (TAMANHO_PAGINA, atletas_por_lesao, atletas_por_periodo, contar_atletas_por_lesao,
+                        contar_atletas_por_periodo, relatorio_atleta)
+from resumo import ler_resumo
+
+# Token exigido pelas rotas (None para API sem autenticação)
+TOKEN_API = os.environ.get('SAGRA_API_TOKEN')
+
+# Maior página aceita nas listagens
+TAMANHO_MAXIMO_PAGINA = 500
+
+
+def _serializar(valor):
+    """Converte para JSON os tipos que o módulo json não conhece"""
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return str(valor)
+
+
+class RespostaJSON(JSONResponse):
+    """Resposta JSON que aceita datas, tipos numpy e DataFrames"""
+
+    def render(self, conteudo):
+        return json.dumps(_registros(conteudo), default=_serializar, ensure_ascii=False).encode('utf-8')
+
+
+def _registros(valor):
+    """Converte DataFrames (também dentro de dicionários) em listas de registros sem NaN/NaT"""
+    if isinstance(valor, pd.DataFrame):
+        valor = valor.copy()
+        for coluna in valor.select_dtypes('datetime').columns:
+            valor[coluna] = valor[coluna].dt.date
+        return valor.astype(object).where(valor.notna(), None).to_dict('records')
+    if isinstance(valor, dict):
+        return {chave: _registros(v) for chave, v in valor.items()}
+    return valor
+
+
+def _consultar(funcao, *args, **kwargs):
+    """
+    Executa uma função de consulta com um cursor do pool, no pool de threads
+    Args:
+        funcao (callable): Função que recebe o cursor como primeiro argumento
+    Returns:
+        Coroutine com o resultado da função
+    """
+    def executar():
+        with obter_banco().cursor() as cur:
+            return funcao(cur, *args, **kwargs)
+    return run_in_threadpool(executar)
+
+
+def _inteiro(requisicao, nome, padrao=None, minimo=None, maximo=None):
+    """Lê um parâmetro inteiro da query string, respondendo 400 se for inválido"""
+    valor = requisicao.query_params.get(nome)
+    if valor in (None, ''):
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise HTTPException(400, f"Parâmetro '{nome}' deve ser inteiro")
+    if (minimo is not None and valor < minimo) or (maximo is not None and valor > maximo):
+        raise HTTPException(400, f"Parâmetro '{nome}' fora do intervalo permitido")
+    return valor
+
+
+def _data(requisicao, nome, obrigatoria=False):
+    """Lê um parâmetro de data (AAAA-MM-DD) da query string, respondendo 400 se for inválido"""
+    valor = requisicao.query_params.get(nome)
+    if valor in (None, ''):
+        if obrigatoria:
+            raise HTTPException(400, f"Parâmetro '{nome}' é obrigatório")
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise HTTPException(400, f"Parâmetro '{nome}' deve estar no formato AAAA-MM-DD")
+
+
+def _pagina(requisicao):
+    """Lê o tamanho da página e a chave de continuação (apos_data, apos_id) da query string"""
+    tamanho = _inteiro(requisicao, 'tamanho', TAMANHO_PAGINA, 1, TAMANHO_MAXIMO_PAGINA)
+    apos_data = _data(requisicao, 'apos_data')
+    apos_id = _inteiro(requisicao, 'apos_id')
+    if (apos_data is None) != (apos_id is None):
+        raise HTTPException(400, "Informe 'apos_data' e 'apos_id' juntos")
+    return tamanho, (apos_data, apos_id) if apos_id is not None else None
+
+
+def _resposta_pagina(pagina, proxima, total):
+    """Monta a resposta de uma listagem paginada"""
+    return RespostaJSON({
+        'total': total,
+        'itens': pagina,
+        'proxima': {'apos_data': proxima[0], 'apos_id': proxima[1]} if proxima else None,
+    })
+
+
+async def saude(requisicao):
+    """Estado do processo: banco, latência das consultas, escritas e fila do escritor"""
+    banco = obter_banco()
+    return RespostaJSON({
+        'somente_leitura': banco.somente_leitura,
+        'banco': banco.metricas.resumo(),
+        'escritas': contador_escritas.resumo(),
+        'escritor': banco.escritor.resumo(),
+    })
+
+
+async def resumo(requisicao):
+    """Métricas do Dashboard"""
+    return RespostaJSON(await _consultar(ler_resumo))
+
+
+async def listar_atletas(requisicao):
+    """Atletas cujo nome começa pelo prefixo informado (?prefixo=&limite=)"""
+    prefixo = requisicao.query_params.get('prefixo', '')
+    limite = _inteiro(requisicao, 'limite', 20, 1, TAMANHO_MAXIMO_PAGINA)
+    atletas = await _consultar(buscar_atletas, prefixo, limite)
+    return RespostaJSON([{'id': id_, 'nome': nome} for nome, id_ in atletas.items()])
+
+
+async def atleta(requisicao):
+    """Relatório de evolução de um atleta"""
+    def consultar(cur, paciente_id):
+        return relatorio_atleta(cur, paciente_id, registro=obter_registro(cur))
+
+    relatorio = await _consultar(consultar, requisicao.path_params['paciente_id'])
+    if relatorio is None:
+        raise HTTPException(404, "Atleta não encontrado")
+    return RespostaJSON(relatorio)
+
+
+def _cronograma(protocolo, data_cirurgia):
+    """Cronograma de uma data de cirurgia em formato serializável"""
+    return [
+        {
+            'fase_id': item['fase'].id,
+            'fase': item['fase'].fase,
+            'data_inicio': item['data_inicio'],
+            'data_fim': item['data_fim'],
+            'duracao': item['fase'].duracao,
+        }
+        for item in protocolo.cronograma(data_cirurgia)
+    ]
+
+
+async def cronograma_atleta(requisicao):
+    """
+    Cronograma do atleta pelo protocolo da lesão mais recente, contado da data de cirurgia
+    gravada ou, sem ela e com lesão sem cirurgia, da data da lesão
+    """
+    def consultar(cur, paciente_id):
+        linha = cur.execute("""
+            SELECT p.data_cirurgia,
+                   (SELECT arg_max({'tipo_lesao': t.nome, 'cirurgico': l.data_cirurgia IS NOT NULL,
+                                    'data_lesao': l.data_lesao},
+                                   (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id))
+                    FROM lesoes l
+                    JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+                    WHERE l.paciente_id = p.id)
+            FROM pacientes p
+            WHERE p.id = ?
+        """, [paciente_id]).fetchone()
+        return linha, obter_registro(cur)
+
+    linha, registro = await _consultar(consultar, requisicao.path_params['paciente_id'])
+    if linha is None:
+        raise HTTPException(404, "Atleta não encontrado")
+    lesao = linha[1] or {}
+    inicio = linha[0] or (lesao.get('data_lesao') if lesao.get('cirurgico') is False else None)
+    if inicio is None:
+        raise HTTPException(404, "Atleta sem data de cirurgia")
+    protocolo = registro.protocolo_para(lesao.get('tipo_lesao'), lesao.get('cirurgico', True))
+    return RespostaJSON({'data_cirurgia': linha[0], 'inicio_tratamento': inicio,
+                         'protocolo': protocolo.nome, 'fases': _cronograma(protocolo, inicio)})
+
+
+async def cronograma(requisicao):
+    """Cronograma para uma data de cirurgia (?data_cirurgia=AAAA-MM-DD&tipo_lesao=&cirurgico=0)"""
+    data_cirurgia = _data(requisicao, 'data_cirurgia', obrigatoria=True)
+    registro = await _consultar(obter_registro)
+    protocolo = registro.protocolo_para(requisicao.query_params.get('tipo_lesao'),
+                                        requisicao.query_params.get('cirurgico') != '0')
+    return RespostaJSON({'data_cirurgia': data_cirurgia, 'protocolo': protocolo.nome,
+                         'fases': _cronograma(protocolo, data_cirurgia)})
+
+
+async def listar_tipos_lesao(requisicao):
+    """Tipos de lesão (?registrados=1 para apenas os que têm lesões)"""
+    funcao = tipos_lesao_registrados if requisicao.query_params.get('registrados') == '1' else tipos_lesao
+    tipos = await _consultar(funcao)
+    return RespostaJSON([{'id': id_, 'nome': nome} for nome, id_ in tipos.items()])
+
+
+async def atletas_lesao(requisicao):
+    """Página dos atletas com um tipo de lesão (?tamanho=&apos_data=&apos_id=)"""
+    tipo_lesao_id = requisicao.path_params['tipo_lesao_id']
+    tamanho, apos = _pagina(requisicao)
+    pagina, proxima = await _consultar(atletas_por_lesao, tipo_lesao_id, apos, tamanho)
+    total = await _consultar(contar_atletas_por_lesao, tipo_lesao_id)
+    return _resposta_pagina(pagina, proxima, total)
+
+
+async def atletas_periodo(requisicao):
+    """Página dos atletas com cirurgia no período (?inicio=&fim=&tamanho=&apos_data=&apos_id=)"""
+    inicio = _data(requisicao, 'inicio', obrigatoria=True)
+    fim = _data(requisicao, 'fim', obrigatoria=True)
+    tamanho, apos = _pagina(requisicao)
+    pagina, proxima = await _consultar(atletas_por_periodo, inicio, fim, apos, tamanho)
+    total = await _consultar(contar_atletas_por_periodo, inicio, fim)
+    return _resposta_pagina(pagina, proxima, total)
+
+
+class AutenticacaoToken:
+    """
+    Middleware ASGI que exige o token de SAGRA_API_TOKEN no cabeçalho Authorization
+    """
+
+    def __init__(self, app, token):
+        self.app = app
+        self.esperado = f"Bearer {token}".encode('utf-8')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            cabecalhos = dict(scope['headers'])
+            if not hmac.compare_digest(cabecalhos.get(b'authorization', b''), self.esperado):
+                await RespostaJSON({'erro': "Token inválido ou ausente"}, status_code=401)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+async def _erro_http(requisicao, erro):
+    """Responde erros HTTP em JSON"""
+    return RespostaJSON({'erro': erro.detail}, status_code=erro.status_code)
+
+
+rotas = [
+    Route('/saude', saude),
+    Route('/resumo', resumo),
+    Route('/atletas', listar_atletas),
+    Route('/atletas/{paciente_id:int}', atleta),
+    Route('/atletas/{paciente_id:int}/cronograma', cronograma_atleta),
+    Route('/cronograma', cronograma),
+    Route('/tipos-lesao', listar_tipos_lesao),
+    Route('/tipos-lesao/{tipo_lesao_id:int}/atletas', atletas_lesao),
+    Route('/periodo/atletas', atletas_periodo),
+]
+
+def _verificar_modo_clubes():
+    """Recusa o modo por clube: as rotas leriam o banco único, não o de cada clube"""
+    if PASTA_CLUBES:
+        raise RuntimeError(
+            f"SAGRA_CLUBES={PASTA_CLUBES}: a API serve um único banco (SAGRA_DB) e não "
+            "separa os dados por clube; remova SAGRA_CLUBES para iniciá-la"
+        )
+
+
+@contextlib.asynccontextmanager
+async def ciclo_de_vida(app):
+    """Abre o banco (e aplica migrações pendentes) antes de aceitar requisições"""
+    _verificar_modo_clubes()
+    await run_in_threadpool(obter_banco)
+    yield
+
+
+app = Starlette(routes=rotas, exception_handlers={HTTPException: _erro_http}, lifespan=ciclo_de_vida)
+if TOKEN_API:
+    app = AutenticacaoToken(app, TOKEN_API)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP do SAGRA")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        _verificar_modo_clubes()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    import uvicorn
+
+    # Um único processo: o DuckDB permite apenas um processo com escrita por arquivo
+    uvicorn.run(app, host=args.host, port=args.porta)
+
+
+if __name__ == '__main__':
+    main()
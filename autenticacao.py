@@ -0,0 +1,282 @@
+# SAGRA - Autenticação
+# Descrição: Login da interface sobre o streamlit-authenticator (versão fixada em
+#            requirements.txt). A identidade verificada fica na sessão: as
+#            reexecuções de uma sessão autenticada não recriam o autenticador nem
+#            releem o cookie. As verificações de senha (bcrypt) são limitadas por
+#            usuário dentro de uma janela de tempo e executadas em um pool pequeno
+#            de threads com número máximo de verificações pendentes, para que
+#            tentativas repetidas não ocupem todo o processador. Os contadores
+#            (latência das verificações e tentativas recusadas) são do processo.
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as EsperaEsgotada
+
+import bcrypt
+import streamlit as st
+import streamlit_authenticator as stauth
+
+# Verificações de senha permitidas por usuário dentro da janela (um login correto zera a contagem)
+TENTATIVAS_POR_USUARIO = 5
+JANELA_TENTATIVAS_SEGUNDOS = 300
+
+# Threads que executam o bcrypt e máximo de verificações em execução ou na fila
+TRABALHADORES_SENHA = 2
+VERIFICACOES_PENDENTES = 8
+
+# Tempo máximo de espera pelo resultado de uma verificação (em segundos)
+TEMPO_ESPERA_SENHA = 10
+
+# Número máximo de usuários acompanhados pelo limite de tentativas
+MAXIMO_USUARIOS_LIMITE = 10_000
+
+
+class TentativasExcedidas(Exception):
+    """Verificação recusada: o usuário esgotou as tentativas da janela"""
+
+    def __init__(self, espera):
+        super().__init__(f"Muitas tentativas de login. Tente novamente em {espera:.0f} segundos.")
+        self.espera = espera
+
+
+class VerificacoesOcupadas(Exception):
+    """Verificação recusada: há verificações de senha demais pendentes no processo"""
+
+    def __init__(self):
+        super().__init__("Servidor ocupado verificando outros logins. Tente novamente em instantes.")
+
+
+class MetricasAutenticacao:
+    """
+    Contadores de autenticação, compartilhados por todo o processo
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.verificacoes = 0
+        self.aceitas = 0
+        self.senhas_incorretas = 0
+        self.usuarios_desconhecidos = 0
+        self.limitadas = 0
+        self.sobrecarga = 0
+        self.tempo_verificacoes = 0.0
+        self.maior_verificacao = 0.0
+
+    def registrar_verificacao(self, valida, duracao):
+        with self._lock:
+            self.verificacoes += 1
+            if valida:
+                self.aceitas += 1
+            else:
+                self.senhas_incorretas += 1
+            self.tempo_verificacoes += duracao
+            self.maior_verificacao = max(self.maior_verificacao, duracao)
+
+    def registrar_recusa(self, motivo):
+        """
+        Conta uma tentativa recusada sem verificação de senha
+        Args:
+            motivo (str): 'usuarios_desconhecidos', 'limitadas' ou 'sobrecarga'
+        """
+        with self._lock:
+            setattr(self, motivo, getattr(self, motivo) + 1)
+
+    def resumo(self):
+        """
+        Retorna um retrato dos contadores atuais
+        Returns:
+            dict: Verificações, recusas por motivo e latências das verificações (em milissegundos)
+        """
+        with self._lock:
+            return {
+                'verificacoes': self.verificacoes,
+                'aceitas': self.aceitas,
+                'senhas_incorretas': self.senhas_incorretas,
+                'usuarios_desconhecidos': self.usuarios_desconhecidos,
+                'limitadas': self.limitadas,
+                'sobrecarga': self.sobrecarga,
+                'latencia_media_ms': (self.tempo_verificacoes / self.verificacoes * 1000) if self.verificacoes else 0.0,
+                'latencia_maxima_ms': self.maior_verificacao * 1000,
+            }
+
+
+class LimiteTentativas:
+    """
+    Janela deslizante de verificações de senha por usuário
+    Args:
+        maximo (int): Verificações permitidas por usuário dentro da janela
+        janela (float): Duração da janela (em segundos)
+    """
+
+    def __init__(self, maximo=TENTATIVAS_POR_USUARIO, janela=JANELA_TENTATIVAS_SEGUNDOS):
+        self.maximo = maximo
+        self.janela = janela
+        self._lock = threading.Lock()
+        self._tentativas = {}
+
+    def reservar(self, usuario):
+        """
+        Registra uma verificação do usuário, se ainda houver tentativas na janela
+        Args:
+            usuario (str): Nome de usuário informado
+        Raises:
+            TentativasExcedidas: Se o usuário esgotou as tentativas
+        """
+        agora = time.monotonic()
+        with self._lock:
+            if len(self._tentativas) >= MAXIMO_USUARIOS_LIMITE:
+                self._descartar_expiradas(agora)
+            tentativas = self._tentativas.setdefault(usuario, deque())
+            while tentativas and tentativas[0] <= agora - self.janela:
+                tentativas.popleft()
+            if len(tentativas) >= self.maximo:
+                raise TentativasExcedidas(tentativas[0] + self.janela - agora)
+            tentativas.append(agora)
+
+    def liberar(self, usuario):
+        """Zera as tentativas do usuário (após um login correto)"""
+        with self._lock:
+            self._tentativas.pop(usuario, None)
+
+    def _descartar_expiradas(self, agora):
+        for usuario in [u for u, t in self._tentativas.items() if not t or t[-1] <= agora - self.janela]:
+            del self._tentativas[usuario]
+
+
+# Estado compartilhado pelo processo
+metricas_autenticacao = MetricasAutenticacao()
+limite_tentativas = LimiteTentativas()
+_vagas_verificacao = threading.BoundedSemaphore(VERIFICACOES_PENDENTES)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor():
+    """Cria o pool de verificação de senhas na primeira verificação"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TRABALHADORES_SENHA, thread_name_prefix='senha')
+    return _executor
+
+
+def verificar_senha(usuario, senha, hash_senha):
+    """
+    Verifica uma senha no pool de verificação, respeitando o limite de tentativas
+    Args:
+        usuario (str): Nome de usuário informado
+        senha (str): Senha informada
+        hash_senha (str): Hash bcrypt cadastrado
+    Returns:
+        bool: Se a senha confere
+    Raises:
+        TentativasExcedidas: Se o usuário esgotou as tentativas da janela
+        VerificacoesOcupadas: Se o pool já tem o máximo de verificações pendentes ou a
+                              verificação não terminou dentro de TEMPO_ESPERA_SENHA
+    """
+    try:
+        limite_tentativas.reservar(usuario)
+    except TentativasExcedidas:
+        metricas_autenticacao.registrar_recusa('limitadas')
+        raise
+    if not _vagas_verificacao.acquire(blocking=False):
+        metricas_autenticacao.registrar_recusa('sobrecarga')
+        raise VerificacoesOcupadas()
+
+    inicio = time.perf_counter()
+    futuro = _obter_executor().submit(bcrypt.checkpw, senha.encode(), hash_senha.encode())
+    # A vaga é devolvida quando o bcrypt termina, mesmo que a espera abaixo expire antes
+    futuro.add_done_callback(lambda _: _vagas_verificacao.release())
+    try:
+        valida = futuro.result(TEMPO_ESPERA_SENHA)
+    except EsperaEsgotada:
+        # Pool congestionado: a tentativa é recusada como sobrecarga (e sai da fila, se ainda
+        # não começou; a vaga é devolvida pelo callback acima)
+        futuro.cancel()
+        metricas_autenticacao.registrar_recusa('sobrecarga')
+        raise VerificacoesOcupadas()
+    metricas_autenticacao.registrar_verificacao(valida, time.perf_counter() - inicio)
+    if valida:
+        limite_tentativas.liberar(usuario)
+    return valida
+
+
+class Autenticador(stauth.Authenticate):
+    """
+    Autenticador do streamlit-authenticator com a verificação de senha pelo pool e
+    limite de tentativas. O motivo de uma recusa sem verificação fica em
+    st.session_state['motivo_recusa'].
+    """
+
+    def _check_credentials(self, inplace=True):
+        st.session_state['motivo_recusa'] = None
+        if self.username not in self.credentials['usernames']:
+            metricas_autenticacao.registrar_recusa('usuarios_desconhecidos')
+        return super()._check_credentials(inplace)
+
+    def _check_pw(self):
+        try:
+            return verificar_senha(self.username, self.password,
+                                   self.credentials['usernames'][self.username]['password'])
+        except (TentativasExcedidas, VerificacoesOcupadas) as e:
+            st.session_state['motivo_recusa'] = str(e)
+            return False
+
+
+def _criar_autenticador(config):
+    """Cria o autenticador (renderiza o componente de cookies e inicializa a sessão)"""
+    return Autenticador(
+        credentials=dict(config['credentials']),
+        cookie_name=config['cookie']['name'],
+        key=config['cookie']['key'],
+        cookie_expiry_days=config['cookie']['expiry_days']
+    )
+
+
+def autenticar(config, titulo='Login'):
+    """
+    Retorna a identidade da sessão. Uma sessão já autenticada usa a identidade guardada,
+    sem recriar o autenticador; as demais verificam o cookie e exibem o formulário de login.
+    Args:
+        config (dict): Configuração com 'credentials' e 'cookie' (config.yaml)
+        titulo (str): Título do formulário de login
+    Returns:
+        tuple: (nome, status, usuário), com status True (autenticado), False (recusado)
+               ou None (sem credenciais informadas)
+    """
+    sessao = st.session_state
+    if sessao.get('authentication_status'):
+        return sessao['name'], True, sessao['username']
+    return _criar_autenticador(config).login(titulo)
+
+
+def motivo_recusa():
+    """
+    Mensagem da última recusa sem verificação de senha da sessão
+    Returns:
+        str: Motivo (limite de tentativas ou servidor ocupado), ou None
+    """
+    return st.session_state.get('motivo_recusa')
+
+
+def botao_logout(config, rotulo='Logout'):
+    """
+    Exibe o botão de logout; ao clicar, apaga o cookie e a identidade da sessão
+    Args:
+        config (dict): Configuração com 'credentials' e 'cookie' (config.yaml)
+        rotulo (str): Rótulo do botão
+    """
+    if st.button(rotulo):
+        try:
+            _criar_autenticador(config).cookie_manager.delete(config['cookie']['name'])
+        except KeyError:
+            # O componente de cookies acabou de ser montado e ainda não devolveu os cookies
+            # do navegador; a exclusão já foi enviada a ele mesmo assim
+            pass
+        st.session_state['logout'] = True
+        st.session_state['name'] = None
+        st.session_state['username'] = None
+        st.session_state['authentication_status'] = None
@@ -0,0 +1,260 @@
+# SAGRA - Camada de acesso ao banco de dados
+# Descrição: Mantém uma única conexão DuckDB por processo do servidor, cria o
+#            esquema uma única vez na inicialização e distribui cursores de um
+#            pool compartilhado para as sessões do Streamlit. As escritas feitas
+#            pelos cursores do pool passam pelo escritor único (escritor.py).
+#            No modo por clube (clubes.py), cada arquivo é anexado a uma conexão
+#            central do processo e os cursores usam o catálogo do clube.
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import duckdb
+
+from dados_mock import gerar_dados_mock
+from escritor import EscritorBanco
+from instrumentacao import registrar_consulta, registrar_leitura
+from migracoes import atualizar_esquema
+
+# Caminho padrão do banco (pode ser sobrescrito pela variável de ambiente SAGRA_DB)
+CAMINHO_BANCO = os.environ.get('SAGRA_DB', 'SAGRA.db')
+
+# Número máximo de cursores abertos simultaneamente pelo pool
+TAMANHO_POOL = int(os.environ.get('SAGRA_POOL', '8'))
+
+
+class MetricasBanco:
+    """
+    Contadores de uso do banco de dados, compartilhados por todo o processo
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.tempo_consultas = 0.0
+        self.esperas_pool = 0
+        self.tempo_espera_pool = 0.0
+
+    def registrar_consulta(self, duracao):
+        with self._lock:
+            self.consultas += 1
+            self.tempo_consultas += duracao
+
+    def registrar_espera(self, duracao):
+        with self._lock:
+            self.esperas_pool += 1
+            self.tempo_espera_pool += duracao
+
+    def resumo(self):
+        """
+        Retorna um retrato dos contadores atuais
+        Returns:
+            dict: Contadores e latências médias (em milissegundos)
+        """
+        with self._lock:
+            return {
+                'consultas': self.consultas,
+                'latencia_media_ms': (self.tempo_consultas / self.consultas * 1000) if self.consultas else 0.0,
+                'esperas_pool': self.esperas_pool,
+                'espera_media_pool_ms': (self.tempo_espera_pool / self.esperas_pool * 1000) if self.esperas_pool else 0.0,
+            }
+
+
+class CursorMedido:
+    """
+    Envolve um cursor DuckDB medindo o tempo de cada execução e leitura de resultado
+    (também registradas, com as linhas lidas, no rastro da execução, se houver)
+    Args:
+        cursor: Cursor DuckDB
+        metricas (MetricasBanco): Contadores do processo
+        escritor (EscritorBanco): Escritor usado pelas operações de escrita (None para gravar no próprio cursor)
+        origem (str): Banco de origem do cursor, usado nas chaves dos caches do processo
+    """
+
+    _LEITURAS = ('df', 'fetchdf', 'fetchone', 'fetchall', 'fetchmany', 'arrow', 'fetch_df_chunk', 'fetch_record_batch')
+
+    def __init__(self, cursor, metricas, escritor=None, origem=None):
+        self._cursor = cursor
+        self._metricas = metricas
+        self.escritor = escritor
+        self.origem = origem
+        self._consulta = None
+
+    def execute(self, sql, parametros=None):
+        inicio = time.perf_counter()
+        try:
+            if parametros is None:
+                self._cursor.execute(sql)
+            else:
+                self._cursor.execute(sql, parametros)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self._metricas.registrar_consulta(duracao)
+            self._consulta = registrar_consulta(sql, duracao)
+        return self
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._cursor, nome)
+        if nome not in self._LEITURAS:
+            return atributo
+
+        def leitura_medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = None
+            try:
+                resultado = atributo(*args, **kwargs)
+                return resultado
+            finally:
+                duracao = time.perf_counter() - inicio
+                self._metricas.registrar_consulta(duracao)
+                registrar_leitura(self._consulta, duracao, resultado)
+        return leitura_medida
+
+
+class BancoDados:
+    """
+    Conexão DuckDB única por processo com um pool de cursores
+    Args:
+        caminho (str): Caminho do arquivo do banco
+        tamanho_pool (int): Número máximo de cursores emprestados ao mesmo tempo
+        central: Conexão DuckDB à qual o arquivo é anexado (None abre o arquivo em uma conexão própria)
+        catalogo (str): Nome do catálogo do arquivo anexado à conexão central
+        com_dados_mock (bool): Insere atletas fictícios se o banco estiver vazio
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, tamanho_pool=TAMANHO_POOL, central=None, catalogo=None,
+                 com_dados_mock=True):
+        self.caminho = caminho
+        self.catalogo = catalogo
+        self.metricas = MetricasBanco()
+        self.somente_leitura = False
+        if central is None:
+            try:
+                self._conn = duckdb.connect(caminho)
+            except duckdb.Error as e:
+                if "Conflicting lock" not in str(e):
+                    raise
+                # Outro processo detém o lock de escrita: abre em modo somente leitura
+                self._conn = duckdb.connect(caminho, read_only=True)
+                self.somente_leitura = True
+        else:
+            self._conn = central
+            try:
+                central.execute(f"ATTACH '{caminho}' AS {catalogo}")
+            except duckdb.Error as e:
+                if "Conflicting lock" not in str(e):
+                    raise
+                central.execute(f"ATTACH '{caminho}' AS {catalogo} (READ_ONLY)")
+                self.somente_leitura = True
+
+        if not self.somente_leitura:
+            criar_esquema(self._novo_cursor(), com_dados_mock)
+
+        # Escritor único do banco, com cursor próprio (recusa escritas em modo somente leitura)
+        self.escritor = EscritorBanco(
+            None if self.somente_leitura else CursorMedido(self._novo_cursor(), self.metricas, origem=caminho)
+        )
+
+        self._pool = queue.LifoQueue()
+        self._criados = 0
+        self._tamanho_pool = tamanho_pool
+        self._lock = threading.Lock()
+
+    def _novo_cursor(self):
+        """Cria um cursor DuckDB apontado para o catálogo do banco"""
+        cursor = self._conn.cursor()
+        if self.catalogo:
+            cursor.execute(f"USE {self.catalogo}")
+        return cursor
+
+    def adquirir_cursor(self, timeout=None):
+        """
+        Empresta um cursor do pool, criando um novo se o limite ainda não foi atingido
+        Args:
+            timeout (float): Tempo máximo de espera por um cursor livre (None = indefinido)
+        Returns:
+            CursorMedido: Cursor pronto para uso
+        """
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._criados < self._tamanho_pool:
+                self._criados += 1
+                return CursorMedido(self._novo_cursor(), self.metricas, self.escritor, self.caminho)
+
+        # Pool esgotado: aguarda a devolução de um cursor
+        inicio = time.perf_counter()
+        try:
+            return self._pool.get(timeout=timeout)
+        finally:
+            self.metricas.registrar_espera(time.perf_counter() - inicio)
+
+    def liberar_cursor(self, cursor):
+        """Devolve um cursor ao pool"""
+        self._pool.put(cursor)
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        """Context manager que empresta um cursor e o devolve ao final do bloco"""
+        cur = self.adquirir_cursor(timeout)
+        try:
+            yield cur
+        finally:
+            self.liberar_cursor(cur)
+
+    def fechar(self):
+        """
+        Conclui as escritas pendentes e fecha todos os cursores e a conexão principal
+        (ou desanexa o arquivo da conexão central)
+        """
+        self.escritor.parar()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        if self.catalogo:
+            self._conn.execute(f"DETACH {self.catalogo}")
+        else:
+            self._conn.close()
+
+
+def criar_esquema(conn, com_dados_mock=True):
+    """
+    Cria ou atualiza o esquema do banco e insere os dados iniciais
+    Args:
+        conn: Conexão DuckDB com permissão de escrita
+        com_dados_mock (bool): Insere atletas fictícios se a tabela de pacientes estiver vazia
+    """
+    # Cria o esquema em bancos novos ou aplica as migrações pendentes
+    atualizar_esquema(conn)
+
+    # Insere dados mocados se a tabela de pacientes estiver vazia
+    if com_dados_mock and conn.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0] == 0:
+        gerar_dados_mock(conn)
+
+
+# Instância única do banco para todo o processo
+_banco = None
+_banco_lock = threading.Lock()
+
+
+def obter_banco():
+    """
+    Retorna a instância de BancoDados do processo, abrindo o arquivo e criando o
+    esquema apenas na primeira chamada
+    Returns:
+        BancoDados: Banco compartilhado pelo processo
+    """
+    global _banco
+    if _banco is None:
+        with _banco_lock:
+            if _banco is None:
+                _banco = BancoDados()
+    return _banco
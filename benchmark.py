@@ -0,0 +1,660 @@
+# SAGRA - Benchmarks
+# Descrição: Mede, em bancos sintéticos de vários tamanhos, a latência das
+#            consultas dos relatórios e dos caminhos mais usados do aplicativo
+#            (inicialização, carga, cronograma, Dashboard e relatórios), a frio
+#            e a quente, o tempo até a primeira tela do aplicativo em um processo
+#            novo e compara resultados gravados em JSON.
+#
+# Uso: python benchmark.py indices --tamanhos 10000 100000 1000000
+#      python benchmark.py caminhos --tamanhos 10000 100000 --saida atual.json
+#      python benchmark.py partida --saida partida.json
+#      python benchmark.py comparar base.json atual.json
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import duckdb
+
+from banco import criar_esquema
+from dados_mock import gerar_dados_mock
+from listas import cache_listas
+from protocolo import invalidar_protocolo, obter_protocolo, obter_registro
+from relatorios import (atletas_por_lesao, atletas_por_periodo, contar_atletas_por_lesao,
+                        contar_atletas_por_periodo, relatorio_atleta, ultimos_atletas)
+from resumo import ler_resumo
+
+# Data de referência fixa para que os bancos gerados sejam reprodutíveis
+HOJE_BENCHMARK = date(2025, 3, 16)
+
+# Consultas dos relatórios no esquema original (chaves textuais, sem índices secundários)
+CONSULTAS_ANTES = {
+    'por_atleta': ("""
+        SELECT p.*, l.tipo_lesao, l.data_lesao, l.data_cirurgia, pr.fase as fase_atual, pr.data_inicio, pr.status
+        FROM pacientes p
+        LEFT JOIN lesoes l ON l.paciente_id = p.id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        WHERE p.nome = $nome
+        ORDER BY pr.data_inicio DESC
+        LIMIT 1
+    """),
+    'historico_fases': ("""
+        SELECT fase, data_inicio, data_fim, status,
+               julian(COALESCE(data_fim, CURRENT_DATE)) - julian(data_inicio) as dias_fase
+        FROM progresso
+        WHERE paciente_id = (SELECT id FROM pacientes WHERE nome = $nome)
+        ORDER BY data_inicio
+    """),
+    'detalhes_fase': ("""
+        SELECT * FROM fases_reabilitacao WHERE fase = $fase
+    """),
+    'por_lesao': ("""
+        SELECT p.nome, p.data_cirurgia, pr.status
+        FROM pacientes p
+        JOIN lesoes l ON l.paciente_id = p.id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        WHERE l.tipo_lesao = $tipo
+        ORDER BY p.data_cirurgia DESC
+    """),
+    'por_periodo': ("""
+        SELECT p.nome, l.tipo_lesao, p.data_cirurgia, pr.status
+        FROM pacientes p
+        JOIN lesoes l ON l.paciente_id = p.id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        WHERE p.data_cirurgia BETWEEN $inicio AND $fim
+        ORDER BY p.data_cirurgia
+    """),
+}
+
+# Consultas dos relatórios no esquema atual (chaves inteiras e índices)
+CONSULTAS_DEPOIS = {
+    'por_atleta': ("""
+        SELECT p.*, t.nome as tipo_lesao, l.data_lesao, l.data_cirurgia, f.fase as fase_atual, pr.data_inicio, pr.status
+        FROM pacientes p
+        LEFT JOIN lesoes l ON l.paciente_id = p.id
+        LEFT JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        LEFT JOIN fases_reabilitacao f ON f.id = pr.fase_id
+        WHERE p.id = $paciente_id
+        ORDER BY pr.data_inicio DESC
+        LIMIT 1
+    """),
+    'historico_fases': ("""
+        SELECT f.fase, pr.data_inicio, pr.data_fim, pr.status,
+               julian(COALESCE(pr.data_fim, CURRENT_DATE)) - julian(pr.data_inicio) as dias_fase
+        FROM progresso pr
+        JOIN fases_reabilitacao f ON f.id = pr.fase_id
+        WHERE pr.paciente_id = $paciente_id
+        ORDER BY pr.data_inicio
+    """),
+    'detalhes_fase': ("""
+        SELECT * FROM fases_reabilitacao WHERE id = $fase_id
+    """),
+    'por_lesao': ("""
+        SELECT p.nome, p.data_cirurgia, pr.status
+        FROM lesoes l
+        JOIN pacientes p ON p.id = l.paciente_id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        WHERE l.tipo_lesao_id = $tipo_id
+        ORDER BY p.data_cirurgia DESC
+    """),
+    'por_periodo': ("""
+        SELECT p.nome, t.nome as tipo_lesao, p.data_cirurgia, pr.status
+        FROM pacientes p
+        JOIN lesoes l ON l.paciente_id = p.id
+        JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+        LEFT JOIN progresso pr ON pr.paciente_id = p.id
+        WHERE p.data_cirurgia BETWEEN $inicio AND $fim
+        ORDER BY p.data_cirurgia
+    """),
+}
+
+
+def criar_banco_sintetico(caminho, atletas, semente=42):
+    """
+    Cria um banco no esquema atual com dados fictícios
+    Args:
+        caminho (str): Arquivo do banco
+        atletas (int): Número de atletas
+        semente (int): Semente dos dados
+    Returns:
+        duckdb.DuckDBPyConnection: Conexão aberta com o banco criado
+    """
+    conn = duckdb.connect(caminho)
+    criar_esquema(conn, com_dados_mock=False)
+    gerar_dados_mock(conn, atletas, semente, HOJE_BENCHMARK)
+    return conn
+
+
+def criar_copia_legada(conn, caminho):
+    """
+    Copia os dados de um banco no esquema atual para o esquema original
+    (tipo de lesão e fase como texto, sem índices secundários)
+    Args:
+        conn: Conexão com o banco de origem
+        caminho (str): Arquivo do banco legado a criar
+    """
+    conn.execute(f"ATTACH '{caminho}' AS legado")
+    conn.execute("""
+        CREATE TABLE legado.pacientes (
+            id INTEGER PRIMARY KEY, nome VARCHAR UNIQUE NOT NULL, data_nascimento DATE,
+            posicao VARCHAR, clube VARCHAR, data_cirurgia DATE
+        );
+        INSERT INTO legado.pacientes SELECT * FROM pacientes ORDER BY id;
+
+        CREATE TABLE legado.lesoes (
+            id INTEGER PRIMARY KEY, paciente_id INTEGER NOT NULL, tipo_lesao VARCHAR NOT NULL,
+            data_lesao DATE, data_cirurgia DATE, observacoes TEXT
+        );
+        INSERT INTO legado.lesoes
+        SELECT l.id, l.paciente_id, t.nome, l.data_lesao, l.data_cirurgia, l.observacoes
+        FROM lesoes l JOIN tipos_lesao t ON t.id = l.tipo_lesao_id ORDER BY l.id;
+
+        CREATE TABLE legado.fases_reabilitacao AS SELECT * FROM fases_reabilitacao;
+
+        CREATE TABLE legado.progresso (
+            id INTEGER PRIMARY KEY, paciente_id INTEGER NOT NULL, fase VARCHAR NOT NULL,
+            data_inicio DATE NOT NULL, data_fim DATE, status VARCHAR,
+            UNIQUE(paciente_id, fase, data_inicio)
+        );
+        INSERT INTO legado.progresso
+        SELECT pr.id, pr.paciente_id, f.fase, pr.data_inicio, pr.data_fim, pr.status
+        FROM progresso pr JOIN fases_reabilitacao f ON f.id = pr.fase_id ORDER BY pr.id;
+    """)
+    conn.execute("DETACH legado")
+
+
+def medir(conn, sql, parametros, repeticoes):
+    """
+    Executa uma consulta várias vezes e retorna as latências em milissegundos
+    Args:
+        conn: Conexão DuckDB
+        sql (str): Consulta
+        parametros (dict): Parâmetros nomeados (apenas os usados pela consulta são enviados)
+        repeticoes (int): Número de execuções medidas (após duas de aquecimento)
+    Returns:
+        list: Latência de cada execução (ms)
+    """
+    usados = {chave: valor for chave, valor in parametros.items() if re.search(rf'\${chave}\b', sql)}
+    for _ in range(2):
+        conn.execute(sql, usados).fetchall()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        conn.execute(sql, usados).fetchall()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def benchmark_indices(tamanhos, repeticoes=20, semente=42):
+    """
+    Compara a latência das consultas dos relatórios antes e depois da migração de
+    chaves textuais para chaves inteiras com índices
+    Args:
+        tamanhos (list): Números de atletas dos bancos sintéticos
+        repeticoes (int): Execuções medidas por consulta
+        semente (int): Semente dos dados
+    Returns:
+        list: Um dicionário por (tamanho, consulta) com as medianas antes e depois (ms)
+    """
+    resultados = []
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            conn = criar_banco_sintetico(os.path.join(diretorio, 'atual.db'), tamanho, semente)
+            caminho_legado = os.path.join(diretorio, 'legado.db')
+            criar_copia_legada(conn, caminho_legado)
+
+            # Parâmetros: um atleta com lesão, o tipo de lesão mais comum e um mês de cirurgias
+            paciente_id, nome, fase_id, fase = conn.execute("""
+                SELECT p.id, p.nome, f.id, f.fase
+                FROM pacientes p
+                JOIN progresso pr ON pr.paciente_id = p.id
+                JOIN fases_reabilitacao f ON f.id = pr.fase_id
+                ORDER BY p.id
+                LIMIT 1 OFFSET (SELECT count(*) // 2 FROM progresso)
+            """).fetchone()
+            tipo_id, tipo = conn.execute("""
+                SELECT t.id, t.nome FROM lesoes l JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+                GROUP BY ALL ORDER BY count(*) DESC LIMIT 1
+            """).fetchone()
+            parametros = {
+                'paciente_id': paciente_id, 'nome': nome, 'fase_id': fase_id, 'fase': fase,
+                'tipo_id': tipo_id, 'tipo': tipo,
+                'inicio': HOJE_BENCHMARK - timedelta(days=60), 'fim': HOJE_BENCHMARK - timedelta(days=30),
+            }
+
+            # Os dois bancos são reabertos para serem medidos no mesmo estado (após checkpoint)
+            conn.close()
+            atual = duckdb.connect(os.path.join(diretorio, 'atual.db'), read_only=True)
+            legado = duckdb.connect(caminho_legado, read_only=True)
+            for consulta in CONSULTAS_ANTES:
+                antes = medir(legado, CONSULTAS_ANTES[consulta], parametros, repeticoes)
+                depois = medir(atual, CONSULTAS_DEPOIS[consulta], parametros, repeticoes)
+                resultados.append({
+                    'atletas': tamanho,
+                    'consulta': consulta,
+                    'antes_ms': round(statistics.median(antes), 3),
+                    'depois_ms': round(statistics.median(depois), 3),
+                })
+            legado.close()
+            atual.close()
+    return resultados
+
+
+def percentil(valores, p):
+    """
+    Percentil por interpolação linear
+    Args:
+        valores (list): Amostras
+        p (float): Percentil entre 0 e 100
+    Returns:
+        float: Valor do percentil
+    """
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def pico_memoria_kb(funcao):
+    """
+    Executa uma função uma vez e mede o pico de memória alocada pelo Python e pelo
+    numpy/pandas durante a execução (a memória interna do DuckDB não é incluída)
+    Args:
+        funcao (callable): Função sem argumentos
+    Returns:
+        float: Pico de memória em KB
+    """
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _resultado(tamanho, caminho, modo, tempos, pico_kb):
+    """Monta o registro de resultado de um caminho"""
+    return {
+        'atletas': tamanho,
+        'caminho': caminho,
+        'modo': modo,
+        'amostras': len(tempos),
+        'p50_ms': round(percentil(tempos, 50), 3),
+        'p95_ms': round(percentil(tempos, 95), 3),
+        'pico_python_kb': round(pico_kb, 1),
+    }
+
+
+def _caminhos(parametros):
+    """
+    Caminhos medidos sobre um banco já carregado, cada um como função do cursor.
+    Reproduzem o trabalho de cada tela do aplicativo.
+    """
+    def cronograma(conn):
+        protocolo = obter_protocolo(conn)
+        protocolo.cronograma(parametros['data_cirurgia'])
+        return protocolo.indice_fase((HOJE_BENCHMARK - parametros['data_cirurgia']).days)
+
+    def dashboard(conn):
+        ler_resumo(conn)
+        return ultimos_atletas(conn)
+
+    def por_atleta(conn):
+        return relatorio_atleta(conn, parametros['paciente_id'], hoje=HOJE_BENCHMARK, registro=obter_registro(conn))
+
+    def por_lesao(conn):
+        atletas_por_lesao(conn, parametros['tipo_lesao_id'])
+        return contar_atletas_por_lesao(conn, parametros['tipo_lesao_id'])
+
+    def por_periodo(conn):
+        atletas_por_periodo(conn, parametros['inicio'], parametros['fim'])
+        return contar_atletas_por_periodo(conn, parametros['inicio'], parametros['fim'])
+
+    return {
+        'cronograma': cronograma,
+        'dashboard': dashboard,
+        'por_atleta': por_atleta,
+        'por_lesao': por_lesao,
+        'por_periodo': por_periodo,
+    }
+
+
+def _limpar_caches():
+    """Descarta os caches do processo, para medições a frio"""
+    invalidar_protocolo()
+    cache_listas.invalidar()
+
+
+def medir_inicializacao(repeticoes):
+    """
+    Mede a criação de um banco novo com o esquema e os dados fictícios iniciais
+    (o trabalho feito na primeira abertura do aplicativo)
+    Args:
+        repeticoes (int): Número de bancos criados
+    Returns:
+        dict: Resultado do caminho 'inicializacao'
+    """
+    tempos = []
+    with tempfile.TemporaryDirectory() as diretorio:
+        def inicializar(indice):
+            conn = duckdb.connect(os.path.join(diretorio, f'inicial_{indice}.db'))
+            criar_esquema(conn)
+            conn.close()
+
+        for indice in range(repeticoes):
+            inicio = time.perf_counter()
+            inicializar(indice)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        pico = pico_memoria_kb(lambda: inicializar('memoria'))
+    return _resultado(0, 'inicializacao', 'frio', tempos, pico)
+
+
+def benchmark_caminhos(tamanhos, repeticoes=20, repeticoes_frio=5, semente=42):
+    """
+    Mede os caminhos do aplicativo em bancos sintéticos de cada tamanho.
+    A frio: conexão recém-aberta e caches do processo vazios; a quente: após duas
+    execuções de aquecimento na mesma conexão.
+    Args:
+        tamanhos (list): Números de atletas dos bancos sintéticos
+        repeticoes (int): Execuções medidas a quente por caminho
+        repeticoes_frio (int): Execuções medidas a frio por caminho
+        semente (int): Semente dos dados
+    Returns:
+        list: Um dicionário por (tamanho, caminho, modo) com p50/p95 (ms) e pico de memória (KB)
+    """
+    resultados = [medir_inicializacao(repeticoes_frio)]
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_banco = os.path.join(diretorio, 'carga.db')
+
+            # Carga: criação do esquema e geração dos atletas (uma amostra por tamanho)
+            inicio = time.perf_counter()
+            conn = criar_banco_sintetico(caminho_banco, tamanho, semente)
+            tempo_carga = (time.perf_counter() - inicio) * 1000
+            conn.close()
+            with tempfile.TemporaryDirectory() as outro:
+                pico_carga = pico_memoria_kb(
+                    lambda: criar_banco_sintetico(os.path.join(outro, 'memoria.db'), tamanho, semente).close()
+                ) if tamanho <= 100_000 else 0.0
+            resultados.append(_resultado(tamanho, 'carga', 'frio', [tempo_carga], pico_carga))
+
+            # Parâmetros: um atleta com progresso, o tipo de lesão mais comum e um mês de cirurgias
+            conn = duckdb.connect(caminho_banco, read_only=True)
+            paciente_id, data_cirurgia = conn.execute("""
+                SELECT p.id, p.data_cirurgia
+                FROM pacientes p
+                WHERE EXISTS (SELECT 1 FROM progresso pr WHERE pr.paciente_id = p.id)
+                ORDER BY p.id
+                LIMIT 1 OFFSET (SELECT count(*) // 4 FROM pacientes)
+            """).fetchone()
+            tipo_lesao_id = conn.execute("""
+                SELECT tipo_lesao_id FROM lesoes GROUP BY ALL ORDER BY count(*) DESC LIMIT 1
+            """).fetchone()[0]
+            conn.close()
+            parametros = {
+                'paciente_id': paciente_id,
+                'data_cirurgia': data_cirurgia,
+                'tipo_lesao_id': tipo_lesao_id,
+                'inicio': HOJE_BENCHMARK - timedelta(days=60),
+                'fim': HOJE_BENCHMARK - timedelta(days=30),
+            }
+
+            for nome, funcao in _caminhos(parametros).items():
+                # A frio: cada amostra abre uma conexão nova e esvazia os caches
+                tempos_frio = []
+                for _ in range(repeticoes_frio):
+                    _limpar_caches()
+                    conn = duckdb.connect(caminho_banco, read_only=True)
+                    inicio = time.perf_counter()
+                    funcao(conn)
+                    tempos_frio.append((time.perf_counter() - inicio) * 1000)
+                    conn.close()
+
+                # A quente: mesma conexão, caches preenchidos
+                conn = duckdb.connect(caminho_banco, read_only=True)
+                for _ in range(2):
+                    funcao(conn)
+                tempos_quente = []
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    funcao(conn)
+                    tempos_quente.append((time.perf_counter() - inicio) * 1000)
+                pico = pico_memoria_kb(lambda: funcao(conn))
+                conn.close()
+
+                resultados.append(_resultado(tamanho, nome, 'frio', tempos_frio, pico))
+                resultados.append(_resultado(tamanho, nome, 'quente', tempos_quente, pico))
+    return resultados
+
+
+# Módulos pesados cuja importação é verificada na medição da partida
+MODULOS_PESADOS = ('duckdb', 'pandas', 'numpy', 'bcrypt', 'yaml', 'streamlit_authenticator')
+
+# Script executado em um processo novo para cada amostra da partida: renderiza a tela de
+# login e, em seguida, o Dashboard de uma sessão autenticada com o AppTest do Streamlit
+_SCRIPT_PARTIDA = """
+import json, logging, sys, time
+from streamlit.testing.v1 import AppTest
+logging.disable(logging.CRITICAL)
+aplicativo, reexecucoes, modulos = sys.argv[1], int(sys.argv[2]), sys.argv[3].split(',')
+tempos = {'login': [], 'dashboard': []}
+
+def executar(app, tela):
+    inicio = time.perf_counter()
+    app.run()
+    tempos[tela].append((time.perf_counter() - inicio) * 1000)
+    if app.exception:
+        raise SystemExit(f"{tela}: {app.exception[0].message}")
+
+login = AppTest.from_file(aplicativo, default_timeout=120)
+for _ in range(1 + reexecucoes):
+    executar(login, 'login')
+carregados = [m for m in modulos if m in sys.modules]
+
+dashboard = AppTest.from_file(aplicativo, default_timeout=120)
+dashboard.session_state['authentication_status'] = True
+dashboard.session_state['name'] = 'Benchmark'
+dashboard.session_state['username'] = 'benchmark'
+for _ in range(1 + reexecucoes):
+    executar(dashboard, 'dashboard')
+print(json.dumps({'tempos': tempos, 'modulos_login': carregados}))
+"""
+
+
+def benchmark_partida(amostras=5, reexecucoes=10, atletas=10_000, semente=42):
+    """
+    Mede o tempo até a primeira renderização do aplicativo em processos novos: a tela
+    de login (a frio, primeira execução do script no processo, e a quente, nas
+    reexecuções) e o primeiro Dashboard autenticado, com um banco já criado
+    Args:
+        amostras (int): Número de processos (amostras a frio)
+        reexecucoes (int): Reexecuções de cada tela por processo (amostras a quente)
+        atletas (int): Número de atletas do banco usado pelo Dashboard
+        semente (int): Semente dos dados
+    Returns:
+        dict: 'resultados' (um dicionário por (tela, modo) com p50/p95 em ms) e
+              'modulos_login' (módulos pesados já importados após a tela de login)
+    """
+    diretorio_aplicativo = os.path.dirname(os.path.abspath(__file__))
+    tempos = {('partida_login', 'frio'): [], ('partida_login', 'quente'): [],
+              ('partida_dashboard', 'frio'): [], ('partida_dashboard', 'quente'): []}
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho_banco = os.path.join(diretorio, 'partida.db')
+        criar_banco_sintetico(caminho_banco, atletas, semente).close()
+        for _ in range(amostras):
+            saida = subprocess.run(
+                [sys.executable, '-c', _SCRIPT_PARTIDA, os.path.join(diretorio_aplicativo, 'sagra.py'),
+                 str(reexecucoes), ','.join(MODULOS_PESADOS)],
+                cwd=diretorio_aplicativo, env={**os.environ, 'SAGRA_DB': caminho_banco, 'SAGRA_PERFIL': '0'},
+                capture_output=True, text=True, check=True,
+            ).stdout
+            medicao = json.loads(saida.strip().splitlines()[-1])
+            for tela, amostras_tela in medicao['tempos'].items():
+                tempos[(f'partida_{tela}', 'frio')].append(amostras_tela[0])
+                tempos[(f'partida_{tela}', 'quente')].extend(amostras_tela[1:])
+    return {
+        'resultados': [_resultado(atletas, caminho, modo, valores, 0.0)
+                       for (caminho, modo), valores in tempos.items()],
+        'modulos_login': medicao['modulos_login'],
+    }
+
+
+def ambiente():
+    """
+    Descreve o ambiente da medição, para comparar resultados entre commits
+    Returns:
+        dict: Commit, versões, plataforma, data e pico de memória residente do processo
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'duckdb': duckdb.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        # ru_maxrss é informado em KB no Linux
+        'pico_rss_processo_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def comparar(base, atual, tolerancia=1.2):
+    """
+    Compara dois resultados de 'caminhos' pela mediana (p50)
+    Args:
+        base (dict): Resultado de referência (conteúdo do JSON)
+        atual (dict): Resultado a comparar
+        tolerancia (float): Razão atual/base acima da qual há regressão
+    Returns:
+        list: Um dicionário por caminho presente nos dois resultados, com a razão e se regrediu
+    """
+    chave = lambda r: (r['atletas'], r['caminho'], r['modo'])
+    referencia = {chave(r): r for r in base['resultados']}
+    comparacao = []
+    for r in atual['resultados']:
+        anterior = referencia.get(chave(r))
+        if anterior is None:
+            continue
+        razao = r['p50_ms'] / anterior['p50_ms'] if anterior['p50_ms'] else float('inf')
+        comparacao.append({
+            'atletas': r['atletas'], 'caminho': r['caminho'], 'modo': r['modo'],
+            'base_ms': anterior['p50_ms'], 'atual_ms': r['p50_ms'],
+            'razao': round(razao, 3), 'regressao': razao > tolerancia,
+        })
+    return comparacao
+
+
+def imprimir_tabela(resultados):
+    """Imprime os resultados em formato de tabela"""
+    print(f"{'atletas':>10}  {'consulta':<16} {'antes (ms)':>11} {'depois (ms)':>12} {'ganho':>7}")
+    for r in resultados:
+        ganho = r['antes_ms'] / r['depois_ms'] if r['depois_ms'] else float('inf')
+        print(f"{r['atletas']:>10}  {r['consulta']:<16} {r['antes_ms']:>11.2f} {r['depois_ms']:>12.2f} {ganho:>6.1f}x")
+
+
+def imprimir_caminhos(resultados):
+    """Imprime os resultados dos caminhos em formato de tabela"""
+    print(f"{'atletas':>10}  {'caminho':<18} {'modo':<7} {'p50 (ms)':>10} {'p95 (ms)':>10} {'pico (KB)':>10}")
+    for r in resultados:
+        print(f"{r['atletas']:>10}  {r['caminho']:<18} {r['modo']:<7} {r['p50_ms']:>10.2f} "
+              f"{r['p95_ms']:>10.2f} {r['pico_python_kb']:>10.0f}")
+
+
+def imprimir_comparacao(comparacao):
+    """Imprime a comparação entre dois resultados"""
+    print(f"{'atletas':>10}  {'caminho':<18} {'modo':<7} {'base (ms)':>10} {'atual (ms)':>11} {'razão':>7}")
+    for c in comparacao:
+        marca = '  REGRESSÃO' if c['regressao'] else ''
+        print(f"{c['atletas']:>10}  {c['caminho']:<18} {c['modo']:<7} {c['base_ms']:>10.2f} "
+              f"{c['atual_ms']:>11.2f} {c['razao']:>6.2f}x{marca}")
+
+
+def _gravar_json(caminho, conteudo):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do SAGRA")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    indices = subcomandos.add_parser('indices', help="Consultas dos relatórios antes/depois dos índices")
+    indices.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    indices.add_argument('--repeticoes', type=int, default=20)
+    indices.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+
+    caminhos = subcomandos.add_parser('caminhos', help="Caminhos do aplicativo a frio e a quente")
+    caminhos.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000])
+    caminhos.add_argument('--repeticoes', type=int, default=20, help="Execuções a quente por caminho")
+    caminhos.add_argument('--repeticoes-frio', type=int, default=5, help="Execuções a frio por caminho")
+    caminhos.add_argument('--semente', type=int, default=42)
+    caminhos.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+
+    partida = subcomandos.add_parser('partida', help="Tempo até a primeira tela em um processo novo")
+    partida.add_argument('--amostras', type=int, default=5, help="Processos medidos (amostras a frio)")
+    partida.add_argument('--reexecucoes', type=int, default=10, help="Reexecuções por tela (amostras a quente)")
+    partida.add_argument('--atletas', type=int, default=10_000, help="Atletas do banco do Dashboard")
+    partida.add_argument('--saida', help="Arquivo JSON para gravar os resultados")
+
+    comparacao = subcomandos.add_parser('comparar', help="Compara dois resultados de 'caminhos' ou 'partida'")
+    comparacao.add_argument('base', help="JSON de referência")
+    comparacao.add_argument('atual', help="JSON a comparar")
+    comparacao.add_argument('--tolerancia', type=float, default=1.2,
+                            help="Razão da mediana acima da qual há regressão (padrão: 1.2)")
+
+    args = parser.parse_args()
+    if args.comando == 'indices':
+        resultados = benchmark_indices(args.tamanhos, args.repeticoes)
+        imprimir_tabela(resultados)
+        if args.saida:
+            _gravar_json(args.saida, resultados)
+    elif args.comando == 'caminhos':
+        resultados = benchmark_caminhos(args.tamanhos, args.repeticoes, args.repeticoes_frio, args.semente)
+        imprimir_caminhos(resultados)
+        if args.saida:
+            _gravar_json(args.saida, {
+                'ambiente': ambiente(),
+                'parametros': vars(args),
+                'resultados': resultados,
+            })
+    elif args.comando == 'partida':
+        medicao = benchmark_partida(args.amostras, args.reexecucoes, args.atletas)
+        imprimir_caminhos(medicao['resultados'])
+        print(f"Módulos pesados importados na tela de login: {', '.join(medicao['modulos_login']) or 'nenhum'}")
+        if args.saida:
+            _gravar_json(args.saida, {
+                'ambiente': ambiente(),
+                'parametros': vars(args),
+                'modulos_login': medicao['modulos_login'],
+                'resultados': medicao['resultados'],
+            })
+    elif args.comando == 'comparar':
+        with open(args.base, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        with open(args.atual, encoding='utf-8') as arquivo:
+            atual = json.load(arquivo)
+        resultado = comparar(base, atual, args.tolerancia)
+        imprimir_comparacao(resultado)
+        raise SystemExit(1 if any(c['regressao'] for c in resultado) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# SAGRA - Operações de escrita
+# Descrição: Concentra as gravações feitas pela interface. Cada operação compara o
+#            estado desejado com o que já está gravado e só escreve quando há
+#            diferença, evitando disputar o lock de escrita do DuckDB à toa, e
+#            ajusta o resumo do Dashboard na mesma transação. Com cursores do pool
+#            de banco.py, as gravações são feitas pelo escritor único do processo.
+
+import threading
+
+from coortes import invalidar_coortes
+from escritor import executar_escrita
+from listas import invalidar_atletas, invalidar_lesoes
+from resumo import ajustar_resumo
+from risco import invalidar_risco
+
+
+class ContadorEscritas:
+    """
+    Contadores de escritas emitidas e evitadas pela verificação de alterações
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.emitidas = 0
+        self.evitadas = 0
+
+    def registrar(self, emitidas=0, evitadas=0):
+        with self._lock:
+            self.emitidas += emitidas
+            self.evitadas += evitadas
+
+    def resumo(self):
+        """
+        Retorna um retrato dos contadores atuais
+        Returns:
+            dict: Escritas emitidas e evitadas
+        """
+        with self._lock:
+            return {'escritas_emitidas': self.emitidas, 'escritas_evitadas': self.evitadas}
+
+
+# Contador compartilhado pelo processo
+contador_escritas = ContadorEscritas()
+
+# Posições aceitas no cadastro de atletas
+POSICOES = ["Pilar", "Hooker", "Segunda Linha", "Terceira Linha", "Scrum-half", "Fly-half", "Centro", "Ponta", "Fullback"]
+
+
+def _gravar_acompanhamento(conn, nome, data_cirurgia, fase_id, data_inicio, data_fim, clube):
+    """
+    Grava o acompanhamento na transação em andamento (ver registrar_acompanhamento)
+    Returns:
+        tuple: Número de instruções de escrita emitidas e se o atleta é novo
+    """
+    escritas = 0
+    # Estado gravado: data de cirurgia do atleta, se a fase atual já está registrada,
+    # se o atleta já tem alguma fase em andamento e o clube do atleta
+    estado = conn.execute("""
+        SELECT
+            p.data_cirurgia,
+            EXISTS (
+                SELECT 1 FROM progresso pr
+                WHERE pr.paciente_id = p.id
+                  AND pr.fase_id = ?
+                  AND pr.data_inicio = ?
+                  AND pr.data_fim IS NOT DISTINCT FROM ?
+                  AND pr.status = 'Em andamento'
+            ) AS fase_registrada,
+            EXISTS (
+                SELECT 1 FROM progresso pr
+                WHERE pr.paciente_id = p.id
+                  AND pr.status = 'Em andamento'
+            ) AS em_tratamento,
+            p.clube
+        FROM pacientes p
+        WHERE p.nome = ?
+    """, [fase_id, data_inicio, data_fim, nome]).fetchone()
+
+    atleta_alterado = (estado is None or estado[0] != data_cirurgia
+                       or (clube is not None and estado[3] != clube))
+    fase_alterada = fase_id is not None and (estado is None or not estado[1])
+
+    if atleta_alterado:
+        # Registra ou atualiza o paciente; sem clube informado, mantém o já gravado
+        conn.execute("""
+            INSERT INTO pacientes (nome, data_cirurgia, clube)
+            VALUES (?, ?, ?)
+            ON CONFLICT (nome) DO UPDATE SET
+                data_cirurgia = excluded.data_cirurgia,
+                clube = COALESCE(excluded.clube, pacientes.clube)
+        """, [nome, data_cirurgia, clube])
+        escritas += 1
+
+    if fase_alterada:
+        # Registra progresso
+        conn.execute("""
+            INSERT INTO progresso (paciente_id, fase_id, data_inicio, data_fim, status)
+            SELECT id, ?, ?, ?, 'Em andamento'
+            FROM pacientes
+            WHERE nome = ?
+            ON CONFLICT (paciente_id, fase_id, data_inicio) DO UPDATE
+            SET status = 'Em andamento',
+                data_fim = excluded.data_fim
+        """, [fase_id, data_inicio, data_fim, nome])
+        escritas += 1
+
+    # O registro não encerra fases: o atleta só entra em tratamento se ainda não estava
+    ajustar_resumo(
+        conn,
+        total_atletas=1 if estado is None else 0,
+        atletas_em_tratamento=1 if fase_alterada and (estado is None or not estado[2]) else 0,
+    )
+    return escritas, estado is None
+
+
+def registrar_acompanhamento(conn, nome, data_cirurgia, fase_id=None, data_inicio=None, data_fim=None,
+                             clube=None):
+    """
+    Registra o atleta, sua data de cirurgia e a fase atual, escrevendo apenas o que mudou
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        nome (str): Nome do atleta
+        data_cirurgia (date): Data da cirurgia
+        fase_id (int): ID da fase atual (None para registrar apenas o atleta)
+        data_inicio (date): Início da fase atual
+        data_fim (date): Fim previsto da fase atual
+        clube (str): Clube do atleta (no modo por clube, o clube do banco; None mantém o gravado)
+    Returns:
+        int: Número de instruções de escrita emitidas (0 quando nada mudou)
+    """
+    possiveis = 2 if fase_id is not None else 1
+    escritas, atleta_novo = executar_escrita(
+        conn, _gravar_acompanhamento, nome, data_cirurgia, fase_id, data_inicio, data_fim, clube
+    )
+    if atleta_novo:
+        invalidar_atletas()
+    if escritas:
+        invalidar_coortes('pacientes', 'progresso')
+        invalidar_risco('pacientes', 'progresso')
+    contador_escritas.registrar(emitidas=escritas, evitadas=possiveis - escritas)
+    return escritas
+
+
+def _inserir_atleta(conn, nome, data_nascimento, posicao, clube):
+    """Insere o atleta e ajusta o resumo na transação em andamento"""
+    paciente_id = conn.execute("""
+        INSERT INTO pacientes (nome, data_nascimento, posicao, clube)
+        VALUES (?, ?, ?, ?)
+        RETURNING id
+    """, [nome, data_nascimento, posicao, clube]).fetchone()[0]
+    ajustar_resumo(conn, total_atletas=1)
+    return paciente_id
+
+
+def cadastrar_atleta(conn, nome, data_nascimento=None, posicao=None, clube=None):
+    """
+    Cadastra um novo atleta
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        nome (str): Nome do atleta
+        data_nascimento (date): Data de nascimento
+        posicao (str): Posição em campo
+        clube (str): Clube
+    Returns:
+        int: ID do atleta cadastrado
+    """
+    paciente_id = executar_escrita(conn, _inserir_atleta, nome, data_nascimento, posicao, clube)
+    contador_escritas.registrar(emitidas=1)
+    invalidar_atletas()
+    invalidar_coortes('pacientes')
+    invalidar_risco('pacientes')
+    return paciente_id
+
+
+def _inserir_lesao(conn, paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes):
+    """Insere a lesão e ajusta o resumo na transação em andamento"""
+    tipo_novo = not conn.execute("""
+        SELECT EXISTS (SELECT 1 FROM lesoes WHERE tipo_lesao_id = ?)
+    """, [tipo_lesao_id]).fetchone()[0]
+    lesao_id = conn.execute("""
+        INSERT INTO lesoes (paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes)
+        VALUES (?, ?, ?, ?, ?)
+        RETURNING id
+    """, [paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes]).fetchone()[0]
+    ajustar_resumo(conn, tipos_lesao_registrados=1 if tipo_novo else 0)
+    return lesao_id
+
+
+def cadastrar_lesao(conn, paciente_id, tipo_lesao_id, data_lesao=None, data_cirurgia=None, observacoes=None):
+    """
+    Registra uma lesão de um atleta
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        paciente_id (int): ID do atleta
+        tipo_lesao_id (int): ID do tipo de lesão
+        data_lesao (date): Data da lesão
+        data_cirurgia (date): Data da cirurgia
+        observacoes (str): Observações
+    Returns:
+        int: ID da lesão registrada
+    """
+    lesao_id = executar_escrita(
+        conn, _inserir_lesao, paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes
+    )
+    contador_escritas.registrar(emitidas=1)
+    invalidar_lesoes()
+    invalidar_coortes('lesoes')
+    invalidar_risco('lesoes')
+    return lesao_id
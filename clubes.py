@@ -0,0 +1,348 @@
+# SAGRA - Bancos por clube
+# Descrição: Modo multi-clube, ativado pela variável SAGRA_CLUBES com a pasta dos
+#            bancos. Cada clube tem seu próprio arquivo DuckDB, com pool de cursores
+#            e escritor próprios, anexado a uma conexão central do processo. Cada
+#            sessão usa o banco do clube do usuário (campo 'clube' do usuário em
+#            config.yaml): escritas de clubes diferentes não disputam o mesmo
+#            escritor e as consultas leem apenas as linhas do clube. A análise
+#            entre clubes usa visões temporárias que unem os bancos anexados, com
+#            os IDs de cada clube deslocados para não colidirem; fora do
+#            aplicativo, os arquivos são anexados somente para leitura.
+#
+# Uso: python clubes.py dividir --banco SAGRA.db --pasta clubes
+#      python clubes.py consultar --pasta clubes "SELECT clube, count(*) FROM pacientes GROUP BY ALL"
+
+import argparse
+import glob
+import os
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+import duckdb
+
+from banco import BancoDados, CursorMedido, MetricasBanco, criar_esquema
+from resumo import reconstruir_resumo
+
+# Pasta dos bancos de cada clube (None desativa o modo multi-clube)
+PASTA_CLUBES = os.environ.get('SAGRA_CLUBES')
+
+# IDs nas visões consolidadas: id * FATOR_ID_CLUBES + posição do clube (até 10 mil clubes)
+FATOR_ID_CLUBES = 10_000
+
+# Colunas de ID de cada tabela própria de cada clube, deslocadas nas visões consolidadas
+CHAVES_CLUBE = {
+    'pacientes': ['id'],
+    'tipos_lesao': ['id'],
+    'lesoes': ['id', 'paciente_id', 'tipo_lesao_id'],
+    'progresso': ['id', 'paciente_id'],
+    'sessoes': ['paciente_id'],
+    'sessoes_semanais': ['paciente_id'],
+}
+
+# Tabelas dos protocolos, iguais em todos os bancos (criadas de schema.sql e copiadas na
+# divisão); lidas do primeiro clube, com as colunas de ID de tabelas dos clubes deslocadas
+# como as dele
+TABELAS_COMUNS = {
+    'protocolos': ['tipo_lesao_id'],
+    'fases_reabilitacao': [],
+    'itens_protocolo': [],
+}
+
+# Sequência de ID de cada tabela copiada na divisão de um banco
+SEQUENCIAS = {
+    'tipos_lesao': 'seq_tipos_lesao',
+    'pacientes': 'seq_pacientes',
+    'lesoes': 'seq_lesoes',
+    'progresso': 'seq_progresso',
+    'protocolos': 'seq_protocolos',
+    'fases_reabilitacao': 'seq_fases',
+}
+
+
+def identificador_clube(clube):
+    """
+    Nome do clube sem acentos, em minúsculas e apenas com letras, números e '_'
+    Args:
+        clube (str): Nome do clube
+    Returns:
+        str: Identificador usado no nome do arquivo e do catálogo
+    """
+    texto = unicodedata.normalize('NFKD', clube).encode('ascii', 'ignore').decode().lower()
+    identificador = re.sub(r'[^a-z0-9]+', '_', texto).strip('_')
+    if not identificador:
+        raise ValueError(f"Nome de clube inválido: {clube!r}")
+    return identificador
+
+
+def verificar_identificadores(clubes):
+    """
+    Recusa clubes distintos que teriam o mesmo identificador (nomes que diferem só por
+    acentos, maiúsculas ou pontuação), que dividiriam o mesmo arquivo de banco
+    Args:
+        clubes (list): Nomes dos clubes
+    Raises:
+        ValueError: Com os nomes de cada grupo de clubes em conflito
+    """
+    por_identificador = {}
+    for clube in sorted(set(clubes)):
+        por_identificador.setdefault(identificador_clube(clube), []).append(clube)
+    conflitos = [nomes for nomes in por_identificador.values() if len(nomes) > 1]
+    if conflitos:
+        raise ValueError("Clubes com o mesmo identificador de banco: " + "; ".join(
+            " e ".join(repr(nome) for nome in nomes) for nomes in conflitos
+        ))
+
+
+def arquivo_clube(clube, pasta=PASTA_CLUBES):
+    """Caminho do arquivo do banco do clube"""
+    return os.path.join(pasta, identificador_clube(clube) + '.db')
+
+
+def catalogo_clube(clube):
+    """Nome do catálogo do banco do clube na conexão central"""
+    return 'clube_' + identificador_clube(clube)
+
+
+def clube_usuario(config, usuario):
+    """
+    Clube do usuário no config.yaml
+    Args:
+        config (dict): Configuração do aplicativo
+        usuario (str): Nome de usuário
+    Returns:
+        str: Clube do usuário, ou None para usuários sem clube (acesso a todos)
+    """
+    return config['credentials']['usernames'].get(usuario, {}).get('clube')
+
+
+def clubes_configurados(config):
+    """
+    Clubes dos usuários do config.yaml
+    Args:
+        config (dict): Configuração do aplicativo
+    Returns:
+        list: Nomes dos clubes em ordem alfabética
+    Raises:
+        ValueError: Se dois clubes tiverem o mesmo identificador (ver verificar_identificadores)
+    """
+    clubes = sorted({u['clube'] for u in config['credentials']['usernames'].values() if u.get('clube')})
+    verificar_identificadores(clubes)
+    return clubes
+
+
+# Conexão central e bancos abertos no processo
+_central = None
+_bancos = {}
+_clubes_lock = threading.Lock()
+
+# Contadores das consultas consolidadas
+metricas_consolidadas = MetricasBanco()
+
+
+def _obter_central():
+    """Conexão em memória à qual os bancos dos clubes são anexados"""
+    global _central
+    if _central is None:
+        with _clubes_lock:
+            if _central is None:
+                _central = duckdb.connect(':memory:')
+    return _central
+
+
+def obter_banco_clube(clube, pasta=PASTA_CLUBES):
+    """
+    Retorna o banco do clube, anexando o arquivo (e criando-o com o esquema, se não
+    existir) apenas na primeira chamada
+    Args:
+        clube (str): Nome do clube
+        pasta (str): Pasta dos bancos dos clubes
+    Returns:
+        BancoDados: Banco do clube compartilhado pelo processo
+    """
+    catalogo = catalogo_clube(clube)
+    banco = _bancos.get(catalogo)
+    if banco is None:
+        central = _obter_central()
+        with _clubes_lock:
+            banco = _bancos.get(catalogo)
+            if banco is None:
+                os.makedirs(pasta, exist_ok=True)
+                banco = _bancos[catalogo] = BancoDados(
+                    arquivo_clube(clube, pasta), central=central, catalogo=catalogo, com_dados_mock=False
+                )
+    return banco
+
+
+def criar_visoes_consolidadas(conn, catalogos):
+    """
+    Cria visões temporárias com os nomes das tabelas que unem os bancos dos clubes
+    Args:
+        conn: Conexão ou cursor DuckDB com os bancos anexados
+        catalogos (list): Catálogos dos clubes; a posição de cada um desloca seus IDs
+    """
+    if not catalogos:
+        raise ValueError("Nenhum banco de clube para consolidar")
+    for tabela, chaves in CHAVES_CLUBE.items():
+        partes = []
+        for posicao, catalogo in enumerate(catalogos):
+            substituicoes = ", ".join(f"{c}::BIGINT * {FATOR_ID_CLUBES} + {posicao} AS {c}" for c in chaves)
+            partes.append(f"SELECT * REPLACE ({substituicoes}) FROM {catalogo}.{tabela}")
+        conn.execute(f"CREATE OR REPLACE TEMP VIEW {tabela} AS " + " UNION ALL BY NAME ".join(partes))
+    for tabela, chaves in TABELAS_COMUNS.items():
+        substituicoes = ", ".join(f"{c}::BIGINT * {FATOR_ID_CLUBES} AS {c}" for c in chaves)
+        colunas = f"* REPLACE ({substituicoes})" if chaves else "*"
+        conn.execute(f"CREATE OR REPLACE TEMP VIEW {tabela} AS SELECT {colunas} FROM {catalogos[0]}.{tabela}")
+
+
+@contextmanager
+def cursor_consolidado(clubes, pasta=PASTA_CLUBES):
+    """
+    Context manager com um cursor que lê todos os clubes como um único banco (somente
+    consultas; as escritas devem usar o banco de cada clube)
+    Args:
+        clubes (list): Nomes dos clubes
+        pasta (str): Pasta dos bancos dos clubes
+    """
+    for clube in clubes:
+        obter_banco_clube(clube, pasta)
+    catalogos = [catalogo_clube(clube) for clube in clubes]
+    cursor = CursorMedido(_obter_central().cursor(), metricas_consolidadas, origem='consolidado:' + ','.join(catalogos))
+    try:
+        criar_visoes_consolidadas(cursor, catalogos)
+        yield cursor
+    finally:
+        cursor.close()
+
+
+def conectar_consolidado(pasta):
+    """
+    Abre uma conexão que anexa, somente para leitura, todos os bancos da pasta (para
+    análises fora do processo do aplicativo)
+    Args:
+        pasta (str): Pasta dos bancos dos clubes
+    Returns:
+        duckdb.DuckDBPyConnection: Conexão com as visões consolidadas
+    """
+    conn = duckdb.connect()
+    catalogos = []
+    for caminho in sorted(glob.glob(os.path.join(pasta, '*.db'))):
+        catalogo = 'clube_' + os.path.splitext(os.path.basename(caminho))[0]
+        conn.execute(f"ATTACH '{caminho}' AS {catalogo} (READ_ONLY)")
+        catalogos.append(catalogo)
+    criar_visoes_consolidadas(conn, catalogos)
+    return conn
+
+
+def dividir(conn, pasta):
+    """
+    Copia os atletas de cada clube de um banco único (com suas lesões e progresso) para
+    um banco novo por clube, mantendo os IDs (com as sessões de reabilitação e os
+    protocolos por tipo de lesão)
+    Args:
+        conn: Conexão DuckDB com permissão de escrita no banco de origem
+        pasta (str): Pasta dos bancos dos clubes (os arquivos não podem existir)
+    Returns:
+        dict: Atletas copiados por clube e atletas sem clube (não copiados)
+    Raises:
+        ValueError: Se dois clubes tiverem o mesmo identificador ou o banco de algum clube
+                    já existir (verificado antes de criar qualquer arquivo)
+    """
+    clubes = [linha[0] for linha in conn.execute(
+        "SELECT DISTINCT clube FROM pacientes WHERE clube IS NOT NULL ORDER BY clube"
+    ).fetchall()]
+    verificar_identificadores(clubes)
+    existentes = [caminho for caminho in (arquivo_clube(clube, pasta) for clube in clubes) if os.path.exists(caminho)]
+    if existentes:
+        raise ValueError(f"Banco(s) de clube já existente(s): {', '.join(existentes)}")
+
+    os.makedirs(pasta, exist_ok=True)
+    copiados = {}
+    for clube in clubes:
+        caminho = arquivo_clube(clube, pasta)
+        destino = duckdb.connect(caminho)
+        criar_esquema(destino, com_dados_mock=False)
+        destino.close()
+
+        conn.execute(f"ATTACH '{caminho}' AS destino")
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute("""
+                INSERT INTO destino.tipos_lesao BY NAME
+                SELECT * FROM tipos_lesao WHERE id NOT IN (SELECT id FROM destino.tipos_lesao)
+            """)
+            # Protocolos próprios de tipos de lesão, com suas fases e itens (o padrão vem do esquema)
+            for tabela in ('protocolos', 'fases_reabilitacao'):
+                conn.execute(f"""
+                    INSERT INTO destino.{tabela} BY NAME
+                    SELECT * FROM {tabela} WHERE id NOT IN (SELECT id FROM destino.{tabela})
+                """)
+            conn.execute("""
+                INSERT INTO destino.itens_protocolo BY NAME
+                SELECT * EXCLUDE (id) FROM itens_protocolo
+                WHERE fase_id NOT IN (SELECT fase_id FROM destino.itens_protocolo)
+            """)
+            copiados[clube] = conn.execute(
+                "INSERT INTO destino.pacientes BY NAME SELECT * FROM pacientes WHERE clube = ?", [clube]
+            ).fetchone()[0]
+            for tabela in ('lesoes', 'progresso', 'sessoes', 'sessoes_semanais'):
+                conn.execute(f"""
+                    INSERT INTO destino.{tabela} BY NAME
+                    SELECT t.* FROM {tabela} t
+                    WHERE t.paciente_id IN (SELECT id FROM destino.pacientes)
+                """)
+            # Os próximos IDs do clube continuam depois dos copiados
+            for tabela, sequencia in SEQUENCIAS.items():
+                conn.execute(f"""
+                    SELECT max(nextval('destino.{sequencia}'))
+                    FROM range((SELECT COALESCE(max(id), 0) FROM destino.{tabela}))
+                """).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute("DETACH destino")
+
+        destino = duckdb.connect(caminho)
+        reconstruir_resumo(destino)
+        destino.close()
+
+    copiados['sem_clube'] = conn.execute("SELECT count(*) FROM pacientes WHERE clube IS NULL").fetchone()[0]
+    return copiados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bancos do SAGRA por clube")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    divisao = subcomandos.add_parser('dividir', help="Divide um banco único em um banco por clube")
+    divisao.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco de origem")
+    divisao.add_argument('--pasta', default='clubes', help="Pasta dos bancos dos clubes")
+
+    consulta = subcomandos.add_parser('consultar', help="Consulta todos os clubes (somente leitura)")
+    consulta.add_argument('sql', help="Consulta sobre pacientes, lesoes, progresso, sessoes, tipos_lesao e fases_reabilitacao")
+    consulta.add_argument('--pasta', default='clubes', help="Pasta dos bancos dos clubes")
+
+    args = parser.parse_args()
+    if args.comando == 'dividir':
+        from migracoes import atualizar_esquema
+
+        conn = duckdb.connect(args.banco)
+        atualizar_esquema(conn)
+        copiados = dividir(conn, args.pasta)
+        sem_clube = copiados.pop('sem_clube')
+        for clube, atletas in copiados.items():
+            print(f"{clube}: {atletas} atletas")
+        if sem_clube:
+            print(f"{sem_clube} atletas sem clube não foram copiados")
+        conn.close()
+    elif args.comando == 'consultar':
+        conn = conectar_consolidado(args.pasta)
+        print(conn.execute(args.sql).df().to_string(index=False))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# SAGRA - Configuração do aplicativo
+# Descrição: Lê o config.yaml (credenciais e cookie da autenticação) e o logotipo
+#            uma única vez por processo; todas as sessões e reexecuções do script
+#            reaproveitam o conteúdo carregado. Alterações nos arquivos só valem
+#            após reiniciar o aplicativo ou chamar invalidar_configuracao().
+
+import threading
+
+import yaml
+from yaml.loader import SafeLoader
+
+# Arquivos lidos pela tela de login
+ARQUIVO_CONFIGURACAO = 'config.yaml'
+ARQUIVO_LOGO = 'logo_sagra.png'
+
+# Cache do processo
+_configuracao = None
+_logo = None
+_configuracao_lock = threading.Lock()
+
+
+def obter_configuracao():
+    """
+    Retorna a configuração em cache, lendo o config.yaml na primeira chamada
+    Returns:
+        dict: Conteúdo do config.yaml (compartilhado; não alterar)
+    """
+    global _configuracao
+    configuracao = _configuracao
+    if configuracao is None:
+        with _configuracao_lock:
+            if _configuracao is None:
+                with open(ARQUIVO_CONFIGURACAO) as arquivo:
+                    _configuracao = yaml.load(arquivo, Loader=SafeLoader)
+            configuracao = _configuracao
+    return configuracao
+
+
+def obter_logo():
+    """
+    Retorna o conteúdo do logotipo em cache, lendo o arquivo na primeira chamada
+    Returns:
+        bytes: Imagem PNG do logotipo
+    """
+    global _logo
+    logo = _logo
+    if logo is None:
+        with _configuracao_lock:
+            if _logo is None:
+                with open(ARQUIVO_LOGO, 'rb') as arquivo:
+                    _logo = arquivo.read()
+            logo = _logo
+    return logo
+
+
+def invalidar_configuracao():
+    """Descarta a configuração e o logotipo em cache; a próxima chamada relê os arquivos"""
+    global _configuracao, _logo
+    with _configuracao_lock:
+        _configuracao = None
+        _logo = None
@@ -0,0 +1,25 @@
+# SAGRA - Fixtures dos testes
+# Descrição: Bancos DuckDB temporários com o esquema atual e sem dados fictícios.
+#            Os caches do processo usam a mesma chave para todas as conexões
+#            avulsas, então são descartados antes de cada teste.
+#
+# Uso: python -m pytest -q
+
+import duckdb
+import pytest
+
+from banco import criar_esquema
+from listas import invalidar_atletas, invalidar_tipos_lesao
+from protocolo import invalidar_protocolo
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """Conexão a um banco novo em arquivo temporário, já com o esquema atual"""
+    invalidar_protocolo()
+    invalidar_atletas()
+    invalidar_tipos_lesao()
+    conexao = duckdb.connect(str(tmp_path / 'SAGRA.db'))
+    criar_esquema(conexao, com_dados_mock=False)
+    yield conexao
+    conexao.close()
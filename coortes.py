@@ -0,0 +1,245 @@
+# SAGRA - Análise de coortes
+# Descrição: Agregados de todo o elenco calculados no DuckDB com GROUP BY e
+#            funções de janela sobre progresso e lesoes: mediana de dias por fase
+#            por tipo de lesão, clube ou posição, atraso da fase registrada em
+#            relação à fase prevista pelo protocolo de cada atleta e atletas em
+#            cada fase por semana. As fases de protocolos diferentes com o mesmo nome são
+#            somadas, na posição que ocupam no protocolo. Os resultados ficam em
+#            cache com validade; as escritas do processo descartam apenas os
+#            agregados que dependem das tabelas alteradas.
+
+from datetime import datetime
+
+from listas import CacheValidade, origem
+from protocolo import SQL_LIMITES_FASES, SQL_PROTOCOLO_ATLETA
+
+# Validade dos agregados em cache (em segundos); cobre gravações feitas por outros processos
+VALIDADE_COORTES_SEGUNDOS = 600
+
+# Número de semanas exibidas na contagem de atletas por fase
+SEMANAS_PADRAO = 26
+
+# Número máximo de grupos (clubes, tipos de lesão, posições) por agregado, pelos maiores
+LIMITE_GRUPOS = 20
+
+# Largura das faixas do histograma de atraso (em dias)
+FAIXA_ATRASO_DIAS = 30
+
+# Expressão do grupo de cada agrupamento; o tipo de lesão é o da lesão mais recente do atleta
+AGRUPAMENTOS = {
+    'tipo_lesao': 'ul.tipo_lesao',
+    'clube': 'p.clube',
+    'posicao': 'p.posicao',
+}
+
+# Tabelas lidas por cada agregado (para a invalidação após escritas)
+DEPENDENCIAS = {
+    'duracao_fases': {'pacientes', 'lesoes', 'progresso', 'fases_reabilitacao'},
+    'atraso_alta': {'pacientes', 'lesoes', 'progresso'},
+    'fases_por_semana': {'progresso', 'fases_reabilitacao'},
+}
+
+# Cache compartilhado pelo processo
+cache_coortes = CacheValidade(VALIDADE_COORTES_SEGUNDOS)
+
+# Tipo de lesão mais recente de cada atleta
+_ULTIMA_LESAO = """
+    SELECT l.paciente_id,
+           arg_max(t.nome, (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id)) AS tipo_lesao
+    FROM lesoes l
+    JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+    GROUP BY l.paciente_id
+"""
+
+# Nome e posição de cada fase no seu protocolo
+_ORDEM_FASES = """
+    SELECT id AS fase_id, fase, row_number() OVER (PARTITION BY protocolo_id ORDER BY id) AS ordem
+    FROM fases_reabilitacao
+"""
+
+
+def duracao_fases(conn, agrupamento='tipo_lesao', limite_grupos=LIMITE_GRUPOS):
+    """
+    Mediana de dias de cada fase concluída por grupo de atletas
+    Args:
+        conn: Conexão ou cursor DuckDB
+        agrupamento (str): 'tipo_lesao', 'clube' ou 'posicao'
+        limite_grupos (int): Número de grupos retornados (os com mais atletas)
+    Returns:
+        DataFrame: grupo, fase, ordem, atletas e mediana_dias e p90_dias (fases concluídas)
+    """
+    grupo = AGRUPAMENTOS[agrupamento]
+
+    def carregar():
+        return conn.execute(f"""
+            WITH ul AS ({_ULTIMA_LESAO}),
+            duracoes AS (
+                SELECT COALESCE({grupo}, '(não informado)') AS grupo,
+                       f.fase,
+                       f.ordem,
+                       pr.paciente_id,
+                       pr.data_fim - pr.data_inicio + 1 AS dias
+                FROM progresso pr
+                JOIN ({_ORDEM_FASES}) f ON f.fase_id = pr.fase_id
+                JOIN pacientes p ON p.id = pr.paciente_id
+                LEFT JOIN ul ON ul.paciente_id = pr.paciente_id
+                WHERE pr.status = 'Concluída' AND pr.data_fim IS NOT NULL
+            ),
+            agregado AS (
+                SELECT grupo, fase, min(ordem) AS ordem,
+                       count(DISTINCT paciente_id) AS atletas,
+                       median(dias) AS mediana_dias,
+                       quantile_cont(dias, 0.9) AS p90_dias,
+                       sum(count(DISTINCT paciente_id)) OVER (PARTITION BY grupo) AS total_grupo
+                FROM duracoes
+                GROUP BY grupo, fase
+            )
+            SELECT grupo, fase, ordem, atletas, mediana_dias, p90_dias
+            FROM agregado
+            QUALIFY dense_rank() OVER (ORDER BY total_grupo DESC, grupo) <= ?
+            ORDER BY total_grupo DESC, grupo, ordem, fase
+        """, [limite_grupos]).df()
+
+    return cache_coortes.obter(('duracao_fases', agrupamento, limite_grupos, origem(conn)), carregar)
+
+
+def atraso_alta(conn, registro, hoje=None, limite_grupos=LIMITE_GRUPOS):
+    """
+    Atletas em tratamento (fase registrada em andamento anterior à fase final do protocolo)
+    cuja fase registrada já deveria ter terminado, isto é, atrás da fase que o protocolo
+    prevê para os dias desde o início do tratamento, e quantos dias além do fim previsto dela
+    Args:
+        conn: Conexão ou cursor DuckDB
+        registro (RegistroProtocolos): Protocolos com os limites das fases de cada tipo de lesão
+        hoje (date): Data de referência (padrão: data atual)
+        limite_grupos (int): Número de tipos de lesão retornados (os com mais atletas atrasados)
+    Returns:
+        dict: 'resumo' (atletas em tratamento, atrasados, atrasados já depois da alta prevista,
+              mediana e p90 dos dias de atraso), 'faixas' (DataFrame com atletas por faixa de
+              dias de atraso) e 'por_tipo_lesao' (DataFrame com atrasados e mediana por tipo de lesão)
+    """
+    hoje = hoje or datetime.now().date()
+
+    def carregar():
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE _atraso AS
+            WITH ul AS ({_ULTIMA_LESAO}),
+            limites AS (
+                SELECT *,
+                       ordem = max(ordem) OVER (PARTITION BY protocolo_id) AS final,
+                       max(inicio) OVER (PARTITION BY protocolo_id) - 1 AS dias_alta
+                FROM ({SQL_LIMITES_FASES})
+            ),
+            registrada AS (
+                SELECT paciente_id, arg_max(fase_id, (data_inicio, id)) AS fase_id
+                FROM progresso
+                WHERE status = 'Em andamento'
+                GROUP BY paciente_id
+            )
+            SELECT a.paciente_id AS id,
+                   COALESCE(ul.tipo_lesao, '(não informado)') AS tipo_lesao,
+                   $hoje::DATE - a.inicio_tratamento - l.fim AS dias_alem,
+                   $hoje::DATE - a.inicio_tratamento > l.dias_alta AS apos_alta
+            FROM ({SQL_PROTOCOLO_ATLETA}) a
+            JOIN registrada r ON r.paciente_id = a.paciente_id
+            JOIN limites l ON l.fase_id = r.fase_id
+            LEFT JOIN ul ON ul.paciente_id = a.paciente_id
+            WHERE NOT l.final
+        """, {**registro.parametros_atletas(), **registro.parametros_limites(), 'hoje': hoje})
+        resumo = conn.execute("""
+            SELECT count(*) AS em_tratamento,
+                   count(*) FILTER (WHERE dias_alem > 0) AS atrasados,
+                   count(*) FILTER (WHERE dias_alem > 0 AND apos_alta) AS apos_alta,
+                   median(dias_alem) FILTER (WHERE dias_alem > 0) AS mediana_dias_alem,
+                   quantile_cont(dias_alem, 0.9) FILTER (WHERE dias_alem > 0) AS p90_dias_alem
+            FROM _atraso
+        """).df().iloc[0].to_dict()
+        faixas = conn.execute("""
+            SELECT (dias_alem - 1) // $faixa * $faixa + 1 AS de,
+                   (dias_alem - 1) // $faixa * $faixa + $faixa AS ate,
+                   count(*) AS atletas
+            FROM _atraso
+            WHERE dias_alem > 0
+            GROUP BY ALL
+            ORDER BY de
+        """, {'faixa': FAIXA_ATRASO_DIAS}).df()
+        por_tipo = conn.execute("""
+            SELECT tipo_lesao, count(*) AS atrasados, median(dias_alem) AS mediana_dias_alem
+            FROM _atraso
+            WHERE dias_alem > 0
+            GROUP BY tipo_lesao
+            ORDER BY atrasados DESC, tipo_lesao
+            LIMIT ?
+        """, [limite_grupos]).df()
+        conn.execute("DROP TABLE _atraso")
+        return {'resumo': resumo, 'faixas': faixas, 'por_tipo_lesao': por_tipo}
+
+    return cache_coortes.obter(('atraso_alta', registro.versao, hoje, limite_grupos, origem(conn)), carregar)
+
+
+def fases_por_semana(conn, semanas=SEMANAS_PADRAO, hoje=None):
+    """
+    Atletas em cada fase no início (segunda-feira) de cada uma das últimas semanas.
+    Cada linha de progresso soma 1 na primeira segunda-feira a partir do início da fase e
+    subtrai 1 na primeira segunda-feira após o fim; a soma acumulada por fase dá a contagem.
+    Args:
+        conn: Conexão ou cursor DuckDB
+        semanas (int): Número de semanas, terminando na semana atual
+        hoje (date): Data de referência (padrão: data atual)
+    Returns:
+        DataFrame: semana (date), fase, ordem e atletas
+    """
+    hoje = hoje or datetime.now().date()
+
+    def carregar():
+        return conn.execute(f"""
+            WITH fases AS (
+                SELECT fase, min(ordem) AS ordem
+                FROM ({_ORDEM_FASES})
+                GROUP BY fase
+            ),
+            eventos AS (
+                SELECT f.fase, date_trunc('week', pr.data_inicio + 6)::DATE AS semana, 1 AS delta
+                FROM progresso pr
+                JOIN ({_ORDEM_FASES}) f ON f.fase_id = pr.fase_id
+                UNION ALL
+                SELECT f.fase, date_trunc('week', pr.data_fim)::DATE + 7 AS semana, -1 AS delta
+                FROM progresso pr
+                JOIN ({_ORDEM_FASES}) f ON f.fase_id = pr.fase_id
+                WHERE pr.data_fim IS NOT NULL
+            ),
+            inicio AS (
+                SELECT date_trunc('week', $hoje::DATE)::DATE - 7 * ($semanas::INTEGER - 1) AS semana
+            ),
+            -- Eventos anteriores à primeira semana exibida entram todos nela
+            variacoes AS (
+                SELECT fase, GREATEST(e.semana, i.semana) AS semana, sum(delta) AS delta
+                FROM eventos e, inicio i
+                WHERE e.semana <= $hoje::DATE
+                GROUP BY ALL
+            ),
+            grade AS (
+                SELECT f.fase, f.ordem, i.semana + (7 * s.n)::INTEGER AS semana
+                FROM fases f, inicio i, range($semanas) s(n)
+            )
+            SELECT g.semana, g.fase, g.ordem,
+                   (sum(COALESCE(v.delta, 0)) OVER (PARTITION BY g.fase ORDER BY g.semana))::BIGINT AS atletas
+            FROM grade g
+            LEFT JOIN variacoes v ON v.fase = g.fase AND v.semana = g.semana
+            ORDER BY g.semana, g.ordem, g.fase
+        """, {'hoje': hoje, 'semanas': semanas}).df()
+
+    return cache_coortes.obter(('fases_por_semana', semanas, hoje, origem(conn)), carregar)
+
+
+def invalidar_coortes(*tabelas):
+    """
+    Descarta os agregados em cache que leem as tabelas alteradas; deve ser chamada
+    após gravar em pacientes, lesoes, progresso ou fases_reabilitacao
+    Args:
+        tabelas (str): Tabelas alteradas (nenhuma para descartar todos)
+    """
+    if not tabelas:
+        cache_coortes.invalidar()
+        return
+    cache_coortes.invalidar(*[nome for nome, lidas in DEPENDENCIAS.items() if lidas & set(tabelas)])
@@ -0,0 +1,186 @@
+# SAGRA - Gerador de dados fictícios
+# Descrição: Gera atletas, lesões e progresso em poucas instruções SQL baseadas
+#            em conjuntos (INSERT ... SELECT sobre range()), de forma reprodutível
+#            a partir de uma semente. Usado na carga inicial do banco e para criar
+#            bancos de teste de carga.
+#
+# Uso: python dados_mock.py --banco carga.db --atletas 100000 --semente 42
+
+import argparse
+import time
+from datetime import datetime
+
+from cadastro import POSICOES
+from recalculo_progresso import recalcular_progresso
+from resumo import reconstruir_resumo
+
+# Lista de nomes fictícios de atletas (usados nos primeiros registros gerados)
+ATLETAS_MOCK = [
+    ("João Silva", "Pilar", "Bandeirantes Rugby"),
+    ("Pedro Santos", "Hooker", "São José Rugby"),
+    ("Lucas Oliveira", "Segunda Linha", "Pasteur Athletique"),
+    ("Matheus Souza", "Terceira Linha", "Jacareí Rugby"),
+    ("Gabriel Costa", "Scrum-half", "São Paulo Athletic Club"),
+    ("Rafael Pereira", "Fly-half", "Curitiba Rugby"),
+    ("Thiago Lima", "Centro", "Niterói Rugby"),
+    ("Bruno Fernandes", "Ponta", "Desterro Rugby"),
+    ("Diego Alves", "Fullback", "Charrua Rugby"),
+    ("Marcelo Rocha", "Pilar", "BH Rugby"),
+    ("Felipe Santos", "Hooker", "Guanabara Rugby"),
+    ("André Costa", "Segunda Linha", "Albatroz Rugby"),
+    ("Ricardo Oliveira", "Terceira Linha", "Rio Branco Rugby"),
+    ("Gustavo Silva", "Scrum-half", "Urutu Rugby"),
+    ("Henrique Lima", "Fly-half", "Templários Rugby"),
+    ("Carlos Eduardo", "Centro", "Vitória Rugby"),
+    ("Paulo Roberto", "Ponta", "Recife Rugby"),
+    ("Fernando Souza", "Fullback", "Goianos Rugby"),
+    ("Roberto Carlos", "Pilar", "Brasília Rugby"),
+    ("José Antonio", "Hooker", "Cuiabá Rugby"),
+    ("Miguel Santos", "Segunda Linha", "Londrina Rugby"),
+    ("Daniel Costa", "Terceira Linha", "Maringá Rugby"),
+    ("Alexandre Lima", "Scrum-half", "Cascavel Rugby"),
+    ("Marcos Paulo", "Fly-half", "Blumenau Rugby"),
+    ("Victor Hugo", "Centro", "Floripa Rugby"),
+    ("Leonardo Silva", "Ponta", "Porto Alegre Rugby"),
+    ("Eduardo Santos", "Fullback", "Pelotas Rugby"),
+    ("Rodrigo Costa", "Pilar", "Santa Maria Rugby"),
+    ("Fábio Lima", "Hooker", "Caxias Rugby"),
+    ("Guilherme Souza", "Segunda Linha", "Bento Rugby"),
+    ("Renato Silva", "Terceira Linha", "Farrapos Rugby"),
+    ("Maurício Santos", "Scrum-half", "Serra Rugby"),
+    ("Augusto Lima", "Fly-half", "Universitário Rugby"),
+    ("Caio Costa", "Centro", "ABC Rugby"),
+    ("Igor Santos", "Ponta", "Natal Rugby"),
+    ("Leandro Silva", "Fullback", "Maceió Rugby"),
+    ("Júlio César", "Pilar", "Aracaju Rugby"),
+    ("Márcio Lima", "Hooker", "Salvador Rugby"),
+    ("Nelson Costa", "Segunda Linha", "Vitória Rugby"),
+    ("Otávio Santos", "Terceira Linha", "Vila Velha Rugby"),
+    ("Pablo Silva", "Scrum-half", "Espírito Santo Rugby"),
+    ("Quintino Lima", "Fly-half", "Juiz de Fora Rugby"),
+    ("Rogério Costa", "Centro", "Uberlândia Rugby"),
+    ("Sérgio Santos", "Ponta", "Uberaba Rugby"),
+    ("Tiago Silva", "Fullback", "Montes Claros Rugby"),
+    ("Ulisses Lima", "Pilar", "Ouro Preto Rugby"),
+    ("Vitor Costa", "Hooker", "Lavras Rugby"),
+    ("Wagner Santos", "Segunda Linha", "Pouso Alegre Rugby"),
+    ("Xavier Silva", "Terceira Linha", "Poços Rugby"),
+    ("Yuri Lima", "Scrum-half", "Varginha Rugby")
+]
+
+
+def gerar_dados_mock(conn, quantidade=len(ATLETAS_MOCK), semente=0, hoje=None):
+    """
+    Insere atletas fictícios com lesões e progresso usando instruções baseadas em conjuntos.
+    A mesma semente (e a mesma data de referência) produz sempre os mesmos dados.
+    Args:
+        conn: Conexão DuckDB com permissão de escrita
+        quantidade (int): Número de atletas a gerar
+        semente (int): Semente dos valores pseudoaleatórios
+        hoje (date): Data de referência para as datas de lesão (padrão: data atual)
+    Returns:
+        int: Número de atletas inseridos
+    """
+    hoje = hoje or datetime.now().date()
+    nomes, posicoes, clubes = (list(coluna) for coluna in zip(*ATLETAS_MOCK))
+    clubes_distintos = sorted(set(clubes))
+    tipos_lesao = conn.execute("SELECT list(id ORDER BY id) FROM tipos_lesao").fetchone()[0]
+
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        # Gera todos os valores aleatórios de uma vez; hash(i, semente, campo) funciona
+        # como um gerador determinístico independente para cada coluna
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE _atletas_mock AS
+            WITH base AS (
+                SELECT
+                    i,
+                    (hash(i, $semente, 'nascimento') % 1000000007)::BIGINT AS h_nascimento,
+                    (hash(i, $semente, 'posicao') % 1000000007)::BIGINT AS h_posicao,
+                    (hash(i, $semente, 'lesao') % 1000000007)::BIGINT AS h_lesao,
+                    (hash(i, $semente, 'tipo') % 1000000007)::BIGINT AS h_tipo,
+                    (hash(i, $semente, 'data_lesao') % 1000000007)::BIGINT AS h_data_lesao,
+                    (hash(i, $semente, 'cirurgia') % 1000000007)::BIGINT AS h_cirurgia
+                FROM range($quantidade) t(i)
+            )
+            SELECT
+                i,
+                CASE WHEN i < len($nomes) THEN $nomes[i + 1]
+                     ELSE 'Atleta ' || lpad((i + 1)::VARCHAR, 7, '0') END AS nome,
+                make_date(1990 + h_nascimento % 10, 1 + h_nascimento // 10 % 12, 1 + h_nascimento // 120 % 28) AS data_nascimento,
+                CASE WHEN i < len($nomes) THEN $posicoes[i + 1]
+                     ELSE $todas_posicoes[1 + h_posicao % len($todas_posicoes)] END AS posicao,
+                CASE WHEN i < len($nomes) THEN $clubes[i + 1]
+                     ELSE $clubes_distintos[1 + h_posicao // 16 % len($clubes_distintos)] END AS clube,
+                -- 70% dos atletas possuem lesão
+                h_lesao % 100 < 70 AS tem_lesao,
+                $tipos_lesao[1 + h_tipo % len($tipos_lesao)] AS tipo_lesao_id,
+                -- Lesão nos últimos 2 anos e cirurgia alguns dias depois
+                ($hoje::DATE - (1 + h_data_lesao % 730)::INTEGER) AS data_lesao,
+                ($hoje::DATE - (1 + h_data_lesao % 730)::INTEGER + (3 + h_cirurgia % 30)::INTEGER) AS data_cirurgia
+            FROM base
+        """, {
+            'semente': semente,
+            'quantidade': quantidade,
+            'nomes': nomes,
+            'posicoes': posicoes,
+            'clubes': clubes,
+            'todas_posicoes': POSICOES,
+            'clubes_distintos': clubes_distintos,
+            'tipos_lesao': tipos_lesao,
+            'hoje': hoje,
+        })
+
+        # Insere os atletas
+        conn.execute("""
+            INSERT INTO pacientes (nome, data_nascimento, posicao, clube, data_cirurgia)
+            SELECT nome, data_nascimento, posicao, clube,
+                   CASE WHEN tem_lesao THEN data_cirurgia END
+            FROM _atletas_mock
+            ORDER BY i
+        """)
+
+        # Insere as lesões resolvendo o ID dos atletas com uma única junção
+        conn.execute("""
+            INSERT INTO lesoes (paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes)
+            SELECT p.id, m.tipo_lesao_id, m.data_lesao, m.data_cirurgia, 'Lesão durante partida oficial'
+            FROM _atletas_mock m
+            JOIN pacientes p ON p.nome = m.nome
+            WHERE m.tem_lesao
+            ORDER BY m.i
+        """)
+
+        conn.execute("DROP TABLE _atletas_mock")
+        reconstruir_resumo(conn, ['total_atletas', 'tipos_lesao_registrados'])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    # Registra o progresso na fase correspondente aos dias desde a cirurgia
+    recalcular_progresso(conn, hoje)
+
+    return quantidade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco SAGRA com dados fictícios")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    parser.add_argument('--atletas', type=int, default=len(ATLETAS_MOCK), help="Número de atletas")
+    parser.add_argument('--semente', type=int, default=0, help="Semente dos dados pseudoaleatórios")
+    args = parser.parse_args()
+
+    import duckdb
+    from banco import criar_esquema
+
+    conn = duckdb.connect(args.banco)
+    criar_esquema(conn, com_dados_mock=False)
+
+    inicio = time.perf_counter()
+    gerar_dados_mock(conn, args.atletas, args.semente)
+    print(f"{args.atletas} atletas gerados em {time.perf_counter() - inicio:.2f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# SAGRA - Escritor único do banco
+# Descrição: O DuckDB aceita um único escritor por arquivo e transações
+#            concorrentes na mesma conexão podem entrar em conflito. Todas as
+#            gravações do processo (cadastros, acompanhamento e recálculo do
+#            progresso) passam por uma fila atendida por uma única thread, que
+#            agrupa as operações pendentes em uma só transação (commit em grupo)
+#            e devolve o resultado de cada uma por um Future. As leituras seguem
+#            nos cursores do pool, cada uma vendo o último estado confirmado.
+
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+# Número máximo de operações gravadas na mesma transação
+TAMANHO_LOTE_ESCRITAS = 64
+
+# Tempo máximo de espera pela confirmação de uma escrita (em segundos)
+TEMPO_ESPERA_ESCRITA = 30
+
+
+class BancoSomenteLeitura(Exception):
+    """Escrita recusada porque o banco foi aberto em modo somente leitura"""
+
+
+def _desfazer(conn):
+    """
+    Desfaz a transação em andamento. Um COMMIT que falhou já encerrou a transação e o
+    ROLLBACK falharia ("no transaction is active"): o erro é descartado para que quem
+    chamou veja a causa original
+    """
+    try:
+        conn.execute("ROLLBACK")
+    except Exception:
+        pass
+
+
+def em_transacao(conn, operacao, *args, **kwargs):
+    """
+    Executa uma operação de escrita em uma transação própria
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        operacao (callable): Função que recebe a conexão como primeiro argumento
+    Returns:
+        Resultado da operação
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        resultado = operacao(conn, *args, **kwargs)
+        conn.execute("COMMIT")
+    except Exception:
+        _desfazer(conn)
+        raise
+    return resultado
+
+
+def executar_escrita(conn, operacao, *args, **kwargs):
+    """
+    Executa uma operação de escrita pelo escritor do banco, se o cursor tiver um
+    (cursores do pool de banco.py), ou diretamente em uma transação na conexão
+    (scripts e conexões avulsas)
+    Args:
+        conn: Conexão ou cursor DuckDB
+        operacao (callable): Função que recebe a conexão como primeiro argumento;
+                             não deve abrir nem encerrar transações
+    Returns:
+        Resultado da operação, após a confirmação da transação
+    """
+    escritor = getattr(conn, 'escritor', None)
+    if escritor is not None:
+        return escritor.executar(operacao, *args, **kwargs)
+    return em_transacao(conn, operacao, *args, **kwargs)
+
+
+class _Pedido:
+    """Operação na fila do escritor com o Future que recebe seu resultado"""
+
+    __slots__ = ('operacao', 'args', 'kwargs', 'contexto', 'futuro')
+
+    def __init__(self, operacao, args, kwargs):
+        self.operacao = operacao
+        self.args = args
+        self.kwargs = kwargs
+        # Contexto de quem pediu (mantém o rastro de instrumentação da execução)
+        self.contexto = contextvars.copy_context()
+        self.futuro = Future()
+
+    def executar(self, conn):
+        return self.contexto.run(self.operacao, conn, *self.args, **self.kwargs)
+
+
+class EscritorBanco:
+    """
+    Thread única que executa as escritas do processo em lotes
+    Args:
+        conn: Cursor DuckDB exclusivo do escritor (None para banco somente leitura)
+        tamanho_lote (int): Número máximo de operações por transação
+    """
+
+    def __init__(self, conn, tamanho_lote=TAMANHO_LOTE_ESCRITAS):
+        self._conn = conn
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.operacoes = 0
+        self.lotes = 0
+        self.maior_lote = 0
+        self.lotes_refeitos = 0
+
+    def enviar(self, operacao, *args, **kwargs):
+        """
+        Coloca uma operação na fila de escrita
+        Args:
+            operacao (callable): Função que recebe a conexão como primeiro argumento;
+                                 não deve abrir nem encerrar transações
+        Returns:
+            Future: Recebe o resultado (ou a exceção) da operação após o COMMIT
+        """
+        if self._conn is None:
+            raise BancoSomenteLeitura(
+                "Banco aberto em modo somente leitura: outro processo está gravando neste arquivo"
+            )
+        pedido = _Pedido(operacao, args, kwargs)
+        if threading.current_thread() is self._thread:
+            # Chamada de dentro de uma operação: já está na transação do lote
+            pedido.futuro.set_result(pedido.executar(self._conn))
+            return pedido.futuro
+        self._iniciar()
+        self._fila.put(pedido)
+        return pedido.futuro
+
+    def executar(self, operacao, *args, timeout=TEMPO_ESPERA_ESCRITA, **kwargs):
+        """
+        Coloca uma operação na fila e aguarda a confirmação
+        Args:
+            operacao (callable): Função que recebe a conexão como primeiro argumento
+            timeout (float): Tempo máximo de espera (None = indefinido)
+        Returns:
+            Resultado da operação
+        """
+        return self.enviar(operacao, *args, **kwargs).result(timeout)
+
+    def _iniciar(self):
+        """Inicia a thread de escrita na primeira operação"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._atender, name='escritor-banco', daemon=True)
+                self._thread.start()
+
+    def _atender(self):
+        """Laço da thread de escrita: junta as operações pendentes e grava cada lote"""
+        while True:
+            pedido = self._fila.get()
+            if pedido is None:
+                return
+            lote = [pedido]
+            encerrar = False
+            while len(lote) < self.tamanho_lote:
+                try:
+                    proximo = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    encerrar = True
+                    break
+                lote.append(proximo)
+            self._gravar(lote)
+            if encerrar:
+                return
+
+    def _gravar(self, lote):
+        """
+        Grava um lote em uma única transação. Se alguma operação falhar, o lote é
+        desfeito e as operações são refeitas uma a uma, para que só a que falhou
+        receba o erro.
+        """
+        lote = [p for p in lote if p.futuro.set_running_or_notify_cancel()]
+        if not lote:
+            return
+        try:
+            self._gravar_lote(lote)
+        except Exception as e:
+            # Falha fora das operações: os pedidos recebem o erro e a thread continua atendendo
+            for pedido in lote:
+                if not pedido.futuro.done():
+                    pedido.futuro.set_exception(e)
+
+    def _gravar_lote(self, lote):
+        """Grava os pedidos já marcados como em execução (ver _gravar)"""
+        with self._lock:
+            self.lotes += 1
+            self.operacoes += len(lote)
+            self.maior_lote = max(self.maior_lote, len(lote))
+
+        if len(lote) > 1:
+            self._conn.execute("BEGIN TRANSACTION")
+            try:
+                resultados = [p.executar(self._conn) for p in lote]
+                self._conn.execute("COMMIT")
+            except Exception:
+                _desfazer(self._conn)
+                with self._lock:
+                    self.lotes_refeitos += 1
+            else:
+                for pedido, resultado in zip(lote, resultados):
+                    pedido.futuro.set_result(resultado)
+                return
+
+        for pedido in lote:
+            try:
+                pedido.futuro.set_result(em_transacao(self._conn, pedido.executar))
+            except Exception as e:
+                pedido.futuro.set_exception(e)
+
+    def resumo(self):
+        """
+        Retorna um retrato dos contadores do escritor
+        Returns:
+            dict: Operações e lotes gravados, maior lote, lotes refeitos e operações na fila
+        """
+        with self._lock:
+            return {
+                'operacoes': self.operacoes,
+                'lotes': self.lotes,
+                'maior_lote': self.maior_lote,
+                'lotes_refeitos': self.lotes_refeitos,
+                'fila': self._fila.qsize(),
+            }
+
+    def parar(self, timeout=None):
+        """Grava as operações já enfileiradas e encerra a thread de escrita"""
+        if self._thread is None:
+            return
+        self._fila.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,120 @@
+# SAGRA - Testes do escritor único
+# Descrição: Commit em grupo, refazimento do lote que falha e recuperação de um
+#            COMMIT que falha, sobre um banco DuckDB temporário.
+
+import threading
+
+import duckdb
+import pytest
+
+from escritor import EscritorBanco, em_transacao
+
+
+@pytest.fixture
+def banco(tmp_path):
+    """Conexão com uma tabela de chaves únicas e um escritor sobre um cursor próprio"""
+    conexao = duckdb.connect(str(tmp_path / 'escritor.db'))
+    conexao.execute("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    escritor = EscritorBanco(conexao.cursor())
+    yield conexao, escritor
+    escritor.parar(timeout=5)
+    conexao.close()
+
+
+def _inserir(conn, id_):
+    conn.execute("INSERT INTO t VALUES (?)", [id_])
+    return id_
+
+
+def _bloquear(escritor):
+    """Ocupa a thread de escrita até o evento devolvido ser liberado (o próximo lote se acumula)"""
+    iniciada, liberar = threading.Event(), threading.Event()
+
+    def esperar(conn):
+        iniciada.set()
+        liberar.wait(5)
+
+    futuro = escritor.enviar(esperar)
+    assert iniciada.wait(5)
+    return liberar, futuro
+
+
+def _ids(conexao):
+    return [linha[0] for linha in conexao.execute("SELECT id FROM t ORDER BY id").fetchall()]
+
+
+def test_operacoes_pendentes_gravadas_em_um_lote(banco):
+    conexao, escritor = banco
+    liberar, bloqueio = _bloquear(escritor)
+    futuros = [escritor.enviar(_inserir, i) for i in range(1, 6)]
+    liberar.set()
+
+    assert [f.result(5) for f in futuros] == [1, 2, 3, 4, 5]
+    bloqueio.result(5)
+    resumo = escritor.resumo()
+    assert resumo['lotes'] == 2
+    assert resumo['maior_lote'] == 5
+    assert resumo['lotes_refeitos'] == 0
+    assert _ids(conexao) == [1, 2, 3, 4, 5]
+
+
+def test_lote_com_falha_refeito_uma_operacao_por_vez(banco):
+    conexao, escritor = banco
+    liberar, _ = _bloquear(escritor)
+    ok = escritor.enviar(_inserir, 1)
+    falha = escritor.enviar(_inserir, 1)
+    depois = escritor.enviar(_inserir, 2)
+    liberar.set()
+
+    assert ok.result(5) == 1
+    with pytest.raises(duckdb.ConstraintException):
+        falha.result(5)
+    assert depois.result(5) == 2
+    assert escritor.resumo()['lotes_refeitos'] == 1
+    assert _ids(conexao) == [1, 2]
+
+
+def test_commit_do_lote_que_falha_nao_encerra_o_escritor(banco):
+    conexao, escritor = banco
+    outro = conexao.cursor()
+
+    def conflitar_no_commit(conn):
+        # A mesma chave confirmada por outro cursor só é detectada no COMMIT do lote
+        conn.execute("INSERT INTO t VALUES (1)")
+        outro.execute("INSERT INTO t VALUES (1)")
+
+    liberar, _ = _bloquear(escritor)
+    conflito = escritor.enviar(conflitar_no_commit)
+    vizinha = escritor.enviar(_inserir, 2)
+    liberar.set()
+
+    with pytest.raises(duckdb.Error):
+        conflito.result(5)
+    assert vizinha.result(5) == 2
+    assert escritor.executar(_inserir, 3, timeout=5) == 3
+    assert _ids(conexao) == [1, 2, 3]
+
+
+def test_em_transacao_desfaz_a_operacao_que_falha(banco):
+    conexao, _ = banco
+
+    def inserir_e_falhar(conn):
+        conn.execute("INSERT INTO t VALUES (1)")
+        raise ValueError("falha")
+
+    with pytest.raises(ValueError):
+        em_transacao(conexao, inserir_e_falhar)
+    assert _ids(conexao) == []
+
+
+def test_em_transacao_informa_a_causa_do_commit_que_falha(banco):
+    conexao, _ = banco
+    cursor, outro = conexao.cursor(), conexao.cursor()
+
+    def conflitar_no_commit(conn):
+        conn.execute("INSERT INTO t VALUES (1)")
+        outro.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(duckdb.Error, match="Failed to commit"):
+        em_transacao(cursor, conflitar_no_commit)
+    assert em_transacao(cursor, _inserir, 2) == 2
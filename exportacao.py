@@ -0,0 +1,209 @@
+# SAGRA - Exportação analítica para Parquet
+# Descrição: Exporta pacientes, lesões, progresso e os cronogramas calculados
+#            para arquivos Parquet particionados por clube e mês da cirurgia
+#            (COPY ... TO com PARTITION_BY), para análise fora do aplicativo sem
+#            copiar o banco. A exportação é incremental e só acrescenta arquivos:
+#            cada execução grava apenas as linhas novas ou alteradas desde a
+#            anterior, identificadas pelo hash de cada linha guardado em
+#            <destino>/_estado. Tudo é lido em uma única transação de leitura, que
+#            não bloqueia o escritor; com o aplicativo em execução a exportação é
+#            agendada no próprio processo (variável SAGRA_EXPORTACAO).
+#
+# Uso: python exportacao.py --banco SAGRA.db --destino exportacao [--completa]
+#
+# Leitura: read_parquet('exportacao/pacientes/**/*.parquet', hive_partitioning = true);
+# a versão atual de cada linha é a de maior exportado_em para o mesmo id.
+
+import argparse
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from protocolo import SQL_LIMITES_FASES, SQL_PROTOCOLO_ATLETA, RegistroProtocolos
+
+# Pasta de destino da exportação agendada (None desativa o agendamento)
+DESTINO_EXPORTACAO = os.environ.get('SAGRA_EXPORTACAO')
+
+# Intervalo padrão entre exportações agendadas (em horas)
+INTERVALO_EXPORTACAO_HORAS = float(os.environ.get('SAGRA_EXPORTACAO_HORAS', '6'))
+
+# Colunas de partição de todos os conjuntos exportados
+PARTICOES = ('clube', 'mes_cirurgia')
+
+# Consulta de cada conjunto exportado; todas têm id, clube e mes_cirurgia do atleta.
+# O hash identifica a versão da linha; os cronogramas mudam com o início do tratamento e o
+# protocolo do atleta (ver protocolo.SQL_PROTOCOLO_ATLETA).
+CONJUNTOS = {
+    'pacientes': """
+        SELECT p.*, strftime(p.data_cirurgia, '%Y-%m') AS mes_cirurgia, hash(p) AS _hash
+        FROM pacientes p
+    """,
+    'lesoes': """
+        SELECT l.*, p.clube, strftime(p.data_cirurgia, '%Y-%m') AS mes_cirurgia, hash(l) AS _hash
+        FROM lesoes l
+        JOIN pacientes p ON p.id = l.paciente_id
+    """,
+    'progresso': """
+        SELECT pr.*, p.clube, strftime(p.data_cirurgia, '%Y-%m') AS mes_cirurgia, hash(pr) AS _hash
+        FROM progresso pr
+        JOIN pacientes p ON p.id = pr.paciente_id
+    """,
+    'cronogramas': f"""
+        SELECT
+            p.id * 1000 + f.ordem AS id,
+            p.id AS paciente_id,
+            f.fase_id,
+            f.fase,
+            a.inicio_tratamento + f.inicio AS data_inicio,
+            a.inicio_tratamento + f.fim AS data_fim,
+            p.clube,
+            strftime(p.data_cirurgia, '%Y-%m') AS mes_cirurgia,
+            hash(a.inicio_tratamento, p.clube, f.fase_id, f.inicio, f.fim) AS _hash
+        FROM pacientes p
+        JOIN ({SQL_PROTOCOLO_ATLETA}) a ON a.paciente_id = p.id
+        JOIN ({SQL_LIMITES_FASES}) f ON f.protocolo_id = a.protocolo_id
+    """,
+}
+
+
+def _parametros_cronograma(registro):
+    """Protocolo de cada tipo de lesão e limites de cada fase, como listas para unnest"""
+    return {**registro.parametros_atletas(), **registro.parametros_limites()}
+
+
+def _literal(texto):
+    """Texto como literal SQL (COPY ... TO não aceita o caminho como parâmetro)"""
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def exportar(conn, destino, completa=False):
+    """
+    Exporta as linhas novas ou alteradas desde a última exportação para Parquet
+    particionado por clube e mês da cirurgia
+    Args:
+        conn: Conexão ou cursor DuckDB (basta permissão de leitura)
+        destino (str): Pasta de destino
+        completa (bool): Exporta todas as linhas, ignorando o estado da execução anterior
+    Returns:
+        dict: Número de linhas exportadas por conjunto
+    """
+    destino = os.path.abspath(destino)
+    pasta_estado = os.path.join(destino, '_estado')
+    os.makedirs(pasta_estado, exist_ok=True)
+    exportado_em = datetime.now()
+    exportadas = {}
+    estados_novos = []
+
+    # Uma única transação: todos os conjuntos e seus estados vêm do mesmo instante
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        parametros_cronograma = _parametros_cronograma(RegistroProtocolos.carregar(conn))
+        for conjunto, sql in CONJUNTOS.items():
+            parametros = dict(parametros_cronograma) if conjunto == 'cronogramas' else {}
+            estado = os.path.join(pasta_estado, f'{conjunto}.parquet')
+            if os.path.exists(estado) and not completa:
+                filtro = f"""
+                    LEFT JOIN read_parquet({_literal(estado)}) e ON e.id = c.id
+                    WHERE e._hash IS DISTINCT FROM c._hash
+                """
+            else:
+                filtro = ""
+
+            parametros['exportado_em'] = exportado_em
+            exportadas[conjunto] = conn.execute(f"""
+                COPY (
+                    SELECT c.* EXCLUDE (_hash), $exportado_em::TIMESTAMP AS exportado_em
+                    FROM ({sql}) c
+                    {filtro}
+                ) TO {_literal(os.path.join(destino, conjunto))}
+                (FORMAT parquet, PARTITION_BY ({', '.join(PARTICOES)}), APPEND)
+            """, parametros).fetchone()[0]
+
+            # Estado desta execução, gravado em arquivo temporário até todos os conjuntos terminarem
+            temporario = estado + '.novo'
+            conn.execute(f"""
+                COPY (SELECT c.id, c._hash FROM ({sql}) c)
+                TO {_literal(temporario)} (FORMAT parquet)
+            """, parametros_cronograma if conjunto == 'cronogramas' else None)
+            estados_novos.append((temporario, estado))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        for temporario, _ in estados_novos:
+            os.remove(temporario)
+        raise
+
+    for temporario, estado in estados_novos:
+        os.replace(temporario, estado)
+
+    # Histórico das execuções
+    with open(os.path.join(pasta_estado, 'exportacoes.jsonl'), 'a', encoding='utf-8') as historico:
+        historico.write(json.dumps({
+            'exportado_em': exportado_em.isoformat(timespec='seconds'),
+            'completa': completa,
+            'linhas': exportadas,
+        }) + '\n')
+    return exportadas
+
+
+# Controle do agendamento no processo do aplicativo (uma thread por arquivo de banco)
+_agendamentos = {}
+_agendamento_lock = threading.Lock()
+
+
+def iniciar_exportacao_periodica(banco, destino=DESTINO_EXPORTACAO, intervalo_horas=INTERVALO_EXPORTACAO_HORAS):
+    """
+    Agenda a exportação incremental em uma thread de fundo do processo (apenas uma vez
+    por processo e banco e apenas se houver destino configurado). A primeira exportação
+    é executada imediatamente. Os bancos de clube (clubes.py) exportam para uma subpasta
+    do destino com o nome do catálogo, pois os IDs se repetem entre os arquivos.
+    Args:
+        banco (BancoDados): Banco compartilhado pelo processo
+        destino (str): Pasta de destino (None não agenda nada)
+        intervalo_horas (float): Intervalo entre exportações
+    """
+    if not destino:
+        return
+    if banco.catalogo:
+        destino = os.path.join(destino, banco.catalogo)
+    with _agendamento_lock:
+        if banco.caminho in _agendamentos:
+            return
+
+        def executar():
+            while True:
+                try:
+                    with banco.cursor() as cur:
+                        exportar(cur, destino)
+                except Exception:
+                    # Com o traceback completo: a thread não tem outra saída para o operador
+                    print(f"Erro na exportação ({banco.caminho}):", flush=True)
+                    traceback.print_exc()
+                time.sleep(intervalo_horas * 3600)
+
+        _agendamentos[banco.caminho] = threading.Thread(target=executar, name='exportacao', daemon=True)
+        _agendamentos[banco.caminho].start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os dados do SAGRA para Parquet particionado")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    parser.add_argument('--destino', default='exportacao', help="Pasta de destino")
+    parser.add_argument('--completa', action='store_true', help="Exporta todas as linhas, não só as alteradas")
+    args = parser.parse_args()
+
+    import duckdb
+
+    conn = duckdb.connect(args.banco, read_only=True)
+    inicio = time.perf_counter()
+    exportadas = exportar(conn, args.destino, args.completa)
+    print(", ".join(f"{conjunto}: {linhas}" for conjunto, linhas in exportadas.items())
+          + f" linhas exportadas em {time.perf_counter() - inicio:.2f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
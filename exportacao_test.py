@@ -0,0 +1,39 @@
+# SAGRA - Testes da exportação incremental
+# Descrição: Só as linhas novas ou alteradas desde a última exportação são
+#            acrescentadas ao Parquet particionado.
+
+from datetime import date
+
+import duckdb
+
+from exportacao import exportar
+
+
+def _linhas(destino, conjunto):
+    return duckdb.sql(f"""
+        SELECT count(*) FROM read_parquet('{destino}/{conjunto}/**/*.parquet', hive_partitioning = true)
+    """).fetchone()[0]
+
+
+def test_exporta_apenas_linhas_novas_ou_alteradas(conn, tmp_path):
+    destino = str(tmp_path / 'exportacao')
+    conn.execute("""
+        INSERT INTO pacientes (nome, clube, data_cirurgia) VALUES
+        ('Ana', 'Clube A', DATE '2024-05-10'),
+        ('Bia', 'Clube B', DATE '2024-06-01')
+    """)
+    conn.execute("INSERT INTO lesoes (paciente_id, tipo_lesao_id, data_lesao) VALUES (1, 1, DATE '2024-05-01')")
+
+    primeira = exportar(conn, destino)
+    fases = conn.execute("SELECT count(*) FROM fases_reabilitacao").fetchone()[0]
+    assert primeira == {'pacientes': 2, 'lesoes': 1, 'progresso': 0, 'cronogramas': 2 * fases}
+
+    assert exportar(conn, destino) == {'pacientes': 0, 'lesoes': 0, 'progresso': 0, 'cronogramas': 0}
+
+    # A nova data de cirurgia altera o atleta e todo o seu cronograma
+    conn.execute("UPDATE pacientes SET data_cirurgia = ? WHERE nome = 'Bia'", [date(2024, 7, 1)])
+    assert exportar(conn, destino) == {'pacientes': 1, 'lesoes': 0, 'progresso': 0, 'cronogramas': fases}
+    assert _linhas(destino, 'pacientes') == 3
+
+    # A exportação completa regrava tudo
+    assert exportar(conn, destino, completa=True)['pacientes'] == 2
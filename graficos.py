@@ -0,0 +1,122 @@
+# SAGRA - Gráficos
+# Descrição: Monta as figuras Plotly da interface a partir de dados simples e as
+#            guarda em cache pela chave dos dados de entrada: a mesma contagem de
+#            exercícios ou o mesmo histórico de fases reaproveitam a figura já
+#            montada, em qualquer sessão do processo. As figuras em cache são
+#            compartilhadas e não devem ser alteradas por quem as recebe.
+
+from functools import lru_cache
+
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Número máximo de figuras mantidas em cache por tipo de gráfico
+MAXIMO_FIGURAS_CACHE = 256
+
+# Cores do status dos exercícios
+CORES_STATUS = {
+    'Completo': 'green',
+    'Em Progressão': 'orange',
+    'Com Restrição': 'red',
+}
+
+
+@lru_cache(maxsize=MAXIMO_FIGURAS_CACHE)
+def _figura_status(contagem):
+    figura = go.Figure(go.Pie(
+        labels=[rotulo for rotulo, _ in contagem],
+        values=[valor for _, valor in contagem],
+        marker_colors=[CORES_STATUS.get(rotulo) for rotulo, _ in contagem],
+    ))
+    figura.update_layout(title='Distribuição dos Exercícios por Status')
+    return figura
+
+
+def grafico_status_exercicios(contagem):
+    """
+    Gráfico de pizza dos exercícios por status
+    Args:
+        contagem (dict): Número de exercícios por rótulo de status
+    Returns:
+        go.Figure: Figura em cache (não alterar)
+    """
+    return _figura_status(tuple(contagem.items()))
+
+
+@lru_cache(maxsize=MAXIMO_FIGURAS_CACHE)
+def _figura_duracao_fases(fases, dias):
+    # Um único trace com uma barra por fase, cada uma com uma cor da paleta padrão
+    paleta = qualitative.Plotly
+    figura = go.Figure(go.Bar(
+        x=list(fases),
+        y=list(dias),
+        text=[f"{d:.0f} dias" for d in dias],
+        textposition='auto',
+        marker_color=[paleta[i % len(paleta)] for i in range(len(fases))],
+    ))
+    figura.update_layout(
+        title="Duração de Cada Fase (em dias)",
+        xaxis_title="Fases",
+        yaxis_title="Dias",
+        showlegend=False
+    )
+    return figura
+
+
+def grafico_duracao_fases(historico):
+    """
+    Gráfico de barras da duração de cada fase do histórico de um atleta
+    Args:
+        historico (list): Fases do histórico (dicionários com 'fase' e 'dias_fase'), em ordem
+    Returns:
+        go.Figure: Figura em cache (não alterar)
+    """
+    return _figura_duracao_fases(
+        tuple(fase['fase'] for fase in historico),
+        tuple(fase['dias_fase'] for fase in historico),
+    )
+
+
+@lru_cache(maxsize=MAXIMO_FIGURAS_CACHE)
+def _figura_evolucao_sessoes(semanas, carga, amplitude, dor):
+    # Carga e amplitude no eixo da esquerda; dor (0 a 10) no eixo da direita
+    figura = go.Figure([
+        go.Scatter(x=list(semanas), y=list(carga), name="Carga máxima (kg)", mode='lines+markers'),
+        go.Scatter(x=list(semanas), y=list(amplitude), name="Amplitude máxima (graus)", mode='lines+markers'),
+        go.Scatter(x=list(semanas), y=list(dor), name="Dor média", mode='lines+markers', yaxis='y2',
+                   line={'dash': 'dot'}),
+    ])
+    figura.update_layout(
+        title="Evolução Semanal das Sessões",
+        xaxis_title="Semana",
+        yaxis={'title': "Carga (kg) / Amplitude (graus)"},
+        yaxis2={'title': "Dor (0 a 10)", 'overlaying': 'y', 'side': 'right', 'range': [0, 10]},
+        legend={'orientation': 'h', 'y': -0.2},
+    )
+    return figura
+
+
+def grafico_evolucao_sessoes(curva):
+    """
+    Gráfico de linhas da carga, amplitude e dor semanais de um atleta
+    Args:
+        curva (DataFrame): Evolução semanal (ver sessoes.curva_semanal)
+    Returns:
+        go.Figure: Figura em cache (não alterar)
+    """
+    def valores(coluna):
+        return tuple(None if v != v else float(v) for v in curva[coluna])
+
+    return _figura_evolucao_sessoes(
+        tuple(curva['semana']),
+        valores('carga_maxima_kg'),
+        valores('amplitude_maxima_graus'),
+        valores('dor_media'),
+    )
+
+
+def invalidar_graficos():
+    """Descarta as figuras em cache"""
+    _figura_status.cache_clear()
+    _figura_duracao_fases.cache_clear()
+    _figura_evolucao_sessoes.cache_clear()
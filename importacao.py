@@ -0,0 +1,220 @@
+# SAGRA - Importação em lote
+# Descrição: Importa atletas e lesões de arquivos CSV ou Parquet lidos
+#            diretamente pelo DuckDB (read_csv/read_parquet). A validação
+#            (campos obrigatórios, datas, posições, tipos de lesão e atletas) é
+#            feita em SQL sobre o arquivo inteiro, os atletas das lesões são
+#            resolvidos com uma única junção e as linhas válidas entram com um
+#            único INSERT ... SELECT. As linhas recusadas voltam com o motivo.
+#
+# Uso: python importacao.py atletas novos_atletas.csv --banco SAGRA.db
+#      python importacao.py lesoes lesoes.parquet --banco SAGRA.db --rejeitadas rejeitadas.csv
+#
+# Colunas (a primeira linha do CSV é o cabeçalho; datas em AAAA-MM-DD ou DD/MM/AAAA):
+#   atletas: nome, data_nascimento, posicao, clube, data_cirurgia
+#   lesoes:  atleta (nome do atleta), tipo_lesao (nome do tipo), data_lesao, data_cirurgia, observacoes
+
+import argparse
+import os
+import time
+
+from cadastro import POSICOES, contador_escritas
+from coortes import invalidar_coortes
+from escritor import executar_escrita
+from listas import invalidar_atletas, invalidar_lesoes
+from resumo import reconstruir_resumo
+from risco import invalidar_risco
+
+# Colunas de cada tipo de importação; as obrigatórias vêm primeiro
+COLUNAS_IMPORTACAO = {
+    'atletas': ['nome', 'data_nascimento', 'posicao', 'clube', 'data_cirurgia'],
+    'lesoes': ['atleta', 'tipo_lesao', 'data_lesao', 'data_cirurgia', 'observacoes'],
+}
+COLUNAS_OBRIGATORIAS = {
+    'atletas': ['nome'],
+    'lesoes': ['atleta', 'tipo_lesao'],
+}
+
+
+def _data(coluna):
+    """Expressão SQL que converte texto em data (AAAA-MM-DD ou DD/MM/AAAA), NULL se inválido"""
+    return f"COALESCE(TRY_CAST({coluna} AS DATE), try_strptime({coluna}, '%d/%m/%Y')::DATE)"
+
+
+def _data_invalida(coluna):
+    """Expressão SQL verdadeira quando a coluna tem valor que não é uma data"""
+    return f"({coluna} IS NOT NULL AND {_data(coluna)} IS NULL)"
+
+
+# Validação e inserção de cada tipo; _arquivo tem as colunas do tipo (texto) e o número da linha
+_VALIDACAO = {
+    'atletas': f"""
+        CREATE OR REPLACE TEMP TABLE _validado AS
+        SELECT
+            a.*,
+            CASE
+                WHEN a.nome IS NULL THEN 'nome vazio'
+                WHEN a.posicao IS NOT NULL AND a.posicao NOT IN (SELECT unnest($posicoes)) THEN 'posição inválida'
+                WHEN $clube IS NOT NULL AND a.clube IS NOT NULL AND a.clube <> $clube THEN 'clube diferente do banco'
+                WHEN {_data_invalida('a.data_nascimento')} THEN 'data_nascimento inválida'
+                WHEN {_data_invalida('a.data_cirurgia')} THEN 'data_cirurgia inválida'
+                WHEN row_number() OVER (PARTITION BY a.nome ORDER BY a.linha) > 1 THEN 'nome repetido no arquivo'
+                WHEN p.id IS NOT NULL THEN 'atleta já cadastrado'
+            END AS motivo
+        FROM _arquivo a
+        LEFT JOIN pacientes p ON p.nome = a.nome
+    """,
+    'lesoes': f"""
+        CREATE OR REPLACE TEMP TABLE _validado AS
+        SELECT
+            a.*,
+            p.id AS paciente_id,
+            t.id AS tipo_lesao_id,
+            CASE
+                WHEN a.atleta IS NULL THEN 'atleta vazio'
+                WHEN a.tipo_lesao IS NULL THEN 'tipo_lesao vazio'
+                WHEN p.id IS NULL THEN 'atleta não encontrado'
+                WHEN t.id IS NULL THEN 'tipo de lesão desconhecido'
+                WHEN {_data_invalida('a.data_lesao')} THEN 'data_lesao inválida'
+                WHEN {_data_invalida('a.data_cirurgia')} THEN 'data_cirurgia inválida'
+            END AS motivo
+        FROM _arquivo a
+        LEFT JOIN pacientes p ON p.nome = a.atleta
+        LEFT JOIN tipos_lesao t ON lower(t.nome) = lower(a.tipo_lesao)
+    """,
+}
+
+_INSERCAO = {
+    'atletas': f"""
+        INSERT INTO pacientes (nome, data_nascimento, posicao, clube, data_cirurgia)
+        SELECT nome, {_data('data_nascimento')}, posicao, COALESCE(clube, $clube), {_data('data_cirurgia')}
+        FROM _validado
+        WHERE motivo IS NULL
+        ORDER BY linha
+    """,
+    'lesoes': f"""
+        INSERT INTO lesoes (paciente_id, tipo_lesao_id, data_lesao, data_cirurgia, observacoes)
+        SELECT paciente_id, tipo_lesao_id, {_data('data_lesao')}, {_data('data_cirurgia')}, observacoes
+        FROM _validado
+        WHERE motivo IS NULL
+        ORDER BY linha
+    """,
+}
+
+# Métricas do resumo afetadas por cada tipo
+_METRICAS = {
+    'atletas': ['total_atletas'],
+    'lesoes': ['tipos_lesao_registrados'],
+}
+
+
+def _leitura(caminho):
+    """Função de tabela do DuckDB que lê o arquivo, pela extensão"""
+    if caminho.lower().endswith(('.parquet', '.pq')):
+        return "read_parquet($caminho)"
+    return "read_csv($caminho, header = true, all_varchar = true)"
+
+
+def _importar(conn, tipo, caminho, clube):
+    """
+    Lê, valida e insere o arquivo na transação em andamento (ver importar_arquivo)
+    Returns:
+        dict: Linhas lidas, linhas importadas e DataFrame das linhas recusadas
+    """
+    leitura = _leitura(caminho)
+    presentes = {linha[0].lower(): linha[0] for linha in conn.execute(
+        f"DESCRIBE SELECT * FROM {leitura}", {'caminho': caminho}
+    ).fetchall()}
+    faltando = [c for c in COLUNAS_OBRIGATORIAS[tipo] if c not in presentes]
+    if faltando:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s) no arquivo: {', '.join(faltando)}")
+
+    # Colunas do tipo como texto sem espaços nas pontas ('' vira NULL); as ausentes ficam NULL
+    colunas = ", ".join(
+        f"NULLIF(trim(CAST(\"{presentes[c]}\" AS VARCHAR)), '') AS {c}" if c in presentes else f"NULL::VARCHAR AS {c}"
+        for c in COLUNAS_IMPORTACAO[tipo]
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _arquivo AS
+        SELECT row_number() OVER () AS linha, {colunas}
+        FROM {leitura}
+    """, {'caminho': caminho})
+    if tipo == 'atletas':
+        conn.execute(_VALIDACAO[tipo], {'posicoes': POSICOES, 'clube': clube})
+        importadas = conn.execute(_INSERCAO[tipo], {'clube': clube}).fetchone()[0]
+    else:
+        conn.execute(_VALIDACAO[tipo])
+        importadas = conn.execute(_INSERCAO[tipo]).fetchone()[0]
+    lidas = conn.execute("SELECT count(*) FROM _arquivo").fetchone()[0]
+    rejeitadas = conn.execute(f"""
+        SELECT linha, motivo, {', '.join(COLUNAS_IMPORTACAO[tipo])}
+        FROM _validado
+        WHERE motivo IS NOT NULL
+        ORDER BY linha
+    """).df()
+    conn.execute("DROP TABLE _validado")
+    conn.execute("DROP TABLE _arquivo")
+
+    if importadas:
+        reconstruir_resumo(conn, _METRICAS[tipo])
+    return {'lidas': lidas, 'importadas': importadas, 'rejeitadas': rejeitadas}
+
+
+def importar_arquivo(conn, tipo, caminho, clube=None):
+    """
+    Importa atletas ou lesões de um arquivo CSV ou Parquet em uma única transação
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        tipo (str): 'atletas' ou 'lesoes'
+        caminho (str): Caminho do arquivo (.csv ou .parquet)
+        clube (str): Clube do banco no modo por clube: atletas sem clube recebem este
+                     e os de outro clube são recusados (None aceita qualquer clube)
+    Returns:
+        dict: 'lidas' e 'importadas' (int) e 'rejeitadas' (DataFrame com a posição da
+              linha no arquivo, sem contar o cabeçalho, o motivo e as colunas lidas)
+    """
+    if tipo not in COLUNAS_IMPORTACAO:
+        raise ValueError(f"Tipo de importação inválido: {tipo}")
+    resultado = executar_escrita(conn, _importar, tipo, os.path.abspath(caminho), clube)
+    if resultado['importadas']:
+        contador_escritas.registrar(emitidas=1)
+        if tipo == 'atletas':
+            invalidar_atletas()
+            invalidar_coortes('pacientes')
+            invalidar_risco('pacientes')
+        else:
+            invalidar_lesoes()
+            invalidar_coortes('lesoes')
+            invalidar_risco('lesoes')
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa atletas ou lesões de arquivos CSV/Parquet")
+    parser.add_argument('tipo', choices=list(COLUNAS_IMPORTACAO), help="Conteúdo do arquivo")
+    parser.add_argument('arquivo', help="Arquivo .csv ou .parquet")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    parser.add_argument('--rejeitadas', help="Arquivo CSV para gravar as linhas recusadas")
+    parser.add_argument('--clube', help="Clube do banco (modo por clube): recusa atletas de outros clubes")
+    args = parser.parse_args()
+
+    import duckdb
+
+    from migracoes import atualizar_esquema
+
+    conn = duckdb.connect(args.banco)
+    atualizar_esquema(conn)
+    inicio = time.perf_counter()
+    resultado = importar_arquivo(conn, args.tipo, args.arquivo, args.clube)
+    print(f"{resultado['importadas']} de {resultado['lidas']} linhas importadas "
+          f"em {time.perf_counter() - inicio:.2f}s")
+    rejeitadas = resultado['rejeitadas']
+    if len(rejeitadas):
+        print(f"{len(rejeitadas)} linhas recusadas:")
+        print(rejeitadas.groupby('motivo').size().to_string())
+        if args.rejeitadas:
+            rejeitadas.to_csv(args.rejeitadas, index=False)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
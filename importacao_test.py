@@ -0,0 +1,127 @@
+# SAGRA - Testes da importação em lote
+# Descrição: Validação das linhas (com o motivo de cada recusa), inserção das
+#            válidas, resolução dos atletas das lesões e clube do banco.
+
+from datetime import date
+
+import pytest
+
+from importacao import importar_arquivo
+from resumo import ler_resumo
+
+
+def _csv(tmp_path, nome, conteudo):
+    caminho = tmp_path / nome
+    caminho.write_text(conteudo, encoding='utf-8')
+    return str(caminho)
+
+
+def _motivos(resultado):
+    """Motivo de cada linha recusada, pela posição no arquivo"""
+    return dict(zip(resultado['rejeitadas']['linha'], resultado['rejeitadas']['motivo']))
+
+
+def test_atletas_validos_importados_e_invalidos_recusados(conn, tmp_path):
+    conn.execute("INSERT INTO pacientes (nome) VALUES ('Já Cadastrado')")
+    caminho = _csv(tmp_path, 'atletas.csv', (
+        "nome,data_nascimento,posicao,clube,data_cirurgia\n"
+        "Ana,2000-01-31,Pilar,Clube A,2024-05-10\n"
+        "Bia,31/01/2001,,Clube B,\n"
+        ",2000-01-01,Pilar,Clube A,\n"
+        "Caio,2000-01-01,Goleiro,Clube A,\n"
+        "Davi,2000-13-01,Pilar,Clube A,\n"
+        "Enzo,2000-01-01,Pilar,Clube A,ontem\n"
+        "Ana,2000-01-01,Ponta,Clube A,\n"
+        "Já Cadastrado,,,,\n"
+    ))
+
+    resultado = importar_arquivo(conn, 'atletas', caminho)
+
+    assert resultado['lidas'] == 8
+    assert resultado['importadas'] == 2
+    assert _motivos(resultado) == {
+        3: 'nome vazio',
+        4: 'posição inválida',
+        5: 'data_nascimento inválida',
+        6: 'data_cirurgia inválida',
+        7: 'nome repetido no arquivo',
+        8: 'atleta já cadastrado',
+    }
+    assert conn.execute("""
+        SELECT nome, data_nascimento, posicao, clube, data_cirurgia
+        FROM pacientes WHERE nome IN ('Ana', 'Bia') ORDER BY nome
+    """).fetchall() == [
+        ('Ana', date(2000, 1, 31), 'Pilar', 'Clube A', date(2024, 5, 10)),
+        ('Bia', date(2001, 1, 31), None, 'Clube B', None),
+    ]
+    assert ler_resumo(conn)['total_atletas'] == 3
+
+
+def test_lesoes_resolvem_atleta_e_tipo_pelo_nome(conn, tmp_path):
+    conn.execute("INSERT INTO pacientes (nome) VALUES ('Ana'), ('Bia')")
+    caminho = _csv(tmp_path, 'lesoes.csv', (
+        "atleta,tipo_lesao,data_lesao,data_cirurgia,observacoes\n"
+        "Ana,lca,2024-05-01,2024-05-10,Contato\n"
+        "Bia,Menisco,2024-06-01,,\n"
+        "Zé,LCA,2024-05-01,,\n"
+        "Ana,Desconhecida,2024-05-01,,\n"
+        "Ana,,2024-05-01,,\n"
+        "Bia,LCA,01-06-2024,,\n"
+    ))
+
+    resultado = importar_arquivo(conn, 'lesoes', caminho)
+
+    assert resultado['importadas'] == 2
+    assert _motivos(resultado) == {
+        3: 'atleta não encontrado',
+        4: 'tipo de lesão desconhecido',
+        5: 'tipo_lesao vazio',
+        6: 'data_lesao inválida',
+    }
+    assert conn.execute("""
+        SELECT p.nome, t.nome, l.data_lesao, l.data_cirurgia, l.observacoes
+        FROM lesoes l
+        JOIN pacientes p ON p.id = l.paciente_id
+        JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+        ORDER BY p.nome
+    """).fetchall() == [
+        ('Ana', 'LCA', date(2024, 5, 1), date(2024, 5, 10), 'Contato'),
+        ('Bia', 'Menisco', date(2024, 6, 1), None, None),
+    ]
+    assert ler_resumo(conn)['tipos_lesao_registrados'] == 2
+
+
+def test_parquet_com_colunas_opcionais_ausentes(conn, tmp_path):
+    caminho = str(tmp_path / 'atletas.parquet')
+    conn.execute(f"COPY (SELECT 'Ana' AS Nome, DATE '2024-05-10' AS data_cirurgia) TO '{caminho}' (FORMAT parquet)")
+
+    resultado = importar_arquivo(conn, 'atletas', caminho)
+
+    assert resultado['importadas'] == 1
+    assert conn.execute("SELECT nome, posicao, data_cirurgia FROM pacientes").fetchall() == [
+        ('Ana', None, date(2024, 5, 10))
+    ]
+
+
+def test_coluna_obrigatoria_ausente(conn, tmp_path):
+    caminho = _csv(tmp_path, 'lesoes.csv', "atleta,data_lesao\nAna,2024-05-01\n")
+    with pytest.raises(ValueError, match="tipo_lesao"):
+        importar_arquivo(conn, 'lesoes', caminho)
+    assert conn.execute("SELECT count(*) FROM lesoes").fetchone()[0] == 0
+
+
+def test_clube_do_banco_aplicado_e_outros_clubes_recusados(conn, tmp_path):
+    caminho = _csv(tmp_path, 'atletas.csv', (
+        "nome,clube\n"
+        "Ana,\n"
+        "Bia,Clube A\n"
+        "Caio,Clube B\n"
+    ))
+
+    resultado = importar_arquivo(conn, 'atletas', caminho, clube='Clube A')
+
+    assert resultado['importadas'] == 2
+    assert _motivos(resultado) == {3: 'clube diferente do banco'}
+    assert conn.execute("SELECT nome, clube FROM pacientes ORDER BY nome").fetchall() == [
+        ('Ana', 'Clube A'), ('Bia', 'Clube A')
+    ]
@@ -0,0 +1,267 @@
+# SAGRA - Instrumentação por execução
+# Descrição: Instrumentação opcional (variável SAGRA_PERFIL=1) que mede cada
+#            execução do script: seções da tela, consultas ao banco (tempo e
+#            linhas lidas) e tempo total. Os rastros são gravados em JSONL, um
+#            por execução, e podem ser agregados por tela para achar as mais
+#            lentas. Desativada, cada ponto de medição custa uma leitura de
+#            ContextVar.
+#
+# Uso: SAGRA_PERFIL=1 streamlit run sagra.py
+#      python instrumentacao.py sagra_perfil.jsonl [--top 10]
+
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Liga a instrumentação (desligada por padrão)
+PERFIL_ATIVO = os.environ.get('SAGRA_PERFIL') == '1'
+
+# Arquivo JSONL onde os rastros de cada execução são acrescentados
+ARQUIVO_RASTROS = os.environ.get('SAGRA_PERFIL_ARQUIVO', 'sagra_perfil.jsonl')
+
+# Número máximo de consultas guardadas por rastro (as demais só entram nos totais)
+MAXIMO_CONSULTAS_RASTRO = 500
+
+# Tamanho máximo do texto SQL guardado por consulta
+TAMANHO_SQL_RASTRO = 200
+
+# Rastro da execução em andamento na thread (ou no contexto assíncrono) atual
+_rastro_atual = contextvars.ContextVar('rastro_sagra', default=None)
+
+# Serializa a gravação no arquivo de rastros entre as sessões do processo
+_arquivo_lock = threading.Lock()
+
+
+class Rastro:
+    """
+    Medições de uma execução do script: seções, consultas e tempo total
+    Args:
+        tela (str): Nome da tela (pode ser definido depois, com definir_tela)
+    """
+
+    def __init__(self, tela=''):
+        self.tela = tela
+        self.data = datetime.now().isoformat(timespec='milliseconds')
+        self.inicio = time.perf_counter()
+        self.secoes = []
+        self.consultas = []
+        self.total_consultas = 0
+        self.tempo_consultas = 0.0
+        self.linhas_lidas = 0
+        self._pilha = []
+
+    def duracao_ms(self):
+        """Tempo desde o início da execução, em milissegundos"""
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def como_dict(self):
+        """
+        Retorna o rastro em formato serializável
+        Returns:
+            dict: Tela, data, duração total, totais de consultas, seções e consultas
+        """
+        return {
+            'data': self.data,
+            'tela': self.tela,
+            'duracao_ms': round(self.duracao_ms(), 3),
+            'consultas': self.total_consultas,
+            'tempo_consultas_ms': round(self.tempo_consultas, 3),
+            'linhas_lidas': self.linhas_lidas,
+            'secoes': self.secoes,
+            'detalhe_consultas': self.consultas,
+        }
+
+
+def iniciar_rastro(tela=''):
+    """
+    Começa o rastro da execução atual, se a instrumentação estiver ativa
+    Args:
+        tela (str): Nome da tela
+    Returns:
+        Rastro: Rastro iniciado (None com a instrumentação desligada)
+    """
+    if not PERFIL_ATIVO:
+        return None
+    rastro = Rastro(tela)
+    _rastro_atual.set(rastro)
+    return rastro
+
+
+def rastro_atual():
+    """Retorna o rastro da execução atual (None se não houver)"""
+    return _rastro_atual.get()
+
+
+def definir_tela(tela):
+    """Define o nome da tela do rastro atual"""
+    rastro = _rastro_atual.get()
+    if rastro is not None:
+        rastro.tela = tela
+
+
+@contextmanager
+def secao(nome):
+    """
+    Mede um trecho da execução (tempo, consultas e linhas lidas dentro dele)
+    Args:
+        nome (str): Nome da seção; seções aninhadas recebem o nome da seção externa como prefixo
+    """
+    rastro = _rastro_atual.get()
+    if rastro is None:
+        yield
+        return
+
+    nome_completo = '/'.join(rastro._pilha + [nome])
+    rastro._pilha.append(nome)
+    consultas, linhas = rastro.total_consultas, rastro.linhas_lidas
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        rastro._pilha.pop()
+        rastro.secoes.append({
+            'secao': nome_completo,
+            'duracao_ms': round((time.perf_counter() - inicio) * 1000, 3),
+            'consultas': rastro.total_consultas - consultas,
+            'linhas_lidas': rastro.linhas_lidas - linhas,
+        })
+
+
+def registrar_consulta(sql, duracao):
+    """
+    Registra a execução de uma consulta no rastro atual (chamada por banco.CursorMedido)
+    Args:
+        sql (str): Texto da consulta
+        duracao (float): Duração da execução em segundos
+    Returns:
+        dict: Registro da consulta, completado pela leitura do resultado (None sem rastro)
+    """
+    rastro = _rastro_atual.get()
+    if rastro is None:
+        return None
+    rastro.total_consultas += 1
+    rastro.tempo_consultas += duracao * 1000
+    consulta = {
+        'sql': ' '.join(sql.split())[:TAMANHO_SQL_RASTRO],
+        'secao': '/'.join(rastro._pilha),
+        'duracao_ms': round(duracao * 1000, 3),
+        'linhas': None,
+    }
+    if len(rastro.consultas) < MAXIMO_CONSULTAS_RASTRO:
+        rastro.consultas.append(consulta)
+    return consulta
+
+
+def registrar_leitura(consulta, duracao, resultado):
+    """
+    Soma a leitura do resultado à consulta registrada
+    Args:
+        consulta (dict): Registro retornado por registrar_consulta (None é ignorado)
+        duracao (float): Duração da leitura em segundos
+        resultado: Valor lido (DataFrame, lista de linhas, linha ou tabela Arrow)
+    """
+    rastro = _rastro_atual.get()
+    if rastro is None or consulta is None:
+        return
+    if resultado is None:
+        linhas = 0
+    elif isinstance(resultado, tuple):
+        linhas = 1
+    elif hasattr(resultado, 'num_rows'):
+        linhas = resultado.num_rows
+    else:
+        try:
+            linhas = len(resultado)
+        except TypeError:
+            linhas = 0
+    rastro.tempo_consultas += duracao * 1000
+    rastro.linhas_lidas += linhas
+    consulta['duracao_ms'] = round(consulta['duracao_ms'] + duracao * 1000, 3)
+    consulta['linhas'] = (consulta['linhas'] or 0) + linhas
+
+
+def finalizar_rastro(rastro, arquivo=None):
+    """
+    Encerra o rastro e acrescenta uma linha ao arquivo JSONL
+    Args:
+        rastro (Rastro): Rastro a encerrar (None é ignorado)
+        arquivo (str): Arquivo de rastros (padrão: ARQUIVO_RASTROS)
+    Returns:
+        dict: Rastro gravado (None sem rastro)
+    """
+    if rastro is None:
+        return None
+    if _rastro_atual.get() is rastro:
+        _rastro_atual.set(None)
+    registro = rastro.como_dict()
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _arquivo_lock:
+        with open(arquivo or ARQUIVO_RASTROS, 'a', encoding='utf-8') as saida:
+            saida.write(linha + '\n')
+    return registro
+
+
+def _percentil(valores, p):
+    """Percentil por posição mais próxima"""
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * p / 100)))]
+
+
+def _estatisticas(duracoes):
+    return {
+        'execucoes': len(duracoes),
+        'p50_ms': round(_percentil(duracoes, 50), 3),
+        'p95_ms': round(_percentil(duracoes, 95), 3),
+        'max_ms': round(max(duracoes), 3),
+    }
+
+
+def agregar_rastros(caminho):
+    """
+    Agrega um arquivo de rastros por tela, por seção e por consulta
+    Args:
+        caminho (str): Arquivo JSONL gravado por finalizar_rastro
+    Returns:
+        dict: 'telas', 'secoes' e 'consultas', cada um com estatísticas de duração por nome,
+              em ordem decrescente de p95
+    """
+    telas, secoes, consultas = {}, {}, {}
+    with open(caminho, encoding='utf-8') as entrada:
+        for linha in entrada:
+            if not linha.strip():
+                continue
+            rastro = json.loads(linha)
+            telas.setdefault(rastro['tela'] or '(sem tela)', []).append(rastro['duracao_ms'])
+            for s in rastro['secoes']:
+                secoes.setdefault(s['secao'], []).append(s['duracao_ms'])
+            for c in rastro['detalhe_consultas']:
+                consultas.setdefault(c['sql'], []).append(c['duracao_ms'])
+
+    def ordenar(grupos):
+        estatisticas = {nome: _estatisticas(duracoes) for nome, duracoes in grupos.items()}
+        return dict(sorted(estatisticas.items(), key=lambda item: item[1]['p95_ms'], reverse=True))
+
+    return {'telas': ordenar(telas), 'secoes': ordenar(secoes), 'consultas': ordenar(consultas)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega os rastros de execução do SAGRA")
+    parser.add_argument('arquivo', nargs='?', default=ARQUIVO_RASTROS, help="Arquivo JSONL de rastros")
+    parser.add_argument('--top', type=int, default=10, help="Linhas exibidas por grupo")
+    args = parser.parse_args()
+
+    agregado = agregar_rastros(args.arquivo)
+    for grupo, titulo in (('telas', 'Telas'), ('secoes', 'Seções'), ('consultas', 'Consultas')):
+        print(f"\n{titulo} (por p95)")
+        print(f"{'execuções':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'máx (ms)':>10}  nome")
+        for nome, e in list(agregado[grupo].items())[:args.top]:
+            print(f"{e['execucoes']:>10} {e['p50_ms']:>10.2f} {e['p95_ms']:>10.2f} {e['max_ms']:>10.2f}  {nome}")
+
+
+if __name__ == '__main__':
+    main()
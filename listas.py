@@ -0,0 +1,140 @@
+# SAGRA - Listas de opções da interface
+# Descrição: Mantém em cache, com validade limitada, as listas usadas nos seletores
+#            (tipos de lesão e atletas). As operações de escrita de cadastro.py
+#            invalidam as listas afetadas; gravações feitas por outros processos
+#            aparecem quando a validade expira.
+
+import threading
+import time
+
+# Validade das listas em cache (em segundos)
+VALIDADE_LISTAS_SEGUNDOS = 300
+
+# Número máximo de atletas retornados por busca de prefixo
+LIMITE_BUSCA_ATLETAS = 20
+
+# Número máximo de valores mantidos em cache (cada prefixo buscado ocupa um)
+MAXIMO_ITENS_CACHE = 1000
+
+
+class CacheValidade:
+    """
+    Cache de valores com validade, compartilhado pelas sessões do processo.
+    As chaves são tuplas cujo primeiro elemento identifica a lista; valores de bancos
+    diferentes (modo por clube) levam a origem da conexão na chave.
+    """
+
+    def __init__(self, validade=VALIDADE_LISTAS_SEGUNDOS):
+        self.validade = validade
+        self._lock = threading.Lock()
+        self._itens = {}
+
+    def obter(self, chave, carregar):
+        """
+        Retorna o valor em cache ou carrega e guarda um novo se não houver ou se tiver expirado
+        Args:
+            chave (tuple): Chave do valor
+            carregar (callable): Função sem argumentos que carrega o valor
+        Returns:
+            Valor em cache
+        """
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+        if item is not None and item[0] > agora:
+            return item[1]
+
+        valor = carregar()
+        with self._lock:
+            if len(self._itens) >= MAXIMO_ITENS_CACHE:
+                # Descarta os expirados; se ainda estiver cheio, recomeça do zero
+                self._itens = {k: v for k, v in self._itens.items() if v[0] > agora}
+                if len(self._itens) >= MAXIMO_ITENS_CACHE:
+                    self._itens.clear()
+            self._itens[chave] = (agora + self.validade, valor)
+        return valor
+
+    def invalidar(self, *listas):
+        """
+        Descarta os valores em cache
+        Args:
+            listas (str): Listas a descartar (nenhuma para descartar todas)
+        """
+        with self._lock:
+            if not listas:
+                self._itens.clear()
+            else:
+                self._itens = {k: v for k, v in self._itens.items() if k[0] not in listas}
+
+
+# Cache compartilhado pelo processo
+cache_listas = CacheValidade()
+
+
+def origem(conn):
+    """Banco de origem de um cursor do pool (None para conexões avulsas), para as chaves dos caches"""
+    return getattr(conn, 'origem', None)
+
+
+def tipos_lesao(conn):
+    """
+    Retorna todos os tipos de lesão cadastrados
+    Args:
+        conn: Conexão ou cursor DuckDB
+    Returns:
+        dict: ID de cada tipo de lesão, pelo nome, na ordem de cadastro
+    """
+    return cache_listas.obter(('tipos_lesao', origem(conn)), lambda: dict(conn.execute("""
+        SELECT nome, id FROM tipos_lesao ORDER BY id
+    """).fetchall()))
+
+
+def tipos_lesao_registrados(conn):
+    """
+    Retorna os tipos de lesão que têm ao menos uma lesão registrada
+    Args:
+        conn: Conexão ou cursor DuckDB
+    Returns:
+        dict: ID de cada tipo de lesão, pelo nome, em ordem alfabética
+    """
+    return cache_listas.obter(('lesoes', origem(conn)), lambda: dict(conn.execute("""
+        SELECT t.nome, t.id
+        FROM tipos_lesao t
+        WHERE EXISTS (SELECT 1 FROM lesoes l WHERE l.tipo_lesao_id = t.id)
+        ORDER BY t.nome
+    """).fetchall()))
+
+
+def buscar_atletas(conn, prefixo='', limite=LIMITE_BUSCA_ATLETAS):
+    """
+    Busca os atletas cujo nome começa pelo prefixo (sem diferenciar maiúsculas)
+    Args:
+        conn: Conexão ou cursor DuckDB
+        prefixo (str): Início do nome ('' para os primeiros em ordem alfabética)
+        limite (int): Número máximo de atletas retornados
+    Returns:
+        dict: ID de cada atleta encontrado, pelo nome, em ordem alfabética
+    """
+    prefixo = prefixo.strip().lower()
+    return cache_listas.obter(('atletas', prefixo, limite, origem(conn)), lambda: dict(conn.execute("""
+        SELECT nome, id
+        FROM pacientes
+        WHERE starts_with(lower(nome), ?)
+        ORDER BY nome
+        LIMIT ?
+    """, [prefixo, limite]).fetchall()))
+
+
+def invalidar_atletas():
+    """Descarta as buscas de atletas em cache; deve ser chamada após gravar em pacientes"""
+    cache_listas.invalidar('atletas')
+
+
+def invalidar_lesoes():
+    """Descarta os tipos de lesão registrados em cache; deve ser chamada após gravar em lesoes"""
+    cache_listas.invalidar('lesoes')
+
+
+def invalidar_tipos_lesao():
+    """Descarta os tipos de lesão em cache; deve ser chamada após alterar tipos_lesao"""
+    cache_listas.invalidar('tipos_lesao', 'lesoes')
@@ -0,0 +1,264 @@
+# SAGRA - Migrações do esquema
+# Descrição: Cria bancos novos a partir de schema.sql e atualiza bancos existentes
+#            aplicando, em ordem, as migrações pendentes. A versão aplicada fica
+#            registrada na tabela schema_versao.
+
+import os
+
+from protocolo import reconstruir_itens_protocolo
+from resumo import reconstruir_resumo
+
+# Versão do esquema descrita em schema.sql
+VERSAO_ESQUEMA = 6
+
+# Arquivo com o esquema completo da versão atual
+ARQUIVO_ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+
+def versao_banco(conn):
+    """
+    Identifica a versão do esquema de um banco
+    Args:
+        conn: Conexão DuckDB
+    Returns:
+        int: 0 para banco vazio, 1 para o esquema original (sem controle de versão)
+             ou a maior versão registrada em schema_versao
+    """
+    tabelas = {linha[0] for linha in conn.execute("""
+        SELECT table_name FROM duckdb_tables()
+        WHERE database_name = current_database() AND schema_name = 'main'
+    """).fetchall()}
+    if 'schema_versao' in tabelas:
+        return conn.execute("SELECT max(versao) FROM schema_versao").fetchone()[0]
+    if 'pacientes' in tabelas:
+        return 1
+    return 0
+
+
+def _migracao_2(conn):
+    """
+    Cria a dimensão tipos_lesao, troca lesoes.tipo_lesao e progresso.fase por chaves
+    inteiras e cria os índices dos caminhos de consulta mais usados
+    """
+    conn.execute("""
+        CREATE TABLE schema_versao (
+            versao INTEGER PRIMARY KEY,
+            aplicada_em TIMESTAMP DEFAULT current_timestamp
+        )
+    """)
+
+    # Dimensão de tipos de lesão com os tipos padrão e os já usados no banco
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_tipos_lesao START 1")
+    conn.execute("""
+        CREATE TABLE tipos_lesao (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_tipos_lesao'),
+            nome VARCHAR UNIQUE NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO tipos_lesao (nome) VALUES
+        ('LCA'), ('LCP'), ('Menisco'), ('Ligamento Colateral'), ('Tendinite Patelar'),
+        ('Luxação de Ombro'), ('Ruptura de Manguito Rotador'), ('Lesão de Labrum'),
+        ('Fratura de Clavícula'), ('Entorse de Tornozelo')
+    """)
+    conn.execute("""
+        INSERT INTO tipos_lesao (nome)
+        SELECT DISTINCT tipo_lesao FROM lesoes
+        WHERE tipo_lesao NOT IN (SELECT nome FROM tipos_lesao)
+        ORDER BY tipo_lesao
+    """)
+
+    # Recria lesoes com a chave do tipo de lesão (preservando os IDs)
+    conn.execute("""
+        CREATE TABLE lesoes_v2 (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_lesoes'),
+            paciente_id INTEGER NOT NULL,
+            tipo_lesao_id INTEGER NOT NULL,
+            data_lesao DATE,
+            data_cirurgia DATE,
+            observacoes TEXT,
+            FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+            FOREIGN KEY (tipo_lesao_id) REFERENCES tipos_lesao(id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO lesoes_v2
+        SELECT l.id, l.paciente_id, t.id, l.data_lesao, l.data_cirurgia, l.observacoes
+        FROM lesoes l
+        JOIN tipos_lesao t ON t.nome = l.tipo_lesao
+        ORDER BY l.id
+    """)
+    conn.execute("DROP TABLE lesoes")
+    conn.execute("ALTER TABLE lesoes_v2 RENAME TO lesoes")
+
+    # Recria progresso com a chave da fase (preservando os IDs)
+    conn.execute("""
+        CREATE TABLE progresso_v2 (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_progresso'),
+            paciente_id INTEGER NOT NULL,
+            fase_id INTEGER NOT NULL,
+            data_inicio DATE NOT NULL,
+            data_fim DATE,
+            status VARCHAR DEFAULT 'Em andamento',
+            FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+            FOREIGN KEY (fase_id) REFERENCES fases_reabilitacao(id),
+            UNIQUE(paciente_id, fase_id, data_inicio)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO progresso_v2
+        SELECT pr.id, pr.paciente_id, f.id, pr.data_inicio, pr.data_fim, pr.status
+        FROM progresso pr
+        JOIN (SELECT fase, min(id) AS id FROM fases_reabilitacao GROUP BY fase) f ON f.fase = pr.fase
+        ORDER BY pr.id
+    """)
+    conn.execute("DROP TABLE progresso")
+    conn.execute("ALTER TABLE progresso_v2 RENAME TO progresso")
+
+    # Índices (criados após as renomeações, que não são permitidas em tabelas indexadas)
+    conn.execute("CREATE INDEX idx_lesoes_paciente ON lesoes(paciente_id)")
+    conn.execute("CREATE INDEX idx_lesoes_tipo ON lesoes(tipo_lesao_id)")
+    conn.execute("CREATE INDEX idx_progresso_paciente ON progresso(paciente_id)")
+
+
+def _migracao_3(conn):
+    """
+    Cria a tabela resumo_dashboard com as métricas do Dashboard já calculadas
+    """
+    conn.execute("""
+        CREATE TABLE resumo_dashboard (
+            metrica VARCHAR PRIMARY KEY,
+            valor BIGINT NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT current_timestamp
+        )
+    """)
+    reconstruir_resumo(conn)
+
+
+def _migracao_4(conn):
+    """
+    Cria a tabela itens_protocolo com os itens dos campos de texto de
+    fases_reabilitacao já separados (os campos de texto são mantidos)
+    """
+    conn.execute("CREATE TYPE status_item AS ENUM ('Completo', 'Progressão', 'Restrição')")
+    conn.execute("""
+        CREATE TYPE campo_protocolo AS ENUM (
+            'atividades_liberadas', 'testes_especificos', 'tratamentos',
+            'preparacao_fisica', 'tecnicas_rugby'
+        )
+    """)
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_itens_protocolo START 1")
+    conn.execute("""
+        CREATE TABLE itens_protocolo (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_itens_protocolo'),
+            fase_id INTEGER NOT NULL,
+            campo campo_protocolo NOT NULL,
+            ordem INTEGER NOT NULL,
+            item VARCHAR NOT NULL,
+            status status_item,
+            nivel INTEGER,
+            FOREIGN KEY (fase_id) REFERENCES fases_reabilitacao(id),
+            UNIQUE(fase_id, campo, ordem)
+        )
+    """)
+    reconstruir_itens_protocolo(conn)
+    conn.execute("CREATE INDEX idx_itens_protocolo_item ON itens_protocolo(item)")
+
+
+def _migracao_5(conn):
+    """
+    Cria o registro das sessões de reabilitação (somente inserção) e os agregados
+    semanais por atleta
+    """
+    conn.execute("""
+        CREATE TABLE sessoes (
+            paciente_id INTEGER NOT NULL,
+            data DATE NOT NULL,
+            exercicio VARCHAR NOT NULL,
+            series SMALLINT,
+            repeticoes SMALLINT,
+            carga_kg DOUBLE,
+            dor TINYINT,
+            amplitude_graus DOUBLE,
+            registrado_em TIMESTAMP NOT NULL DEFAULT current_timestamp
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE sessoes_semanais (
+            paciente_id INTEGER NOT NULL,
+            semana DATE NOT NULL,
+            dias UTINYINT NOT NULL,
+            exercicios INTEGER NOT NULL,
+            volume_kg DOUBLE NOT NULL,
+            carga_maxima_kg DOUBLE,
+            dor_soma INTEGER NOT NULL,
+            dor_registros INTEGER NOT NULL,
+            dor_maxima TINYINT,
+            amplitude_maxima_graus DOUBLE,
+            PRIMARY KEY (paciente_id, semana)
+        )
+    """)
+
+
+def _migracao_6(conn):
+    """
+    Cria os protocolos por tipo de lesão; as fases existentes passam a ser do protocolo padrão
+    """
+    conn.execute("CREATE SEQUENCE IF NOT EXISTS seq_protocolos START 1")
+    conn.execute("""
+        CREATE TABLE protocolos (
+            id INTEGER PRIMARY KEY DEFAULT nextval('seq_protocolos'),
+            nome VARCHAR UNIQUE NOT NULL,
+            tipo_lesao_id INTEGER,
+            cirurgico BOOLEAN,
+            FOREIGN KEY (tipo_lesao_id) REFERENCES tipos_lesao(id),
+            UNIQUE(tipo_lesao_id, cirurgico)
+        )
+    """)
+    conn.execute("INSERT INTO protocolos (nome) VALUES ('Padrão')")
+    conn.execute("ALTER TABLE fases_reabilitacao ADD COLUMN protocolo_id INTEGER DEFAULT 1")
+
+
+# Migrações indexadas pela versão que produzem
+MIGRACOES = {
+    2: _migracao_2,
+    3: _migracao_3,
+    4: _migracao_4,
+    5: _migracao_5,
+    6: _migracao_6,
+}
+
+
+def atualizar_esquema(conn):
+    """
+    Cria o esquema em um banco vazio ou aplica as migrações pendentes
+    Args:
+        conn: Conexão DuckDB com permissão de escrita
+    Returns:
+        int: Versão do esquema após a atualização
+    """
+    versao = versao_banco(conn)
+    if versao == 0:
+        with open(ARQUIVO_ESQUEMA, encoding='utf-8') as arquivo:
+            esquema = arquivo.read()
+        # Os itens das fases padrão são separados pela mesma conversão das migrações
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            conn.execute(esquema)
+            reconstruir_itens_protocolo(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return VERSAO_ESQUEMA
+
+    for nova_versao in range(versao + 1, VERSAO_ESQUEMA + 1):
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            MIGRACOES[nova_versao](conn)
+            conn.execute("INSERT INTO schema_versao (versao) VALUES (?)", [nova_versao])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return max(versao, VERSAO_ESQUEMA)
@@ -0,0 +1,140 @@
+# SAGRA - Testes das migrações
+# Descrição: Criação de um banco novo e atualização de um banco do esquema
+#            original (versão 1, sem controle de versão) até a versão atual.
+
+import duckdb
+import pytest
+
+from migracoes import ARQUIVO_ESQUEMA, VERSAO_ESQUEMA, atualizar_esquema, versao_banco
+from resumo import calcular_metricas, ler_resumo
+
+# Esquema original, como era criado pelo aplicativo antes das migrações
+ESQUEMA_V1 = """
+    CREATE SEQUENCE seq_pacientes START 1;
+    CREATE SEQUENCE seq_lesoes START 1;
+    CREATE SEQUENCE seq_fases START 1;
+    CREATE SEQUENCE seq_progresso START 1;
+    CREATE TABLE pacientes (
+        id INTEGER PRIMARY KEY DEFAULT nextval('seq_pacientes'),
+        nome VARCHAR UNIQUE NOT NULL,
+        data_nascimento DATE,
+        posicao VARCHAR,
+        clube VARCHAR,
+        data_cirurgia DATE
+    );
+    CREATE TABLE lesoes (
+        id INTEGER PRIMARY KEY DEFAULT nextval('seq_lesoes'),
+        paciente_id INTEGER NOT NULL,
+        tipo_lesao VARCHAR NOT NULL,
+        data_lesao DATE,
+        data_cirurgia DATE,
+        observacoes TEXT,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    );
+    CREATE TABLE fases_reabilitacao (
+        id INTEGER PRIMARY KEY DEFAULT nextval('seq_fases'),
+        fase VARCHAR NOT NULL,
+        periodo_aproximado VARCHAR NOT NULL,
+        atividades_liberadas TEXT,
+        testes_especificos TEXT,
+        tratamentos TEXT,
+        preparacao_fisica TEXT,
+        tecnicas_rugby TEXT
+    );
+    CREATE TABLE progresso (
+        id INTEGER PRIMARY KEY DEFAULT nextval('seq_progresso'),
+        paciente_id INTEGER NOT NULL,
+        fase VARCHAR NOT NULL,
+        data_inicio DATE NOT NULL,
+        data_fim DATE,
+        status VARCHAR DEFAULT 'Em andamento',
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        UNIQUE(paciente_id, fase, data_inicio)
+    );
+"""
+
+
+def _fases_padrao():
+    """INSERT das fases padrão de schema.sql (o mesmo conteúdo do esquema original)"""
+    with open(ARQUIVO_ESQUEMA, encoding='utf-8') as arquivo:
+        esquema = arquivo.read()
+    inicio = esquema.index("INSERT INTO fases_reabilitacao")
+    return esquema[inicio:esquema.index(";", inicio)]
+
+
+@pytest.fixture
+def banco_v1(tmp_path):
+    """Banco no esquema original com dois atletas, três lesões e duas fases registradas"""
+    conexao = duckdb.connect(str(tmp_path / 'v1.db'))
+    conexao.execute(ESQUEMA_V1)
+    conexao.execute(_fases_padrao())
+    conexao.execute("""
+        INSERT INTO pacientes (nome, posicao, clube, data_cirurgia) VALUES
+        ('Atleta Um', 'Pilar', 'Clube A', DATE '2024-01-10'),
+        ('Atleta Dois', 'Ponta', 'Clube B', DATE '2024-03-01');
+        INSERT INTO lesoes (paciente_id, tipo_lesao, data_lesao, data_cirurgia) VALUES
+        (1, 'LCA', DATE '2024-01-01', DATE '2024-01-10'),
+        (2, 'Menisco', DATE '2024-02-20', DATE '2024-03-01'),
+        (2, 'Fratura de Tíbia', DATE '2023-05-01', NULL);
+        INSERT INTO progresso (paciente_id, fase, data_inicio, data_fim, status) VALUES
+        (1, 'Fase 1', DATE '2024-01-10', DATE '2024-01-24', 'Concluída'),
+        (1, 'Fase 2', DATE '2024-01-25', DATE '2024-02-07', 'Em andamento');
+    """)
+    yield conexao
+    conexao.close()
+
+
+def test_banco_vazio_criado_na_versao_atual(tmp_path):
+    conexao = duckdb.connect(str(tmp_path / 'novo.db'))
+    assert versao_banco(conexao) == 0
+    assert atualizar_esquema(conexao) == VERSAO_ESQUEMA
+    assert versao_banco(conexao) == VERSAO_ESQUEMA
+    # Os itens das fases padrão vêm de reconstruir_itens_protocolo
+    assert conexao.execute("SELECT count(*) FROM itens_protocolo").fetchone()[0] > 0
+    assert conexao.execute("SELECT nome FROM protocolos").fetchall() == [('Padrão',)]
+
+
+def test_banco_v1_atualizado_ate_a_versao_atual(banco_v1):
+    assert versao_banco(banco_v1) == 1
+    assert atualizar_esquema(banco_v1) == VERSAO_ESQUEMA
+    assert versao_banco(banco_v1) == VERSAO_ESQUEMA
+    aplicadas = [linha[0] for linha in banco_v1.execute("SELECT versao FROM schema_versao ORDER BY versao").fetchall()]
+    assert aplicadas == list(range(2, VERSAO_ESQUEMA + 1))
+
+    # Lesões apontam para a dimensão de tipos (inclusive tipos fora da lista padrão), com os IDs mantidos
+    assert banco_v1.execute("""
+        SELECT l.id, t.nome FROM lesoes l JOIN tipos_lesao t ON t.id = l.tipo_lesao_id ORDER BY l.id
+    """).fetchall() == [(1, 'LCA'), (2, 'Menisco'), (3, 'Fratura de Tíbia')]
+
+    # Progresso aponta para as fases pelo ID
+    assert banco_v1.execute("""
+        SELECT pr.id, f.fase, pr.status FROM progresso pr
+        JOIN fases_reabilitacao f ON f.id = pr.fase_id ORDER BY pr.id
+    """).fetchall() == [(1, 'Fase 1', 'Concluída'), (2, 'Fase 2', 'Em andamento')]
+
+    # Resumo, itens e protocolo padrão criados pelas migrações
+    assert ler_resumo(banco_v1) == calcular_metricas(banco_v1)
+    assert ler_resumo(banco_v1)['atletas_em_tratamento'] == 1
+    assert banco_v1.execute("SELECT count(*) FROM itens_protocolo").fetchone()[0] > 0
+    assert banco_v1.execute("SELECT DISTINCT protocolo_id FROM fases_reabilitacao").fetchall() == [(1,)]
+
+    # As sequências continuam depois dos IDs existentes
+    novo = banco_v1.execute("INSERT INTO lesoes (paciente_id, tipo_lesao_id) VALUES (1, 1) RETURNING id").fetchone()[0]
+    assert novo == 4
+
+
+def test_migracao_igual_ao_banco_novo(banco_v1, tmp_path):
+    atualizar_esquema(banco_v1)
+    novo = duckdb.connect(str(tmp_path / 'novo.db'))
+    atualizar_esquema(novo)
+    consulta = "SELECT fase_id, campo, ordem, item, status, nivel FROM itens_protocolo ORDER BY ALL"
+    assert banco_v1.execute(consulta).fetchall() == novo.execute(consulta).fetchall()
+    colunas = "SELECT table_name, column_name, data_type FROM information_schema.columns ORDER BY ALL"
+    assert banco_v1.execute(colunas).fetchall() == novo.execute(colunas).fetchall()
+
+
+def test_atualizar_banco_atual_nao_altera_nada(conn):
+    itens = conn.execute("SELECT count(*) FROM itens_protocolo").fetchone()[0]
+    assert atualizar_esquema(conn) == VERSAO_ESQUEMA
+    assert conn.execute("SELECT count(*) FROM schema_versao").fetchone()[0] == 1
+    assert conn.execute("SELECT count(*) FROM itens_protocolo").fetchone()[0] == itens
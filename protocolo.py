@@ -0,0 +1,684 @@
+# SAGRA - Protocolo de reabilitação
+# Descrição: Carrega a tabela fases_reabilitacao uma única vez, converte o texto
+#            de periodo_aproximado em limites inteiros de dias e calcula o
+#            cronograma e a fase atual a partir de deslocamentos inteiros, tanto
+#            para uma data de cirurgia quanto para milhares de datas de uma vez.
+#            Os itens de cada fase (atividades, testes, tratamentos, exercícios e
+#            técnicas) vêm já separados da tabela itens_protocolo. Cada tipo de
+#            lesão (com ou sem cirurgia) pode ter protocolo próprio; o registro
+#            carrega todos os protocolos de uma vez e escolhe o de cada atleta em
+#            memória, sem consultas por tela.
+#
+# Uso: python protocolo.py listar --banco SAGRA.db
+#      python protocolo.py criar "Entorse de Tornozelo" --dias-alta 42 --sem-cirurgia --banco SAGRA.db
+
+import argparse
+import bisect
+import itertools
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from escritor import executar_escrita
+from listas import origem
+
+# Duração exibida para a fase final (sem data de término definida)
+DIAS_EXIBICAO_FASE_FINAL = 30
+
+# Colunas de fases_reabilitacao com itens separados por vírgula (valores do ENUM campo_protocolo)
+CAMPOS_PROTOCOLO = ['atividades_liberadas', 'testes_especificos', 'tratamentos',
+                    'preparacao_fisica', 'tecnicas_rugby']
+
+# Status dos exercícios (valores do ENUM status_item)
+STATUS_ITEM = ['Completo', 'Progressão', 'Restrição']
+
+# ID do protocolo padrão, usado pelos tipos de lesão sem protocolo próprio
+PROTOCOLO_PADRAO = 1
+
+# Fases e itens de todos os protocolos, na ordem de cada protocolo
+_SQL_FASES = """
+    SELECT id, fase, periodo_aproximado, atividades_liberadas, testes_especificos,
+           tratamentos, preparacao_fisica, tecnicas_rugby, protocolo_id
+    FROM fases_reabilitacao
+    {filtro}
+    ORDER BY id
+"""
+_SQL_ITENS = """
+    SELECT fase_id, campo::VARCHAR, item, status::VARCHAR, nivel
+    FROM itens_protocolo
+    ORDER BY fase_id, campo, ordem
+"""
+
+# Versões dos registros carregados (para chaves de cache que dependem do protocolo)
+_versoes_registro = itertools.count(1)
+
+
+def extrair_limites(periodo):
+    """
+    Extrai os limites de dias de um período no formato 'X a Y dias' ou 'após X dias'
+    Args:
+        periodo (str): String contendo o período
+    Returns:
+        tuple: (dia_inicio, dia_fim); dia_fim é None para períodos sem término
+    """
+    if 'após' in periodo:
+        return int(periodo.split(' ')[1]) + 1, None
+    inicio, fim = periodo.split(' a ')
+    return int(inicio), int(fim.split(' ')[0])
+
+
+@dataclass(frozen=True)
+class ItemProtocolo:
+    """
+    Um item de uma fase do protocolo, como 'Leg Press (Progressão)' ou 'Tackle:2'
+    """
+    item: str
+    status: str = None
+    nivel: int = None
+
+    @property
+    def rotulo(self):
+        """Texto do item no formato original"""
+        if self.status:
+            return f"{self.item} ({self.status})"
+        if self.nivel is not None:
+            return f"{self.item}:{self.nivel}"
+        return self.item
+
+
+@dataclass(frozen=True)
+class FaseProtocolo:
+    """
+    Uma fase do protocolo com os limites já convertidos em dias após a cirurgia
+    """
+    id: int
+    fase: str
+    periodo_aproximado: str
+    dia_inicio: int
+    dia_fim: int
+    atividades_liberadas: str
+    testes_especificos: str
+    tratamentos: str
+    preparacao_fisica: str
+    tecnicas_rugby: str
+    itens: dict = field(default_factory=dict, compare=False)
+
+    @property
+    def duracao(self):
+        """Duração da fase em dias (None para a fase final, contínua)"""
+        if self.dia_fim is None:
+            return None
+        return self.dia_fim - self.dia_inicio + 1
+
+    def itens_de(self, campo):
+        """
+        Itens de um campo da fase, na ordem do protocolo
+        Args:
+            campo (str): Um dos CAMPOS_PROTOCOLO
+        Returns:
+            tuple: ItemProtocolo do campo
+        """
+        return self.itens.get(campo, ())
+
+    def contagem_status(self, campo='preparacao_fisica'):
+        """
+        Conta os itens de um campo por status
+        Args:
+            campo (str): Um dos CAMPOS_PROTOCOLO
+        Returns:
+            dict: Número de itens de cada um dos STATUS_ITEM
+        """
+        contagem = Counter(item.status for item in self.itens_de(campo))
+        return {status: contagem.get(status, 0) for status in STATUS_ITEM}
+
+
+def _agrupar_itens(linhas):
+    """Itens de itens_protocolo agrupados por fase e campo"""
+    itens = {}
+    for id_fase, campo, item, status, nivel in linhas:
+        itens.setdefault(id_fase, {}).setdefault(campo, []).append(ItemProtocolo(item, status, nivel))
+    return itens
+
+
+def _montar_fases(linhas, itens):
+    """FaseProtocolo de cada linha de fases_reabilitacao (ver _SQL_FASES)"""
+    fases = []
+    for (id_fase, fase, periodo, atividades, testes, tratamentos, preparacao, tecnicas, _) in linhas:
+        dia_inicio, dia_fim = extrair_limites(periodo)
+        fases.append(FaseProtocolo(
+            id_fase, fase, periodo, dia_inicio, dia_fim,
+            atividades or '', testes or '', tratamentos or '', preparacao or '', tecnicas or '',
+            {campo: tuple(lista) for campo, lista in itens.get(id_fase, {}).items()}
+        ))
+    return fases
+
+
+class ProtocoloReabilitacao:
+    """
+    Protocolo de reabilitação com os limites de cada fase em dias inteiros
+    Args:
+        fases (list): Lista de FaseProtocolo ordenada pela sequência do protocolo
+        id (int): ID do protocolo em protocolos
+        nome (str): Nome do protocolo
+    """
+
+    def __init__(self, fases, id=PROTOCOLO_PADRAO, nome='Padrão'):
+        self.id = id
+        self.nome = nome
+        self.fases = list(fases)
+        # A primeira fase começa no próprio dia da cirurgia (dia 0)
+        self._inicios = np.array([0] + [f.dia_inicio for f in self.fases[1:]], dtype='int64')
+        self._fins = np.array(
+            [f.dia_fim if f.dia_fim is not None else np.iinfo('int64').max for f in self.fases],
+            dtype='int64'
+        )
+        self._fins_lista = self._fins.tolist()
+
+    @classmethod
+    def carregar(cls, conn, protocolo_id=PROTOCOLO_PADRAO):
+        """
+        Lê as fases de um protocolo e converte os períodos em limites de dias
+        Args:
+            conn: Conexão ou cursor DuckDB
+            protocolo_id (int): ID do protocolo (padrão: o protocolo padrão)
+        Returns:
+            ProtocoloReabilitacao: Protocolo carregado
+        """
+        linhas = conn.execute(_SQL_FASES.format(filtro="WHERE protocolo_id = ?"),
+                              [protocolo_id]).fetchall()
+        nome = conn.execute("SELECT nome FROM protocolos WHERE id = ?", [protocolo_id]).fetchone()
+        return cls(_montar_fases(linhas, _agrupar_itens(conn.execute(_SQL_ITENS).fetchall())),
+                   protocolo_id, nome[0] if nome else None)
+
+    @property
+    def dias_alta(self):
+        """Último dia antes da fase final (previsão de alta em dias após a cirurgia)"""
+        return int(self._inicios[-1]) - 1
+
+    def fase_por_id(self, fase_id):
+        """
+        Fase do protocolo pelo ID
+        Args:
+            fase_id (int): ID da fase em fases_reabilitacao
+        Returns:
+            FaseProtocolo: Fase encontrada ou None
+        """
+        return next((f for f in self.fases if f.id == fase_id), None)
+
+    def limites(self, indice):
+        """
+        Deslocamentos (em dias após a cirurgia) de início e fim de uma fase
+        Args:
+            indice (int): Posição da fase no protocolo
+        Returns:
+            tuple: (inicio, fim) em dias; a fase final termina DIAS_EXIBICAO_FASE_FINAL dias após o início
+        """
+        inicio = int(self._inicios[indice])
+        fase = self.fases[indice]
+        fim = fase.dia_fim if fase.dia_fim is not None else inicio + DIAS_EXIBICAO_FASE_FINAL
+        return inicio, fim
+
+    def indice_fase(self, dias_desde_cirurgia):
+        """
+        Posição da fase correspondente a um número de dias após a cirurgia
+        Args:
+            dias_desde_cirurgia (int): Dias decorridos desde a cirurgia
+        Returns:
+            int: Índice da fase ou None se a cirurgia ainda não ocorreu
+        """
+        if dias_desde_cirurgia < 0 or not self.fases:
+            return None
+        return bisect.bisect_left(self._fins_lista, dias_desde_cirurgia)
+
+    def indice_fase_lote(self, dias_desde_cirurgia):
+        """
+        Posição da fase de vários números de dias após a cirurgia de uma vez
+        Args:
+            dias_desde_cirurgia (np.ndarray): Dias decorridos desde a cirurgia (não negativos)
+        Returns:
+            np.ndarray: Índices das fases
+        """
+        return np.searchsorted(self._fins, dias_desde_cirurgia, side='left')
+
+    def fase_atual(self, dias_desde_cirurgia):
+        """
+        Fase correspondente a um número de dias após a cirurgia
+        Args:
+            dias_desde_cirurgia (int): Dias decorridos desde a cirurgia
+        Returns:
+            FaseProtocolo: Fase atual ou None se a cirurgia ainda não ocorreu
+        """
+        indice = self.indice_fase(dias_desde_cirurgia)
+        return self.fases[indice] if indice is not None else None
+
+    def cronograma(self, data_cirurgia):
+        """
+        Calcula as datas de início e fim de cada fase para uma data de cirurgia
+        Args:
+            data_cirurgia (date): Data da cirurgia
+        Returns:
+            list: Dicionários com 'fase' (FaseProtocolo), 'data_inicio' e 'data_fim' (date)
+        """
+        cronograma = []
+        for indice, fase in enumerate(self.fases):
+            inicio, fim = self.limites(indice)
+            cronograma.append({
+                'fase': fase,
+                'data_inicio': data_cirurgia + timedelta(days=inicio),
+                'data_fim': data_cirurgia + timedelta(days=fim),
+            })
+        return cronograma
+
+    def cronograma_lote(self, datas_cirurgia):
+        """
+        Calcula o cronograma de várias datas de cirurgia em uma única operação vetorizada
+        Args:
+            datas_cirurgia: Sequência de datas (list, np.ndarray ou pd.Series)
+        Returns:
+            pd.DataFrame: Uma linha por (data, fase) com as colunas indice, data_cirurgia,
+                          fase, data_inicio e data_fim
+        """
+        datas = np.asarray(datas_cirurgia, dtype='datetime64[D]')
+        inicios, fins = zip(*(self.limites(i) for i in range(len(self.fases))))
+        inicios = np.array(inicios, dtype='timedelta64[D]')
+        fins = np.array(fins, dtype='timedelta64[D]')
+
+        quantidade_fases = len(self.fases)
+        return pd.DataFrame({
+            'indice': np.repeat(np.arange(len(datas)), quantidade_fases),
+            'data_cirurgia': np.repeat(datas, quantidade_fases),
+            'fase': np.tile(np.array([f.fase for f in self.fases], dtype=object), len(datas)),
+            'data_inicio': (datas[:, None] + inicios[None, :]).ravel(),
+            'data_fim': (datas[:, None] + fins[None, :]).ravel(),
+        })
+
+    def fase_atual_lote(self, datas_cirurgia, hoje):
+        """
+        Calcula a fase atual de várias datas de cirurgia em uma única operação vetorizada
+        Args:
+            datas_cirurgia: Sequência de datas (list, np.ndarray ou pd.Series)
+            hoje (date): Data de referência
+        Returns:
+            pd.DataFrame: Colunas dias_desde_cirurgia, fase, data_inicio e data_fim
+                          (fase nula para cirurgias futuras)
+        """
+        datas = np.asarray(datas_cirurgia, dtype='datetime64[D]')
+        dias = (np.datetime64(hoje, 'D') - datas).astype('int64')
+        validos = dias >= 0
+        indices = self.indice_fase_lote(np.where(validos, dias, 0))
+
+        nomes = np.array([f.fase for f in self.fases], dtype=object)
+        inicios = np.array([self.limites(i)[0] for i in range(len(self.fases))], dtype='timedelta64[D]')
+        fins = np.array([self.limites(i)[1] for i in range(len(self.fases))], dtype='timedelta64[D]')
+        return pd.DataFrame({
+            'dias_desde_cirurgia': dias,
+            'fase': np.where(validos, nomes[indices], None),
+            'data_inicio': np.where(validos, datas + inicios[indices], np.datetime64('NaT')),
+            'data_fim': np.where(validos, datas + fins[indices], np.datetime64('NaT')),
+        })
+
+
+class RegistroProtocolos:
+    """
+    Todos os protocolos do banco e o protocolo de cada tipo de lesão, com e sem cirurgia
+    Args:
+        protocolos (list): ProtocoloReabilitacao de cada protocolo
+        atribuicoes (list): Tuplas (protocolo_id, tipo_lesao_id, tipo_lesao, cirurgico) dos
+                            protocolos próprios de um tipo (cirurgico None vale para os dois casos)
+    """
+
+    def __init__(self, protocolos, atribuicoes=()):
+        self.versao = next(_versoes_registro)
+        self.protocolos = {protocolo.id: protocolo for protocolo in protocolos}
+        self.atribuicoes = list(atribuicoes)
+        self._por_tipo = {}
+        # As atribuições sem indicação de cirurgia entram primeiro e são substituídas pelas específicas
+        for protocolo_id, _, tipo_lesao, cirurgico in sorted(
+                self.atribuicoes, key=lambda a: a[3] is not None):
+            for caso in ((True, False) if cirurgico is None else (cirurgico,)):
+                self._por_tipo[(tipo_lesao, caso)] = protocolo_id
+        self._fases = {fase.id: (protocolo, indice) for protocolo in self.protocolos.values()
+                       for indice, fase in enumerate(protocolo.fases)}
+
+    @classmethod
+    def carregar(cls, conn):
+        """
+        Lê todos os protocolos, fases e itens com uma consulta por tabela
+        Args:
+            conn: Conexão ou cursor DuckDB
+        Returns:
+            RegistroProtocolos: Registro carregado
+        """
+        protocolos = conn.execute("""
+            SELECT pr.id, pr.nome, pr.tipo_lesao_id, t.nome, pr.cirurgico
+            FROM protocolos pr
+            LEFT JOIN tipos_lesao t ON t.id = pr.tipo_lesao_id
+            ORDER BY pr.id
+        """).fetchall()
+        itens = _agrupar_itens(conn.execute(_SQL_ITENS).fetchall())
+        linhas = {}
+        for linha in conn.execute(_SQL_FASES.format(filtro="")).fetchall():
+            linhas.setdefault(linha[-1], []).append(linha)
+        return cls(
+            [ProtocoloReabilitacao(_montar_fases(linhas.get(id_, []), itens), id_, nome)
+             for id_, nome, _, _, _ in protocolos if linhas.get(id_)],
+            [(id_, tipo_lesao_id, tipo_lesao, cirurgico)
+             for id_, _, tipo_lesao_id, tipo_lesao, cirurgico in protocolos
+             if tipo_lesao_id is not None and linhas.get(id_)],
+        )
+
+    @property
+    def padrao(self):
+        """Protocolo dos tipos de lesão sem protocolo próprio"""
+        return self.protocolos[PROTOCOLO_PADRAO]
+
+    def protocolo_para(self, tipo_lesao, cirurgico=True):
+        """
+        Protocolo de um tipo de lesão
+        Args:
+            tipo_lesao (str): Nome do tipo de lesão (None para o protocolo padrão)
+            cirurgico (bool): Se a lesão foi tratada com cirurgia
+        Returns:
+            ProtocoloReabilitacao: Protocolo próprio do tipo, ou o padrão
+        """
+        return self.protocolos[self._por_tipo.get((tipo_lesao, bool(cirurgico)), PROTOCOLO_PADRAO)]
+
+    def fase_por_id(self, fase_id):
+        """
+        Fase de qualquer protocolo pelo ID
+        Args:
+            fase_id (int): ID da fase em fases_reabilitacao
+        Returns:
+            FaseProtocolo: Fase encontrada ou None
+        """
+        encontrada = self._fases.get(fase_id)
+        return encontrada[0].fases[encontrada[1]] if encontrada else None
+
+    def nomes_fases(self):
+        """Nomes das fases de todos os protocolos, na ordem do padrão seguida das demais"""
+        nomes = {}
+        for protocolo in sorted(self.protocolos.values(), key=lambda p: p.id != PROTOCOLO_PADRAO):
+            for fase in protocolo.fases:
+                nomes.setdefault(fase.fase, None)
+        return list(nomes)
+
+    def parametros_atletas(self):
+        """
+        Parâmetros de SQL_PROTOCOLO_ATLETA: protocolo de cada tipo de lesão e tratamento,
+        como listas para unnest
+        Returns:
+            dict: Parâmetros nomeados
+        """
+        atribuicoes = list(self._por_tipo.items())
+        return {
+            'protocolo_padrao': PROTOCOLO_PADRAO,
+            'tipos_protocolo': [tipo for (tipo, _), _ in atribuicoes],
+            'cirurgicos_protocolo': [cirurgico for (_, cirurgico), _ in atribuicoes],
+            'protocolos_tipo': [id_ for _, id_ in atribuicoes],
+        }
+
+    def parametros_limites(self):
+        """
+        Parâmetros de SQL_LIMITES_FASES: limites em dias de cada fase de todos os protocolos,
+        como listas para unnest
+        Returns:
+            dict: Parâmetros nomeados
+        """
+        fases = [(protocolo, indice) for protocolo in self.protocolos.values()
+                 for indice in range(len(protocolo.fases))]
+        limites = [protocolo.limites(indice) for protocolo, indice in fases]
+        return {
+            'limite_protocolos': [protocolo.id for protocolo, _ in fases],
+            'limite_fases': [protocolo.fases[indice].id for protocolo, indice in fases],
+            'limite_nomes': [protocolo.fases[indice].fase for protocolo, indice in fases],
+            'limite_ordens': [indice + 1 for _, indice in fases],
+            'limite_inicios': [inicio for inicio, _ in limites],
+            'limite_fins': [fim for _, fim in limites],
+            'limite_fins_busca': [protocolo.fases[indice].dia_fim if protocolo.fases[indice].dia_fim is not None
+                                  else 2 ** 31 - 1 for protocolo, indice in fases],
+        }
+
+
+# Protocolo de cada atleta em tratamento, pelo tipo da lesão mais recente e por ela ter ou
+# não data de cirurgia (parâmetros de RegistroProtocolos.parametros_atletas), e o dia de
+# início do tratamento, de onde contam os limites das fases: a data de cirurgia do atleta
+# ou, sem ela e com lesão mais recente sem cirurgia, a data dessa lesão. Os tipos são
+# comparados pelo nome, que vale também nas visões consolidadas dos clubes.
+SQL_PROTOCOLO_ATLETA = """
+    SELECT * FROM (
+        SELECT p.id AS paciente_id,
+               COALESCE(p.data_cirurgia,
+                        CASE WHEN NOT u.lesao.cirurgico THEN u.lesao.data_lesao END) AS inicio_tratamento,
+               COALESCE(m.protocolo_id, $protocolo_padrao) AS protocolo_id
+        FROM pacientes p
+        LEFT JOIN (
+            SELECT l.paciente_id,
+                   arg_max({'tipo_lesao': t.nome, 'cirurgico': l.data_cirurgia IS NOT NULL,
+                            'data_lesao': l.data_lesao},
+                           (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id)) AS lesao
+            FROM lesoes l
+            JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+            GROUP BY l.paciente_id
+        ) u ON u.paciente_id = p.id
+        LEFT JOIN (
+            SELECT unnest($tipos_protocolo)::VARCHAR AS tipo_lesao,
+                   unnest($cirurgicos_protocolo)::BOOLEAN AS cirurgico,
+                   unnest($protocolos_tipo)::INTEGER AS protocolo_id
+        ) m ON m.tipo_lesao = u.lesao.tipo_lesao AND m.cirurgico = u.lesao.cirurgico
+    )
+    WHERE inicio_tratamento IS NOT NULL
+"""
+
+# Limites em dias após o início do tratamento de cada fase de todos os protocolos (fim_busca:
+# a fase final não tem término na busca da fase atual; parâmetros de
+# RegistroProtocolos.parametros_limites)
+SQL_LIMITES_FASES = """
+    SELECT unnest($limite_protocolos)::INTEGER AS protocolo_id,
+           unnest($limite_fases)::INTEGER AS fase_id,
+           unnest($limite_nomes)::VARCHAR AS fase,
+           unnest($limite_ordens)::INTEGER AS ordem,
+           unnest($limite_inicios)::INTEGER AS inicio,
+           unnest($limite_fins)::INTEGER AS fim,
+           unnest($limite_fins_busca)::INTEGER AS fim_busca
+"""
+
+
+# Registros em memória de cada banco, compartilhados pelo processo até serem invalidados
+_registros = {}
+_protocolo_lock = threading.Lock()
+
+
+def obter_registro(conn):
+    """
+    Retorna o registro de protocolos em cache, carregando-o do banco na primeira chamada
+    Args:
+        conn: Conexão ou cursor DuckDB
+    Returns:
+        RegistroProtocolos: Protocolos atuais do banco da conexão
+    """
+    chave = origem(conn)
+    registro = _registros.get(chave)
+    if registro is None:
+        with _protocolo_lock:
+            registro = _registros.get(chave)
+            if registro is None:
+                registro = _registros[chave] = RegistroProtocolos.carregar(conn)
+    return registro
+
+
+def obter_protocolo(conn):
+    """
+    Retorna o protocolo padrão em cache (ver obter_registro)
+    Args:
+        conn: Conexão ou cursor DuckDB
+    Returns:
+        ProtocoloReabilitacao: Protocolo padrão atual
+    """
+    return obter_registro(conn).padrao
+
+
+def invalidar_protocolo():
+    """
+    Descarta os protocolos em cache; deve ser chamada após alterar protocolos ou
+    fases_reabilitacao
+    """
+    with _protocolo_lock:
+        _registros.clear()
+
+
+def _periodos_escalados(protocolo, dias_alta):
+    """Períodos das fases do protocolo com os limites escalados para a nova alta prevista"""
+    escala = dias_alta / protocolo.dias_alta
+    periodos = []
+    anterior = 0
+    for fase in protocolo.fases:
+        if fase.dia_fim is None:
+            periodos.append(f"após {anterior} dias")
+            continue
+        inicio = anterior + 1
+        anterior = max(inicio, round(fase.dia_fim * escala))
+        periodos.append(f"{inicio} a {anterior} dias")
+    return periodos
+
+
+def _inserir_protocolo(conn, nome, tipo_lesao_id, cirurgico, base, dias_alta):
+    """Insere o protocolo com as fases copiadas do protocolo base na transação em andamento"""
+    protocolo_id = conn.execute("""
+        INSERT INTO protocolos (nome, tipo_lesao_id, cirurgico)
+        VALUES (?, ?, ?)
+        RETURNING id
+    """, [nome, tipo_lesao_id, cirurgico]).fetchone()[0]
+    periodos = _periodos_escalados(base, dias_alta) if dias_alta else [f.periodo_aproximado for f in base.fases]
+    conn.execute("""
+        INSERT INTO fases_reabilitacao (protocolo_id, fase, periodo_aproximado, atividades_liberadas,
+                                        testes_especificos, tratamentos, preparacao_fisica, tecnicas_rugby)
+        SELECT $protocolo_id, f.fase, b.periodo, f.atividades_liberadas, f.testes_especificos,
+               f.tratamentos, f.preparacao_fisica, f.tecnicas_rugby
+        FROM (SELECT unnest($fase_ids) AS fase_id, unnest($periodos) AS periodo,
+                     generate_subscripts($fase_ids, 1) AS ordem) b
+        JOIN fases_reabilitacao f ON f.id = b.fase_id
+        ORDER BY b.ordem
+    """, {'protocolo_id': protocolo_id, 'fase_ids': [f.id for f in base.fases], 'periodos': periodos})
+    reconstruir_itens_protocolo(conn)
+    return protocolo_id
+
+
+def criar_protocolo(conn, nome, tipo_lesao_id, cirurgico=None, dias_alta=None, base_id=PROTOCOLO_PADRAO):
+    """
+    Cria o protocolo de um tipo de lesão copiando as fases e os itens de outro protocolo,
+    com os períodos escalados para a alta prevista informada; as fases podem ser editadas
+    depois em fases_reabilitacao (seguidas de reconstruir_itens_protocolo e invalidar_protocolo)
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        nome (str): Nome do protocolo
+        tipo_lesao_id (int): ID do tipo de lesão
+        cirurgico (bool): True para lesões com cirurgia, False sem cirurgia, None para ambas
+        dias_alta (int): Dias até a alta prevista (None mantém os períodos do protocolo base)
+        base_id (int): ID do protocolo copiado
+    Returns:
+        int: ID do protocolo criado
+    """
+    from coortes import invalidar_coortes
+
+    base = obter_registro(conn).protocolos[base_id]
+    protocolo_id = executar_escrita(conn, _inserir_protocolo, nome, tipo_lesao_id, cirurgico, base, dias_alta)
+    invalidar_protocolo()
+    invalidar_coortes('fases_reabilitacao')
+    return protocolo_id
+
+
+def reconstruir_itens_protocolo(conn):
+    """
+    Separa os campos de texto de fases_reabilitacao em linhas de itens_protocolo
+    (status entre parênteses e nível após ':' em técnicas de rugby). Deve ser chamada
+    após alterar fases_reabilitacao, junto com invalidar_protocolo; não abre transação.
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+    Returns:
+        int: Número de itens gravados
+    """
+    conn.execute("DELETE FROM itens_protocolo")
+    return conn.execute("""
+        INSERT INTO itens_protocolo (fase_id, campo, ordem, item, status, nivel)
+        WITH campos AS (
+            UNPIVOT (
+                SELECT id, atividades_liberadas, testes_especificos, tratamentos,
+                       preparacao_fisica, tecnicas_rugby
+                FROM fases_reabilitacao
+            )
+            ON atividades_liberadas, testes_especificos, tratamentos, preparacao_fisica, tecnicas_rugby
+            INTO NAME campo VALUE texto
+        ),
+        partes AS (
+            SELECT id AS fase_id, campo,
+                   unnest(generate_series(1, len(string_split(texto, ',')))) AS ordem,
+                   trim(unnest(string_split(texto, ','))) AS parte
+            FROM campos
+        )
+        SELECT
+            fase_id,
+            campo,
+            ordem,
+            trim(CASE WHEN campo = 'tecnicas_rugby' THEN split_part(parte, ':', 1)
+                      ELSE regexp_replace(parte, '\\s*\\((Completo|Progressão|Restrição)\\)$', '') END),
+            NULLIF(regexp_extract(parte, '\\((Completo|Progressão|Restrição)\\)$', 1), ''),
+            CASE WHEN campo = 'tecnicas_rugby' THEN TRY_CAST(split_part(parte, ':', 2) AS INTEGER) END
+        FROM partes
+        WHERE parte NOT IN ('', '-')
+        ORDER BY fase_id, campo, ordem
+    """).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Protocolos de reabilitação por tipo de lesão")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    listagem = subcomandos.add_parser('listar', help="Lista os protocolos e suas fases")
+    listagem.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+
+    criacao = subcomandos.add_parser('criar', help="Cria o protocolo de um tipo de lesão a partir de outro")
+    criacao.add_argument('tipo_lesao', help="Nome do tipo de lesão")
+    criacao.add_argument('--nome', help="Nome do protocolo (padrão: o do tipo de lesão e do tratamento)")
+    criacao.add_argument('--dias-alta', type=int, help="Dias da cirurgia até a alta prevista")
+    tratamento = criacao.add_mutually_exclusive_group()
+    tratamento.add_argument('--cirurgico', dest='cirurgico', action='store_const', const=True,
+                            help="Apenas para lesões com cirurgia")
+    tratamento.add_argument('--sem-cirurgia', dest='cirurgico', action='store_const', const=False,
+                            help="Apenas para lesões sem cirurgia")
+    criacao.add_argument('--base', type=int, default=PROTOCOLO_PADRAO, help="ID do protocolo copiado")
+    criacao.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+
+    args = parser.parse_args()
+
+    import duckdb
+
+    from migracoes import atualizar_esquema
+
+    conn = duckdb.connect(args.banco)
+    atualizar_esquema(conn)
+    if args.comando == 'criar':
+        tipo = conn.execute("SELECT id FROM tipos_lesao WHERE nome = ?", [args.tipo_lesao]).fetchone()
+        if tipo is None:
+            parser.error(f"Tipo de lesão não cadastrado: {args.tipo_lesao}")
+        sufixo = {True: ' (cirúrgico)', False: ' (sem cirurgia)', None: ''}[args.cirurgico]
+        criar_protocolo(conn, args.nome or args.tipo_lesao + sufixo, tipo[0], args.cirurgico,
+                        args.dias_alta, args.base)
+
+    registro = obter_registro(conn)
+    tipos = {id_: (tipo, cirurgico) for id_, _, tipo, cirurgico in registro.atribuicoes}
+    for protocolo in registro.protocolos.values():
+        tipo, cirurgico = tipos.get(protocolo.id, (None, None))
+        aplicacao = "demais tipos de lesão" if protocolo.id == PROTOCOLO_PADRAO else tipo + (
+            {True: ', com cirurgia', False: ', sem cirurgia', None: ''}[cirurgico])
+        print(f"[{protocolo.id}] {protocolo.nome} — {aplicacao}; alta prevista em {protocolo.dias_alta} dias")
+        for fase in protocolo.fases:
+            print(f"    {fase.fase}: {fase.periodo_aproximado}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# SAGRA - Recálculo em lote do progresso
+# Descrição: Calcula a fase atual de todos os atletas com uma única junção contra
+#            os limites de dias do protocolo de cada um (pelo tipo da lesão mais
+#            recente) e grava todas as linhas de progresso com uma única instrução
+#            baseada em conjuntos.
+#
+# Uso: python recalculo_progresso.py --banco SAGRA.db
+#      (com o aplicativo em execução o recálculo é agendado no próprio processo)
+
+import argparse
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from coortes import invalidar_coortes
+from escritor import em_transacao
+from protocolo import SQL_LIMITES_FASES, SQL_PROTOCOLO_ATLETA, RegistroProtocolos
+from resumo import reconstruir_resumo
+from risco import invalidar_risco
+
+# Intervalo padrão entre recálculos agendados (em horas)
+INTERVALO_RECALCULO_HORAS = 24
+
+
+def gravar_progresso(conn, hoje=None, registro=None):
+    """
+    Recalcula a fase atual de todos os atletas na transação em andamento (ver recalcular_progresso)
+    Args:
+        conn: Conexão DuckDB com permissão de escrita, com transação aberta
+        hoje (date): Data de referência (padrão: data atual)
+        registro (RegistroProtocolos): Protocolos a usar (padrão: carregados do banco)
+    Returns:
+        dict: Número de fases atuais gravadas e de fases anteriores encerradas
+    """
+    hoje = hoje or datetime.now().date()
+    registro = registro or RegistroProtocolos.carregar(conn)
+
+    # Limites de cada fase de cada protocolo em dias após o início do tratamento, junto ao protocolo do atleta
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _fase_atual AS
+        WITH atletas AS ({SQL_PROTOCOLO_ATLETA}),
+        limites AS ({SQL_LIMITES_FASES})
+        SELECT
+            a.paciente_id,
+            l.fase_id,
+            a.inicio_tratamento + l.inicio AS data_inicio,
+            a.inicio_tratamento + l.fim AS data_fim
+        FROM atletas a
+        JOIN limites l
+          ON l.protocolo_id = a.protocolo_id
+         AND ($hoje::DATE - a.inicio_tratamento) BETWEEN l.inicio AND l.fim_busca
+    """, {**registro.parametros_atletas(), **registro.parametros_limites(), 'hoje': hoje})
+
+    # Grava a fase atual de todos os atletas de uma vez
+    gravadas = conn.execute("""
+        INSERT INTO progresso (paciente_id, fase_id, data_inicio, data_fim, status)
+        SELECT paciente_id, fase_id, data_inicio, data_fim, 'Em andamento'
+        FROM _fase_atual
+        ON CONFLICT (paciente_id, fase_id, data_inicio) DO UPDATE
+        SET status = 'Em andamento',
+            data_fim = excluded.data_fim
+    """).fetchone()[0]
+
+    # Encerra as fases que deixaram de ser a atual (uma troca de protocolo pode mover o início
+    # da fase atual para antes do início da encerrada, que então termina no próprio início)
+    encerradas = conn.execute("""
+        UPDATE progresso
+        SET status = 'Concluída',
+            data_fim = GREATEST(progresso.data_inicio,
+                                LEAST(COALESCE(progresso.data_fim, a.data_inicio - 1), a.data_inicio - 1))
+        FROM _fase_atual a
+        WHERE progresso.paciente_id = a.paciente_id
+          AND progresso.status = 'Em andamento'
+          AND (progresso.fase_id <> a.fase_id OR progresso.data_inicio <> a.data_inicio)
+    """).fetchone()[0]
+
+    conn.execute("DROP TABLE _fase_atual")
+
+    # O conjunto de atletas em tratamento muda em bloco; a métrica é recalculada
+    reconstruir_resumo(conn, ['atletas_em_tratamento'])
+    return {'gravadas': gravadas, 'encerradas': encerradas}
+
+
+def recalcular_progresso(conn, hoje=None, registro=None):
+    """
+    Recalcula a fase atual de todos os atletas em tratamento (com data de cirurgia ou com lesão
+    sem cirurgia, contada da data da lesão) e atualiza a tabela progresso.
+    A fase atual fica 'Em andamento'; fases anteriores ainda abertas passam a 'Concluída'.
+    Args:
+        conn: Conexão DuckDB com permissão de escrita
+        hoje (date): Data de referência (padrão: data atual)
+        registro (RegistroProtocolos): Protocolos a usar (padrão: carregados do banco)
+    Returns:
+        dict: Número de fases atuais gravadas e de fases anteriores encerradas
+    """
+    return em_transacao(conn, gravar_progresso, hoje, registro)
+
+
+# Controle do agendamento no processo do aplicativo (uma thread por arquivo de banco)
+_agendamentos = {}
+_agendamento_lock = threading.Lock()
+
+
+def iniciar_recalculo_periodico(banco, intervalo_horas=INTERVALO_RECALCULO_HORAS):
+    """
+    Agenda o recálculo periódico em uma thread de fundo do processo (apenas uma vez por
+    processo e banco). O primeiro recálculo é executado imediatamente.
+    Args:
+        banco (BancoDados): Banco compartilhado pelo processo
+        intervalo_horas (float): Intervalo entre recálculos
+    """
+    if banco.somente_leitura:
+        return
+    with _agendamento_lock:
+        if banco.caminho in _agendamentos:
+            return
+
+        def executar():
+            while True:
+                try:
+                    # Pelo escritor único, para não disputar a conexão com os cadastros
+                    banco.escritor.executar(gravar_progresso, timeout=None)
+                    invalidar_coortes('progresso')
+                    invalidar_risco('progresso')
+                except Exception:
+                    # Com o traceback completo: a thread não tem outra saída para o operador
+                    print(f"Erro no recálculo do progresso ({banco.caminho}):", flush=True)
+                    traceback.print_exc()
+                time.sleep(intervalo_horas * 3600)
+
+        _agendamentos[banco.caminho] = threading.Thread(target=executar, name='recalculo-progresso', daemon=True)
+        _agendamentos[banco.caminho].start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcula a fase atual de todos os atletas")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    args = parser.parse_args()
+
+    import duckdb
+
+    from migracoes import atualizar_esquema
+
+    conn = duckdb.connect(args.banco)
+    atualizar_esquema(conn)
+    inicio = time.perf_counter()
+    resultado = recalcular_progresso(conn)
+    print(f"{resultado['gravadas']} fases atuais gravadas, {resultado['encerradas']} fases encerradas "
+          f"em {time.perf_counter() - inicio:.2f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# SAGRA - Testes do recálculo do progresso
+# Descrição: Fase atual gravada para todos os atletas de uma vez, encerramento
+#            das fases anteriores e escolha do protocolo pelo tipo da lesão.
+
+from datetime import date, timedelta
+
+from protocolo import RegistroProtocolos, criar_protocolo
+from recalculo_progresso import recalcular_progresso
+from resumo import ler_resumo
+
+HOJE = date(2025, 6, 1)
+
+
+def _atleta(conn, nome, data_cirurgia, tipo_lesao=None, data_lesao=None):
+    """Insere um atleta e, com tipo_lesao, sua lesão (com cirurgia se data_cirurgia for informada)"""
+    paciente_id = conn.execute(
+        "INSERT INTO pacientes (nome, data_cirurgia) VALUES (?, ?) RETURNING id", [nome, data_cirurgia]
+    ).fetchone()[0]
+    if tipo_lesao is not None:
+        conn.execute("""
+            INSERT INTO lesoes (paciente_id, tipo_lesao_id, data_lesao, data_cirurgia)
+            SELECT ?, id, ?, ? FROM tipos_lesao WHERE nome = ?
+        """, [paciente_id, data_lesao, data_cirurgia, tipo_lesao])
+    return paciente_id
+
+
+def _fases(conn, nome):
+    """Fases registradas do atleta: (fase, início, fim, status) em ordem de início"""
+    return conn.execute("""
+        SELECT f.fase, pr.data_inicio, pr.data_fim, pr.status
+        FROM progresso pr
+        JOIN pacientes p ON p.id = pr.paciente_id
+        JOIN fases_reabilitacao f ON f.id = pr.fase_id
+        WHERE p.nome = ?
+        ORDER BY pr.data_inicio
+    """, [nome]).fetchall()
+
+
+def _esperada(protocolo, inicio_tratamento, hoje=HOJE):
+    """Fase prevista pelo protocolo: (fase, início, fim, 'Em andamento')"""
+    indice = protocolo.indice_fase((hoje - inicio_tratamento).days)
+    inicio, fim = protocolo.limites(indice)
+    return (protocolo.fases[indice].fase, inicio_tratamento + timedelta(days=inicio),
+            inicio_tratamento + timedelta(days=fim), 'Em andamento')
+
+
+def test_fase_atual_de_todos_os_atletas(conn):
+    padrao = RegistroProtocolos.carregar(conn).padrao
+    cirurgias = {
+        'Recente': HOJE - timedelta(days=5),
+        'Intermediario': HOJE - timedelta(days=60),
+        'Alta': HOJE - timedelta(days=400),
+    }
+    for nome, data_cirurgia in cirurgias.items():
+        _atleta(conn, nome, data_cirurgia)
+    _atleta(conn, 'Cirurgia Futura', HOJE + timedelta(days=3))
+    _atleta(conn, 'Sem Cirurgia', None)
+
+    resultado = recalcular_progresso(conn, hoje=HOJE)
+
+    assert resultado == {'gravadas': 3, 'encerradas': 0}
+    for nome, data_cirurgia in cirurgias.items():
+        assert _fases(conn, nome) == [_esperada(padrao, data_cirurgia)]
+    assert _fases(conn, 'Recente')[0][0] == 'Fase 1'
+    assert _fases(conn, 'Alta')[0][0] == 'Alta'
+    assert _fases(conn, 'Cirurgia Futura') == []
+    assert _fases(conn, 'Sem Cirurgia') == []
+    assert ler_resumo(conn)['atletas_em_tratamento'] == 3
+
+
+def test_fase_anterior_encerrada_no_recalculo_seguinte(conn):
+    padrao = RegistroProtocolos.carregar(conn).padrao
+    data_cirurgia = HOJE - timedelta(days=10)
+    _atleta(conn, 'Atleta', data_cirurgia)
+    recalcular_progresso(conn, hoje=HOJE)
+    depois = HOJE + timedelta(days=30)
+
+    resultado = recalcular_progresso(conn, hoje=depois)
+
+    assert resultado['encerradas'] == 1
+    anterior, atual = _fases(conn, 'Atleta')
+    assert atual == _esperada(padrao, data_cirurgia, depois)
+    assert anterior == _esperada(padrao, data_cirurgia)[:3] + ('Concluída',)
+    assert anterior[2] < atual[1]
+    assert ler_resumo(conn)['atletas_em_tratamento'] == 1
+
+
+def test_recalculo_repetido_nao_altera_o_progresso(conn):
+    _atleta(conn, 'Atleta', HOJE - timedelta(days=20))
+    recalcular_progresso(conn, hoje=HOJE)
+    antes = conn.execute("SELECT * FROM progresso ORDER BY id").fetchall()
+
+    assert recalcular_progresso(conn, hoje=HOJE)['encerradas'] == 0
+    assert conn.execute("SELECT * FROM progresso ORDER BY id").fetchall() == antes
+
+
+def test_protocolo_pelo_tipo_da_lesao(conn):
+    tipos = dict(conn.execute("SELECT nome, id FROM tipos_lesao").fetchall())
+    menisco = criar_protocolo(conn, 'Menisco', tipos['Menisco'], cirurgico=True, dias_alta=90)
+    registro = RegistroProtocolos.carregar(conn)
+    data_cirurgia = HOJE - timedelta(days=80)
+    _atleta(conn, 'Menisco', data_cirurgia, 'Menisco', data_cirurgia - timedelta(days=7))
+    _atleta(conn, 'LCA', data_cirurgia, 'LCA', data_cirurgia - timedelta(days=7))
+
+    recalcular_progresso(conn, hoje=HOJE, registro=registro)
+
+    assert _fases(conn, 'Menisco') == [_esperada(registro.protocolos[menisco], data_cirurgia)]
+    assert _fases(conn, 'LCA') == [_esperada(registro.padrao, data_cirurgia)]
+    assert _fases(conn, 'Menisco') != _fases(conn, 'LCA')
+
+
+def test_lesao_sem_cirurgia_contada_da_data_da_lesao(conn):
+    tipos = dict(conn.execute("SELECT nome, id FROM tipos_lesao").fetchall())
+    entorse = criar_protocolo(conn, 'Entorse (sem cirurgia)', tipos['Entorse de Tornozelo'],
+                              cirurgico=False, dias_alta=42)
+    registro = RegistroProtocolos.carregar(conn)
+    data_lesao = HOJE - timedelta(days=10)
+    _atleta(conn, 'Entorse', None, 'Entorse de Tornozelo', data_lesao)
+
+    recalcular_progresso(conn, hoje=HOJE, registro=registro)
+
+    assert _fases(conn, 'Entorse') == [_esperada(registro.protocolos[entorse], data_lesao)]
@@ -0,0 +1,314 @@
+# SAGRA - Relatórios
+# Descrição: Consultas dos relatórios do Dashboard e da tela de Busca, independentes do Streamlit.
+#            Cada relatório é montado com uma única consulta limitada ao atleta
+#            pedido, para que o custo não cresça com o histórico de lesões e fases.
+
+from datetime import datetime
+
+from protocolo import obter_registro
+
+
+def relatorio_atleta(conn, paciente_id, hoje=None, registro=None):
+    """
+    Monta o relatório de evolução de um atleta: dados cadastrais, lesão mais recente,
+    fase atual com os detalhes do protocolo e histórico de fases
+    Args:
+        conn: Conexão ou cursor DuckDB
+        paciente_id (int): ID do atleta
+        hoje (date): Data de referência (padrão: data atual)
+        registro (RegistroProtocolos): Protocolos por tipo de lesão (padrão: o registro em
+                                       cache do banco); a alta prevista é a do protocolo da
+                                       lesão mais recente
+    Returns:
+        dict: Relatório do atleta, ou None se o atleta não existir
+    """
+    hoje = hoje or datetime.now().date()
+    registro = registro or obter_registro(conn)
+
+    # Lesão e fase atual vêm de arg_max e o histórico de uma lista ordenada, então cada
+    # tabela é lida uma vez pelo índice de paciente_id, sem produto entre lesões e fases
+    linha = conn.execute("""
+        WITH ultima_lesao AS (
+            SELECT arg_max(
+                {
+                    'tipo_lesao': t.nome,
+                    'data_lesao': l.data_lesao,
+                    'data_cirurgia': l.data_cirurgia,
+                    'observacoes': l.observacoes
+                },
+                (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id)
+            ) AS lesao
+            FROM lesoes l
+            JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+            WHERE l.paciente_id = $paciente_id
+        ),
+        fases AS (
+            SELECT
+                arg_max(
+                    {
+                        'fase_id': f.id,
+                        'fase': f.fase,
+                        'data_inicio': pr.data_inicio,
+                        'data_fim': pr.data_fim,
+                        'status': pr.status,
+                        'periodo_aproximado': f.periodo_aproximado,
+                        'atividades_liberadas': f.atividades_liberadas,
+                        'testes_especificos': f.testes_especificos,
+                        'tratamentos': f.tratamentos,
+                        'preparacao_fisica': f.preparacao_fisica,
+                        'tecnicas_rugby': f.tecnicas_rugby
+                    },
+                    (pr.data_inicio, pr.id)
+                ) AS fase_atual,
+                list(
+                    {
+                        'fase': f.fase,
+                        'data_inicio': pr.data_inicio,
+                        'data_fim': pr.data_fim,
+                        'status': pr.status,
+                        'dias_fase': COALESCE(pr.data_fim, $hoje::DATE) - pr.data_inicio
+                    }
+                    ORDER BY pr.data_inicio, pr.id
+                ) AS historico
+            FROM progresso pr
+            JOIN fases_reabilitacao f ON f.id = pr.fase_id
+            WHERE pr.paciente_id = $paciente_id
+        )
+        SELECT p.id, p.nome, p.data_nascimento, p.posicao, p.clube, p.data_cirurgia,
+               l.lesao, f.fase_atual, f.historico
+        FROM pacientes p, ultima_lesao l, fases f
+        WHERE p.id = $paciente_id
+    """, {'paciente_id': paciente_id, 'hoje': hoje}).fetchone()
+
+    if linha is None:
+        return None
+
+    id_, nome, data_nascimento, posicao, clube, data_cirurgia_atleta, lesao, fase_atual, historico = linha
+    protocolo = registro.protocolo_para(lesao['tipo_lesao'] if lesao else None,
+                                        bool(lesao and lesao['data_cirurgia']))
+    relatorio = {
+        'id': id_,
+        'nome': nome,
+        'data_nascimento': data_nascimento,
+        'posicao': posicao,
+        'clube': clube,
+        'lesao': lesao,
+        'fase_atual': fase_atual,
+        'historico': historico or [],
+        'inicio_tratamento': None,
+        'dias_desde_cirurgia': 0,
+        'dias_ate_alta': None,
+        'progresso': 0.0,
+        'protocolo': protocolo.nome,
+    }
+
+    # Indicadores contados do início do tratamento: a cirurgia da lesão mais recente ou, se ela
+    # não foi cirúrgica, a data de cirurgia do atleta ou a da lesão (ver SQL_PROTOCOLO_ATLETA)
+    if lesao and lesao['data_cirurgia']:
+        inicio = lesao['data_cirurgia']
+    else:
+        inicio = data_cirurgia_atleta or (lesao['data_lesao'] if lesao else None)
+    if inicio is not None:
+        relatorio['inicio_tratamento'] = inicio
+        dias = (hoje - inicio).days
+        relatorio['dias_desde_cirurgia'] = dias
+        relatorio['dias_ate_alta'] = protocolo.dias_alta - dias
+        relatorio['progresso'] = min(100.0, max(0.0, dias / protocolo.dias_alta * 100))
+
+    return relatorio
+
+
+def ultimos_atletas(conn, limite=5):
+    """
+    Lista os atletas com as cirurgias mais recentes e o tipo da lesão mais recente de cada um
+    (a lesão é buscada apenas para os atletas listados)
+    Args:
+        conn: Conexão ou cursor DuckDB
+        limite (int): Número de atletas
+    Returns:
+        pd.DataFrame: Colunas nome, data_cirurgia e lesao
+    """
+    return conn.execute("""
+        WITH ultimos AS (
+            SELECT id, nome, data_cirurgia
+            FROM pacientes
+            ORDER BY data_cirurgia DESC
+            LIMIT ?
+        )
+        SELECT
+            u.nome,
+            u.data_cirurgia,
+            (SELECT arg_max(t.nome, l.data_lesao)
+             FROM lesoes l
+             JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+             WHERE l.paciente_id = u.id) AS lesao
+        FROM ultimos u
+        ORDER BY u.data_cirurgia DESC
+    """, [limite]).df()
+
+
+# Número de atletas por página nas listagens de busca
+TAMANHO_PAGINA = 50
+
+# Data usada no lugar de data de cirurgia ausente na ordenação das páginas
+_DATA_MINIMA = "DATE '0001-01-01'"
+
+
+def _pagina(conn, sql, parametros, tamanho):
+    """
+    Executa a consulta de uma página (limitada a tamanho + 1 linhas para saber se há
+    uma próxima) e separa a chave de continuação
+    Returns:
+        tuple: (DataFrame da página, chave da próxima página ou None)
+    """
+    pagina = conn.execute(sql, {**parametros, 'limite': tamanho + 1}).df()
+    proxima = None
+    if len(pagina) > tamanho:
+        pagina = pagina.iloc[:tamanho]
+        ultima = pagina.iloc[-1]
+        proxima = (ultima['chave_data'].date(), int(ultima['id']))
+    return pagina.drop(columns=['id', 'chave_data']), proxima
+
+
+def atletas_por_lesao(conn, tipo_lesao_id, apos=None, tamanho=TAMANHO_PAGINA):
+    """
+    Lista uma página dos atletas com um tipo de lesão, uma linha por atleta com o status
+    mais recente do progresso, das cirurgias mais recentes para as mais antigas
+    Args:
+        conn: Conexão ou cursor DuckDB
+        tipo_lesao_id (int): ID do tipo de lesão
+        apos (tuple): Chave retornada pela página anterior (None para a primeira página)
+        tamanho (int): Atletas por página
+    Returns:
+        tuple: (DataFrame com nome, data_cirurgia e status, chave da próxima página ou None)
+    """
+    data_apos, id_apos = apos or (None, None)
+    return _pagina(conn, f"""
+        WITH pagina AS (
+            SELECT p.id, p.nome, p.data_cirurgia,
+                   COALESCE(p.data_cirurgia, {_DATA_MINIMA}) AS chave_data
+            FROM pacientes p
+            WHERE p.id IN (SELECT paciente_id FROM lesoes WHERE tipo_lesao_id = $tipo_lesao_id)
+              AND ($id_apos IS NULL
+                   OR (COALESCE(p.data_cirurgia, {_DATA_MINIMA}), p.id) < ($data_apos::DATE, $id_apos))
+            ORDER BY chave_data DESC, p.id DESC
+            LIMIT $limite
+        )
+        SELECT pg.id, pg.chave_data, pg.nome, pg.data_cirurgia,
+               (SELECT arg_max(pr.status, (pr.data_inicio, pr.id))
+                FROM progresso pr WHERE pr.paciente_id = pg.id) AS status
+        FROM pagina pg
+        ORDER BY pg.chave_data DESC, pg.id DESC
+    """, {'tipo_lesao_id': tipo_lesao_id, 'data_apos': data_apos, 'id_apos': id_apos}, tamanho)
+
+
+def contar_atletas_por_lesao(conn, tipo_lesao_id):
+    """
+    Conta os atletas com um tipo de lesão
+    Args:
+        conn: Conexão ou cursor DuckDB
+        tipo_lesao_id (int): ID do tipo de lesão
+    Returns:
+        int: Número de atletas
+    """
+    return conn.execute("""
+        SELECT count(DISTINCT paciente_id) FROM lesoes WHERE tipo_lesao_id = ?
+    """, [tipo_lesao_id]).fetchone()[0]
+
+
+def atletas_por_periodo(conn, data_inicio, data_fim, apos=None, tamanho=TAMANHO_PAGINA):
+    """
+    Lista uma página dos atletas lesionados com cirurgia no período, uma linha por atleta
+    com o tipo da lesão mais recente e o status mais recente do progresso
+    Args:
+        conn: Conexão ou cursor DuckDB
+        data_inicio (date): Início do período
+        data_fim (date): Fim do período
+        apos (tuple): Chave retornada pela página anterior (None para a primeira página)
+        tamanho (int): Atletas por página
+    Returns:
+        tuple: (DataFrame com nome, tipo_lesao, data_cirurgia e status, chave da próxima página ou None)
+    """
+    data_apos, id_apos = apos or (None, None)
+    return _pagina(conn, """
+        WITH pagina AS (
+            SELECT p.id, p.nome, p.data_cirurgia, p.data_cirurgia AS chave_data
+            FROM pacientes p
+            WHERE p.data_cirurgia BETWEEN $data_inicio AND $data_fim
+              AND EXISTS (SELECT 1 FROM lesoes l WHERE l.paciente_id = p.id)
+              AND ($id_apos IS NULL OR (p.data_cirurgia, p.id) > ($data_apos::DATE, $id_apos))
+            ORDER BY p.data_cirurgia, p.id
+            LIMIT $limite
+        )
+        SELECT pg.id, pg.chave_data, pg.nome,
+               (SELECT arg_max(t.nome, (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id))
+                FROM lesoes l JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+                WHERE l.paciente_id = pg.id) AS tipo_lesao,
+               pg.data_cirurgia,
+               (SELECT arg_max(pr.status, (pr.data_inicio, pr.id))
+                FROM progresso pr WHERE pr.paciente_id = pg.id) AS status
+        FROM pagina pg
+        ORDER BY pg.data_cirurgia, pg.id
+    """, {'data_inicio': data_inicio, 'data_fim': data_fim,
+          'data_apos': data_apos, 'id_apos': id_apos}, tamanho)
+
+
+def contar_atletas_por_periodo(conn, data_inicio, data_fim):
+    """
+    Conta os atletas lesionados com cirurgia no período
+    Args:
+        conn: Conexão ou cursor DuckDB
+        data_inicio (date): Início do período
+        data_fim (date): Fim do período
+    Returns:
+        int: Número de atletas
+    """
+    return conn.execute("""
+        SELECT count(*)
+        FROM pacientes p
+        WHERE p.data_cirurgia BETWEEN ? AND ?
+          AND EXISTS (SELECT 1 FROM lesoes l WHERE l.paciente_id = p.id)
+    """, [data_inicio, data_fim]).fetchone()[0]
+
+
+def status_itens_por_fase(conn, campo='preparacao_fisica'):
+    """
+    Conta os itens de um campo do protocolo por fase e status
+    Args:
+        conn: Conexão ou cursor DuckDB
+        campo (str): Campo do protocolo (ver protocolo.CAMPOS_PROTOCOLO)
+    Returns:
+        pd.DataFrame: Colunas fase_id, fase, status e itens
+    """
+    return conn.execute("""
+        SELECT f.id AS fase_id, f.fase, i.status::VARCHAR AS status, count(*) AS itens
+        FROM itens_protocolo i
+        JOIN fases_reabilitacao f ON f.id = i.fase_id
+        WHERE i.campo = ?
+        GROUP BY ALL
+        ORDER BY f.id, status
+    """, [campo]).df()
+
+
+def atletas_liberados(conn, item, status='Completo', limite=TAMANHO_PAGINA):
+    """
+    Lista os atletas cuja fase em andamento tem um item do protocolo com o status pedido
+    (por exemplo, quem já está liberado para 'Agachamento' sem restrição)
+    Args:
+        conn: Conexão ou cursor DuckDB
+        item (str): Nome do item, sem o status (ex.: 'Agachamento', 'Tackle')
+        status (str): Status do item (ver protocolo.STATUS_ITEM)
+        limite (int): Número máximo de atletas
+    Returns:
+        pd.DataFrame: Colunas nome, fase e data_inicio, em ordem alfabética
+    """
+    return conn.execute("""
+        SELECT p.nome, f.fase, pr.data_inicio
+        FROM itens_protocolo i
+        JOIN fases_reabilitacao f ON f.id = i.fase_id
+        JOIN progresso pr ON pr.fase_id = i.fase_id AND pr.status = 'Em andamento'
+        JOIN pacientes p ON p.id = pr.paciente_id
+        WHERE i.item = ? AND i.status = ?
+        ORDER BY p.nome
+        LIMIT ?
+    """, [item, status, limite]).df()
@@ -0,0 +1,112 @@
+# SAGRA - Resumo do Dashboard
+# Descrição: Mantém a tabela resumo_dashboard com as métricas do Dashboard já
+#            calculadas. As operações de escrita ajustam as métricas afetadas na
+#            mesma transação; a reconstrução completa recalcula tudo a partir das
+#            tabelas e serve também para verificar a consistência do resumo.
+#
+# Uso: python resumo.py --banco SAGRA.db [--reconstruir]
+
+import argparse
+
+# Consultas que calculam cada métrica a partir das tabelas
+METRICAS = {
+    'total_atletas': "SELECT count(*) FROM pacientes",
+    'atletas_em_tratamento': """
+        SELECT count(DISTINCT paciente_id) FROM progresso WHERE status = 'Em andamento'
+    """,
+    'tipos_lesao_registrados': "SELECT count(DISTINCT tipo_lesao_id) FROM lesoes",
+}
+
+
+def ler_resumo(conn):
+    """
+    Lê as métricas do Dashboard
+    Args:
+        conn: Conexão ou cursor DuckDB
+    Returns:
+        dict: Valor de cada métrica (0 para métricas ausentes)
+    """
+    valores = dict(conn.execute("SELECT metrica, valor FROM resumo_dashboard").fetchall())
+    return {metrica: valores.get(metrica, 0) for metrica in METRICAS}
+
+
+def calcular_metricas(conn, metricas=None):
+    """
+    Calcula métricas diretamente das tabelas, sem gravar
+    Args:
+        conn: Conexão ou cursor DuckDB
+        metricas (list): Métricas a calcular (padrão: todas)
+    Returns:
+        dict: Valor de cada métrica
+    """
+    metricas = metricas or list(METRICAS)
+    sql = "SELECT " + ", ".join(f"({METRICAS[m]})" for m in metricas)
+    return dict(zip(metricas, conn.execute(sql).fetchone()))
+
+
+def reconstruir_resumo(conn, metricas=None):
+    """
+    Recalcula e grava métricas do resumo em uma única instrução
+    (não abre transação; pode ser usada dentro de uma transação em andamento)
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        metricas (list): Métricas a reconstruir (padrão: todas)
+    Returns:
+        dict: Valores gravados
+    """
+    valores = calcular_metricas(conn, metricas)
+    conn.execute("""
+        INSERT INTO resumo_dashboard (metrica, valor, atualizado_em)
+        SELECT unnest($metricas), unnest($valores), current_timestamp
+        ON CONFLICT (metrica) DO UPDATE
+        SET valor = excluded.valor,
+            atualizado_em = excluded.atualizado_em
+    """, {'metricas': list(valores), 'valores': list(valores.values())})
+    return valores
+
+
+def ajustar_resumo(conn, **variacoes):
+    """
+    Soma variações às métricas do resumo; deve ser chamada na mesma transação da
+    escrita que as causou
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        variacoes (int): Variação de cada métrica, pelo nome (zeros são ignorados)
+    """
+    variacoes = {metrica: delta for metrica, delta in variacoes.items() if delta}
+    if not variacoes:
+        return
+    conn.execute("""
+        UPDATE resumo_dashboard
+        SET valor = valor + v.delta,
+            atualizado_em = current_timestamp
+        FROM (SELECT unnest($metricas) AS metrica, unnest($deltas) AS delta) v
+        WHERE resumo_dashboard.metrica = v.metrica
+    """, {'metricas': list(variacoes), 'deltas': list(variacoes.values())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica ou reconstrói o resumo do Dashboard")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Grava os valores recalculados (padrão: apenas compara)")
+    args = parser.parse_args()
+
+    import duckdb
+
+    conn = duckdb.connect(args.banco, read_only=not args.reconstruir)
+    gravado = ler_resumo(conn)
+    calculado = reconstruir_resumo(conn) if args.reconstruir else calcular_metricas(conn)
+    divergentes = 0
+    for metrica in METRICAS:
+        situacao = 'ok' if gravado[metrica] == calculado[metrica] else 'DIVERGENTE'
+        divergentes += situacao != 'ok'
+        print(f"{metrica:<26} gravado={gravado[metrica]:<10} calculado={calculado[metrica]:<10} {situacao}")
+    if args.reconstruir and divergentes:
+        print(f"{divergentes} métrica(s) corrigida(s)")
+    conn.close()
+    raise SystemExit(1 if divergentes and not args.reconstruir else 0)
+
+
+if __name__ == '__main__':
+    main()
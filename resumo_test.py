@@ -0,0 +1,31 @@
+# SAGRA - Testes do resumo do Dashboard
+# Descrição: As variações gravadas junto com cada escrita mantêm o resumo igual
+#            às métricas calculadas das tabelas.
+
+from datetime import date
+
+from cadastro import cadastrar_atleta, cadastrar_lesao, registrar_acompanhamento
+from recalculo_progresso import recalcular_progresso
+from resumo import calcular_metricas, ler_resumo
+
+
+def test_escritas_ajustam_o_resumo(conn):
+    fase_id = conn.execute("SELECT min(id) FROM fases_reabilitacao").fetchone()[0]
+    ana = cadastrar_atleta(conn, 'Ana', posicao='Pilar', clube='Clube A')
+    assert ler_resumo(conn) == calcular_metricas(conn) == {
+        'total_atletas': 1, 'atletas_em_tratamento': 0, 'tipos_lesao_registrados': 0,
+    }
+
+    cadastrar_lesao(conn, ana, 1, date(2024, 5, 1))
+    cadastrar_lesao(conn, ana, 1, date(2024, 6, 1))
+    cadastrar_lesao(conn, ana, 2, date(2024, 7, 1))
+    assert ler_resumo(conn)['tipos_lesao_registrados'] == 2
+
+    # Atleta novo já com a fase atual; o mesmo registro repetido não grava nada
+    inicio = date(2024, 5, 10)
+    assert registrar_acompanhamento(conn, 'Bia', inicio, fase_id, inicio, date(2024, 5, 24)) == 2
+    assert registrar_acompanhamento(conn, 'Bia', inicio, fase_id, inicio, date(2024, 5, 24)) == 0
+    assert ler_resumo(conn)['atletas_em_tratamento'] == 1
+
+    recalcular_progresso(conn, hoje=date(2024, 6, 1))
+    assert ler_resumo(conn) == calcular_metricas(conn)
@@ -0,0 +1,295 @@
+# SAGRA - Risco e retorno ao jogo
+# Descrição: Pontua o risco de retorno de todos os atletas com cirurgia em uma
+#            única passada vetorizada: uma consulta traz a lesão mais recente, a
+#            fase registrada e a dor média das últimas sessões de cada atleta, e o
+#            cálculo combina, com pesos configuráveis, o avanço no protocolo, a
+#            fase e a dor, multiplicado por um fator por tipo de lesão. A previsão
+#            de alta e as fases vêm do protocolo do tipo de lesão de cada atleta
+#            (protocolo.RegistroProtocolos). O elenco avaliado fica em cache com
+#            validade, descartado pelas escritas nas tabelas lidas.
+#
+# Uso: python risco.py --banco SAGRA.db
+
+import argparse
+from dataclasses import dataclass, fields, replace
+from datetime import datetime
+
+import numpy as np
+
+from listas import CacheValidade, origem
+
+# Validade do elenco avaliado em cache (em segundos); cobre gravações feitas por outros processos
+VALIDADE_RISCO_SEGUNDOS = 600
+
+# Número de atletas exibidos em cada lista (em risco e próximos do retorno)
+LIMITE_LISTA_RISCO = 20
+
+# Níveis de risco, do maior para o menor
+NIVEIS_RISCO = ['Alto', 'Médio', 'Baixo']
+
+# Tabelas lidas pela avaliação (para a invalidação após escritas)
+DEPENDENCIAS = {'pacientes', 'lesoes', 'progresso', 'sessoes'}
+
+# Cache compartilhado pelo processo
+cache_risco = CacheValidade(VALIDADE_RISCO_SEGUNDOS)
+
+
+@dataclass(frozen=True)
+class RegrasRisco:
+    """
+    Pesos e limites da pontuação de risco (0 a 100). Cada componente vale de 0 (sem
+    risco) a 1: avanço no protocolo (1 no dia da cirurgia, 0 na alta prevista), fase
+    registrada (1 na primeira, 0 na última) e dor média das sessões recentes (dor / 10).
+    A pontuação é a média ponderada dos componentes disponíveis (atletas sem sessões
+    não usam o peso da dor) multiplicada pelo fator do tipo de lesão.
+    """
+    peso_progresso: float = 0.5
+    peso_fase: float = 0.3
+    peso_dor: float = 0.2
+    # Pares (tipo de lesão, fator); tipos ausentes usam 1.0
+    fatores_lesao: tuple = ()
+    # Pontuação mínima de cada nível
+    limite_alto: float = 66.0
+    limite_medio: float = 33.0
+    # Semanas de sessões consideradas na dor média
+    semanas_dor: int = 2
+    # Dias até a alta prevista em que o atleta é listado como próximo do retorno
+    dias_retorno_proximo: int = 30
+
+    @classmethod
+    def da_configuracao(cls, config):
+        """
+        Regras com os valores da seção 'risco' do config.yaml sobre os padrões
+        Args:
+            config (dict): Configuração do aplicativo (sem a seção, valem os padrões)
+        Returns:
+            RegrasRisco: Regras configuradas
+        """
+        secao = dict((config or {}).get('risco') or {})
+        desconhecidas = set(secao) - {f.name for f in fields(cls)}
+        if desconhecidas:
+            raise ValueError(f"Chave(s) desconhecida(s) na seção 'risco': {', '.join(sorted(desconhecidas))}")
+        if 'fatores_lesao' in secao:
+            secao['fatores_lesao'] = tuple(sorted((str(t), float(f)) for t, f in secao['fatores_lesao'].items()))
+        return replace(cls(), **secao)
+
+
+# Atletas com cirurgia na lesão mais recente, com a fase registrada mais recente e a dor
+# média das sessões das últimas semanas
+_ELENCO = """
+    WITH ultima_lesao AS (
+        SELECT l.paciente_id,
+               arg_max({{'tipo_lesao': t.nome, 'data_cirurgia': l.data_cirurgia}},
+                       (COALESCE(l.data_lesao, DATE '0001-01-01'), l.id)) AS lesao
+        FROM lesoes l
+        JOIN tipos_lesao t ON t.id = l.tipo_lesao_id
+        {filtro_lesoes}
+        GROUP BY l.paciente_id
+    ),
+    fase_registrada AS (
+        SELECT paciente_id, arg_max(fase_id, (data_inicio, id)) AS fase_id
+        FROM progresso
+        {filtro_progresso}
+        GROUP BY paciente_id
+    ),
+    dor AS (
+        SELECT paciente_id, sum(dor_soma) / sum(dor_registros) AS dor_media
+        FROM sessoes_semanais
+        WHERE semana > date_trunc('week', $hoje::DATE)::DATE - 7 * $semanas_dor::INTEGER
+          AND semana <= $hoje::DATE
+          AND dor_registros > 0
+          {filtro_sessoes}
+        GROUP BY paciente_id
+    )
+    SELECT p.id AS paciente_id, p.nome, p.clube, p.posicao,
+           ul.lesao.tipo_lesao AS tipo_lesao,
+           ul.lesao.data_cirurgia AS data_cirurgia,
+           fr.fase_id,
+           d.dor_media
+    FROM pacientes p
+    JOIN ultima_lesao ul ON ul.paciente_id = p.id
+    LEFT JOIN fase_registrada fr ON fr.paciente_id = p.id
+    LEFT JOIN dor d ON d.paciente_id = p.id
+    WHERE ul.lesao.data_cirurgia IS NOT NULL
+"""
+
+
+def _consultar_elenco(conn, hoje, semanas_dor, paciente_id=None):
+    """Dados de entrada da avaliação de todos os atletas ou de um só (pelos índices de paciente_id)"""
+    filtro = "AND paciente_id = $paciente_id" if paciente_id is not None else ""
+    sql = _ELENCO.format(
+        filtro_lesoes="WHERE l.paciente_id = $paciente_id" if paciente_id is not None else "",
+        filtro_progresso="WHERE paciente_id = $paciente_id" if paciente_id is not None else "",
+        filtro_sessoes=filtro,
+    )
+    parametros = {'hoje': hoje, 'semanas_dor': semanas_dor}
+    if paciente_id is not None:
+        parametros['paciente_id'] = paciente_id
+    return conn.execute(sql, parametros).df()
+
+
+def pontuar(elenco, registro, regras, hoje):
+    """
+    Calcula a pontuação e o nível de risco e a previsão de alta de todos os atletas de uma vez
+    Args:
+        elenco (DataFrame): Colunas tipo_lesao, data_cirurgia, fase_id e dor_media
+        registro (RegistroProtocolos): Protocolos com as fases e a alta prevista de cada tipo de lesão
+        regras (RegrasRisco): Pesos e limites
+        hoje (date): Data de referência
+    Returns:
+        DataFrame: O elenco com protocolo, dias_desde_cirurgia, progresso (0 a 100), indice_fase,
+                   pontuacao, nivel_risco, dias_ate_alta e alta_prevista
+    """
+    elenco = elenco.copy()
+    tipos = elenco['tipo_lesao']
+    protocolos = {tipo: registro.protocolo_para(tipo) for tipo in tipos.unique()}
+    ids = tipos.map({tipo: p.id for tipo, p in protocolos.items()}).to_numpy(dtype='int64')
+    dias_alta = tipos.map({tipo: p.dias_alta for tipo, p in protocolos.items()}).to_numpy(dtype='int64')
+    datas = elenco['data_cirurgia'].to_numpy(dtype='datetime64[D]')
+    dias = (np.datetime64(hoje, 'D') - datas).astype('int64')
+    avanco = np.clip(dias / dias_alta, 0.0, 1.0)
+
+    # Fase registrada no acompanhamento, se for do protocolo do atleta; senão, a fase do
+    # protocolo pelos dias. Cada protocolo é calculado de uma vez para todos os seus atletas.
+    indice_fase = np.zeros(len(elenco), dtype='int64')
+    ultima_fase = np.ones(len(elenco), dtype='int64')
+    for protocolo in {p.id: p for p in protocolos.values()}.values():
+        linhas = ids == protocolo.id
+        posicoes = {fase.id: indice for indice, fase in enumerate(protocolo.fases)}
+        registrada = elenco['fase_id'][linhas].map(posicoes).to_numpy(dtype='float64', na_value=np.nan)
+        pelo_protocolo = protocolo.indice_fase_lote(np.maximum(dias[linhas], 0))
+        indice_fase[linhas] = np.where(np.isnan(registrada), pelo_protocolo, registrada)
+        ultima_fase[linhas] = max(len(protocolo.fases) - 1, 1)
+
+    dor = elenco['dor_media'].to_numpy(dtype='float64', na_value=np.nan) / 10
+    com_dor = ~np.isnan(dor)
+    peso_dor = np.where(com_dor, regras.peso_dor, 0.0)
+    media = (
+        regras.peso_progresso * (1 - avanco)
+        + regras.peso_fase * (1 - indice_fase / ultima_fase)
+        + peso_dor * np.where(com_dor, dor, 0.0)
+    ) / (regras.peso_progresso + regras.peso_fase + peso_dor)
+    fatores = dict(regras.fatores_lesao)
+    fator = elenco['tipo_lesao'].map(lambda tipo: fatores.get(tipo, 1.0)).to_numpy(dtype='float64')
+    pontuacao = np.clip(100 * media * fator, 0.0, 100.0)
+
+    elenco['protocolo'] = tipos.map({tipo: p.nome for tipo, p in protocolos.items()})
+    elenco['dias_desde_cirurgia'] = dias
+    elenco['progresso'] = avanco * 100
+    elenco['indice_fase'] = indice_fase
+    elenco['pontuacao'] = pontuacao
+    elenco['nivel_risco'] = np.select(
+        [pontuacao >= regras.limite_alto, pontuacao >= regras.limite_medio], NIVEIS_RISCO[:2], NIVEIS_RISCO[2]
+    )
+    elenco['dias_ate_alta'] = dias_alta - dias
+    elenco['alta_prevista'] = datas + dias_alta.astype('timedelta64[D]')
+    return elenco
+
+
+def avaliar_elenco(conn, registro, regras=None, hoje=None):
+    """
+    Avalia o risco de todos os atletas com cirurgia, em cache até uma escrita nas tabelas
+    lidas ou uma alteração dos protocolos
+    Args:
+        conn: Conexão ou cursor DuckDB
+        registro (RegistroProtocolos): Protocolos de cada tipo de lesão
+        regras (RegrasRisco): Pesos e limites (padrão: RegrasRisco())
+        hoje (date): Data de referência (padrão: data atual)
+    Returns:
+        DataFrame: Uma linha por atleta (ver pontuar), da maior para a menor pontuação
+    """
+    regras = regras or RegrasRisco()
+    hoje = hoje or datetime.now().date()
+
+    def carregar():
+        elenco = pontuar(_consultar_elenco(conn, hoje, regras.semanas_dor), registro, regras, hoje)
+        return elenco.sort_values(['pontuacao', 'paciente_id'], ascending=[False, True], ignore_index=True)
+
+    return cache_risco.obter(('elenco', regras, registro.versao, hoje, origem(conn)), carregar)
+
+
+def avaliar_atleta(conn, paciente_id, registro, regras=None, hoje=None):
+    """
+    Avalia o risco de um atleta com as mesmas regras do elenco
+    Args:
+        conn: Conexão ou cursor DuckDB
+        paciente_id (int): ID do atleta
+        registro (RegistroProtocolos): Protocolos de cada tipo de lesão
+        regras (RegrasRisco): Pesos e limites (padrão: RegrasRisco())
+        hoje (date): Data de referência (padrão: data atual)
+    Returns:
+        dict: Linha da avaliação (ver pontuar), ou None se o atleta não tiver cirurgia registrada
+    """
+    regras = regras or RegrasRisco()
+    hoje = hoje or datetime.now().date()
+    elenco = pontuar(_consultar_elenco(conn, hoje, regras.semanas_dor, paciente_id), registro, regras, hoje)
+    return elenco.iloc[0].to_dict() if len(elenco) else None
+
+
+def em_risco(elenco, limite=LIMITE_LISTA_RISCO):
+    """
+    Atletas entre a cirurgia e a alta prevista com risco alto, do maior risco para o menor
+    Args:
+        elenco (DataFrame): Avaliação do elenco (ver avaliar_elenco)
+        limite (int): Número de atletas
+    Returns:
+        DataFrame: Linhas do elenco
+    """
+    selecao = elenco[(elenco['nivel_risco'] == 'Alto') & (elenco['dias_desde_cirurgia'] >= 0)
+                     & (elenco['dias_ate_alta'] >= 0)]
+    return selecao.head(limite)
+
+
+def proximos_retorno(elenco, regras=None, limite=LIMITE_LISTA_RISCO):
+    """
+    Atletas a até regras.dias_retorno_proximo dias da alta prevista, pela data da alta
+    Args:
+        elenco (DataFrame): Avaliação do elenco (ver avaliar_elenco)
+        regras (RegrasRisco): Regras usadas na avaliação (padrão: RegrasRisco())
+        limite (int): Número de atletas
+    Returns:
+        DataFrame: Linhas do elenco
+    """
+    regras = regras or RegrasRisco()
+    selecao = elenco[elenco['dias_ate_alta'].between(0, regras.dias_retorno_proximo)]
+    return selecao.sort_values(['dias_ate_alta', 'pontuacao']).head(limite)
+
+
+def invalidar_risco(*tabelas):
+    """
+    Descarta o elenco avaliado em cache se alguma tabela lida foi alterada; deve ser
+    chamada após gravar em pacientes, lesoes, progresso ou sessoes
+    Args:
+        tabelas (str): Tabelas alteradas (nenhuma para descartar sempre)
+    """
+    if not tabelas or DEPENDENCIAS & set(tabelas):
+        cache_risco.invalidar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação de risco e retorno de todos os atletas")
+    parser.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+    parser.add_argument('--limite', type=int, default=LIMITE_LISTA_RISCO, help="Atletas em cada lista")
+    args = parser.parse_args()
+
+    import time
+
+    import duckdb
+
+    from protocolo import obter_registro
+
+    conn = duckdb.connect(args.banco, read_only=True)
+    inicio = time.perf_counter()
+    elenco = avaliar_elenco(conn, obter_registro(conn))
+    print(f"{len(elenco)} atletas avaliados em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    print(elenco['nivel_risco'].value_counts().reindex(NIVEIS_RISCO, fill_value=0).to_string())
+    colunas = ['nome', 'clube', 'tipo_lesao', 'protocolo', 'dias_desde_cirurgia', 'pontuacao', 'dias_ate_alta']
+    print("\nEm risco:")
+    print(em_risco(elenco, args.limite)[colunas].to_string(index=False))
+    print("\nPróximos do retorno:")
+    print(proximos_retorno(elenco, limite=args.limite)[colunas].to_string(index=False))
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
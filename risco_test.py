@@ -0,0 +1,61 @@
+# SAGRA - Testes da pontuação de risco
+# Descrição: Pontuação, nível e alta prevista calculados sobre o elenco inteiro.
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from protocolo import RegistroProtocolos
+from risco import RegrasRisco, pontuar
+
+HOJE = date(2025, 6, 1)
+
+
+def _elenco(*atletas):
+    """DataFrame de entrada de pontuar: (dias desde a cirurgia, fase_id, dor média) por atleta"""
+    return pd.DataFrame({
+        'tipo_lesao': ['LCA'] * len(atletas),
+        'data_cirurgia': [HOJE - timedelta(days=dias) for dias, _, _ in atletas],
+        'fase_id': pd.array([fase for _, fase, _ in atletas], dtype='Int64'),
+        'dor_media': [np.nan if dor is None else dor for _, _, dor in atletas],
+    })
+
+
+def test_pontuacao_cai_com_o_avanco_no_protocolo(conn):
+    registro = RegistroProtocolos.carregar(conn)
+    dias_alta = registro.padrao.dias_alta
+
+    avaliado = pontuar(_elenco((0, None, None), (60, None, None), (dias_alta + 10, None, None)),
+                       registro, RegrasRisco(), HOJE)
+
+    assert avaliado['pontuacao'].tolist() == sorted(avaliado['pontuacao'], reverse=True)
+    assert avaliado['pontuacao'].iloc[0] == 100.0
+    assert avaliado['pontuacao'].iloc[2] == 0.0
+    assert avaliado['nivel_risco'].tolist()[0] == 'Alto'
+    assert avaliado['nivel_risco'].tolist()[2] == 'Baixo'
+    assert avaliado['dias_ate_alta'].tolist() == [dias_alta, dias_alta - 60, -10]
+    assert avaliado['protocolo'].unique().tolist() == [registro.padrao.nome]
+
+
+def test_fase_registrada_e_dor_entram_na_pontuacao(conn):
+    registro = RegistroProtocolos.carregar(conn)
+    primeira, ultima = registro.padrao.fases[0].id, registro.padrao.fases[-1].id
+
+    avaliado = pontuar(_elenco((60, primeira, None), (60, ultima, None), (60, ultima, 10.0)),
+                       registro, RegrasRisco(), HOJE)
+
+    sem_dor_primeira, sem_dor_ultima, com_dor = avaliado['pontuacao']
+    assert avaliado['indice_fase'].tolist() == [0, len(registro.padrao.fases) - 1, len(registro.padrao.fases) - 1]
+    assert sem_dor_primeira > sem_dor_ultima
+    assert com_dor > sem_dor_ultima
+
+
+def test_fator_do_tipo_de_lesao(conn):
+    registro = RegistroProtocolos.carregar(conn)
+    elenco = _elenco((30, None, None))
+
+    base = pontuar(elenco, registro, RegrasRisco(), HOJE)['pontuacao'].iloc[0]
+    reduzida = pontuar(elenco, registro, RegrasRisco(fatores_lesao=(('LCA', 0.5),)), HOJE)['pontuacao'].iloc[0]
+
+    assert reduzida == base * 0.5
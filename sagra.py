@@ -4,18 +4,16 @@
 # Descrição: Sistema para acompanhamento e gerenciamento da reabilitação de atletas
 #            de rugby após cirurgia de reconstrução do LCA.
 
-# Importação das bibliotecas necessárias
+# Importação das bibliotecas necessárias. Apenas o necessário para a tela de login é
+# importado aqui; o banco e as telas (duckdb, pandas, numpy) são importados após o login.
 import streamlit as st
-import duckdb
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 import os
-import yaml
-from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
-import bcrypt
-import pandas as pd
+import tempfile
+from contextlib import ExitStack
+from autenticacao import autenticar, botao_logout, metricas_autenticacao, motivo_recusa
+from configuracao import obter_configuracao, obter_logo
+from instrumentacao import PERFIL_ATIVO, definir_tela, finalizar_rastro, iniciar_rastro, secao
 
 # Configuração da página Streamlit (deve ser a primeira chamada Streamlit)
 st.set_page_config(
@@ -24,283 +22,176 @@ st.set_page_config(
     layout="wide"
 )
 
-# Função auxiliar para extrair número de dias do período
-def extrair_dias(periodo):
+# Rastro desta execução do script (apenas com SAGRA_PERFIL=1)
+rastro = iniciar_rastro()
+
+def paginacao(chave, filtro):
     """
-    Extrai o número de dias de um período especificado no formato 'X a Y dias' ou 'após X dias'
+    Retorna o estado de navegação de uma listagem paginada, reiniciando-o quando o filtro muda
     Args:
-        periodo (str): String contendo o período
+        chave (str): Chave do estado na sessão
+        filtro: Valor do filtro aplicado à listagem
     Returns:
-        int: Número de dias do período
+        dict: Filtro e pilha de chaves de início das páginas visitadas
     """
-    if 'após' in periodo:
-        return int(periodo.split(' ')[1])
-    else:
-        dias = periodo.split(' a ')
-        return int(dias[-1].split(' ')[0])
-
-# Carrega as configurações de autenticação
-with open('config.yaml') as file:
-    config = yaml.load(file, Loader=SafeLoader)
-
-# Cria o autenticador
-authenticator = stauth.Authenticate(
-    credentials=config['credentials'],
-    cookie_name=config['cookie']['name'],
-    key=config['cookie']['key'],
-    cookie_expiry_days=config['cookie']['expiry_days']
-)
+    estado = st.session_state.get(chave)
+    if estado is None or estado['filtro'] != filtro:
+        estado = st.session_state[chave] = {'filtro': filtro, 'chaves': [None]}
+    return estado
+
+
+def controles_paginacao(chave, proxima, total):
+    """
+    Exibe o total e os botões de navegação de uma listagem paginada
+    Args:
+        chave (str): Chave do estado na sessão (o mesmo usado em paginacao)
+        proxima (tuple): Chave da próxima página (None na última)
+        total (int): Total de atletas da listagem
+    """
+    estado = st.session_state[chave]
+    paginas = max(1, -(-total // TAMANHO_PAGINA))
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("◀ Anterior", key=f"{chave}_anterior", disabled=len(estado['chaves']) == 1,
+                  on_click=lambda: estado['chaves'].pop())
+    with col2:
+        st.caption(f"Página {len(estado['chaves'])} de {paginas} · {total} atletas")
+    with col3:
+        st.button("Próxima ▶", key=f"{chave}_proxima", disabled=proxima is None,
+                  on_click=lambda: estado['chaves'].append(proxima))
+
+
+def painel_desenvolvedor(banco, registro):
+    """
+    Mostra na sidebar as medições da execução e os contadores do processo
+    Args:
+        banco (BancoDados): Banco compartilhado pelo processo
+        registro (dict): Rastro finalizado da execução
+    """
+    import pandas as pd
+
+    with st.sidebar.expander("🛠️ Desenvolvedor"):
+        st.caption(f"Tela: {registro['tela'] or '-'}")
+        col1, col2 = st.columns(2)
+        col1.metric("Execução", f"{registro['duracao_ms']:.0f} ms")
+        col2.metric("Consultas", registro['consultas'], f"{registro['tempo_consultas_ms']:.0f} ms", delta_color="off")
+        st.write("**Seções**")
+        st.dataframe(pd.DataFrame(registro['secoes']), hide_index=True)
+        if registro['detalhe_consultas']:
+            st.write("**Consultas mais lentas**")
+            consultas = pd.DataFrame(registro['detalhe_consultas'])
+            st.dataframe(consultas.nlargest(10, 'duracao_ms'), hide_index=True)
+        st.write("**Banco**")
+        st.json(banco.metricas.resumo())
+        st.write("**Escritas**")
+        st.json(contador_escritas.resumo())
+        st.write("**Escritor**")
+        st.json(banco.escritor.resumo())
+        st.write("**Autenticação**")
+        st.json(metricas_autenticacao.resumo())
+
+
+def seletor_atleta(conn, rotulo, chave):
+    """
+    Seletor de atleta com busca pelo início do nome; consulta apenas os atletas que
+    correspondem ao texto digitado, sem carregar o cadastro inteiro
+    Args:
+        conn: Conexão ou cursor DuckDB
+        rotulo (str): Rótulo do seletor
+        chave (str): Prefixo das chaves dos widgets
+    Returns:
+        tuple: (nome, ID) do atleta selecionado, ou (None, None)
+    """
+    prefixo = st.text_input(f"Buscar {rotulo.lower()} (início do nome)", key=f"{chave}_busca")
+    encontrados = buscar_atletas(conn, prefixo)
+    nome = st.selectbox(rotulo, list(encontrados), key=f"{chave}_atleta")
+    return nome, encontrados.get(nome)
+
+
+# Configuração de autenticação (lida uma vez por processo)
+with secao('configuracao'):
+    config = obter_configuracao()
 
 # Container centralizado para o login
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
-    st.image("logo_sagra.png", width=200)
+    st.image(obter_logo(), width=200)
     st.title("SAGRA")
     st.caption("Sistema de Acompanhamento e Gerenciamento de Reabilitação de Atletas")
 
-# Inicializa o status de autenticação
+# Identidade da sessão (verificada uma vez; as reexecuções reaproveitam a da sessão)
 try:
-    name, authentication_status, username = authenticator.login('Login')
+    with secao('login'):
+        name, authentication_status, username = autenticar(config)
 except Exception as e:
     st.error(f"Erro na autenticação: {str(e)}")
+    finalizar_rastro(rastro)
     st.stop()
 
 # Verifica o status da autenticação
 if authentication_status == False:
-    st.error('❌ Usuário ou senha incorretos')
+    st.error(f"❌ {motivo_recusa() or 'Usuário ou senha incorretos'}")
+    finalizar_rastro(rastro)
     st.stop()
 elif authentication_status == None:
     st.info('👋 Por favor, faça login para continuar')
+    finalizar_rastro(rastro)
     st.stop()
 
-# Função de inicialização do banco de dados
-def init_database():
-    """Inicializa a conexão com o banco de dados DuckDB e cria as tabelas se necessário"""
+# Módulos do aplicativo (importados uma vez por processo, na primeira sessão autenticada)
+with secao('importacoes'):
+    from banco import obter_banco
+    from clubes import PASTA_CLUBES, clube_usuario, clubes_configurados, cursor_consolidado, obter_banco_clube
+    from cadastro import POSICOES, cadastrar_atleta, cadastrar_lesao, contador_escritas, registrar_acompanhamento
+    from exportacao import iniciar_exportacao_periodica
+    from listas import buscar_atletas, tipos_lesao, tipos_lesao_registrados
+    from protocolo import obter_registro
+    from recalculo_progresso import iniciar_recalculo_periodico
+    from relatorios import (TAMANHO_PAGINA, atletas_por_lesao, atletas_por_periodo, contar_atletas_por_lesao,
+                            contar_atletas_por_periodo, relatorio_atleta, ultimos_atletas)
+    from resumo import ler_resumo
+
+# Se autenticado, mostra o conteúdo principal
+if authentication_status:
+    # Banco compartilhado pelo processo (aberto e inicializado uma única vez). No modo por
+    # clube (SAGRA_CLUBES), o banco do clube do usuário; usuários sem clube escolhem o clube.
     try:
-        # Tenta primeiro uma conexão exclusiva
-        conn = duckdb.connect('SAGRA.db')
-        
-        # Cria as sequências para os IDs
-        conn.execute("""
-            CREATE SEQUENCE IF NOT EXISTS seq_pacientes START 1;
-            CREATE SEQUENCE IF NOT EXISTS seq_lesoes START 1;
-            CREATE SEQUENCE IF NOT EXISTS seq_fases START 1;
-            CREATE SEQUENCE IF NOT EXISTS seq_progresso START 1;
-        """)
-        
-        # Cria as tabelas se não existirem
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS pacientes (
-                id INTEGER PRIMARY KEY DEFAULT nextval('seq_pacientes'),
-                nome VARCHAR UNIQUE NOT NULL,
-                data_nascimento DATE,
-                posicao VARCHAR,
-                clube VARCHAR,
-                data_cirurgia DATE
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS lesoes (
-                id INTEGER PRIMARY KEY DEFAULT nextval('seq_lesoes'),
-                paciente_id INTEGER NOT NULL,
-                tipo_lesao VARCHAR NOT NULL,
-                data_lesao DATE,
-                data_cirurgia DATE,
-                observacoes TEXT,
-                FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS fases_reabilitacao (
-                id INTEGER PRIMARY KEY DEFAULT nextval('seq_fases'),
-                fase VARCHAR NOT NULL,
-                periodo_aproximado VARCHAR NOT NULL,
-                atividades_liberadas TEXT,
-                testes_especificos TEXT,
-                tratamentos TEXT,
-                preparacao_fisica TEXT,
-                tecnicas_rugby TEXT
-            )
-        """)
-        
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS progresso (
-                id INTEGER PRIMARY KEY DEFAULT nextval('seq_progresso'),
-                paciente_id INTEGER NOT NULL,
-                fase VARCHAR NOT NULL,
-                data_inicio DATE NOT NULL,
-                data_fim DATE,
-                status VARCHAR DEFAULT 'Em andamento',
-                FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-                UNIQUE(paciente_id, fase, data_inicio)
-            )
-        """)
-        
-        # Insere as fases padrão se a tabela estiver vazia
-        if conn.execute("SELECT COUNT(*) FROM fases_reabilitacao").fetchone()[0] == 0:
-            conn.execute("""
-                INSERT INTO fases_reabilitacao (fase, periodo_aproximado, atividades_liberadas, testes_especificos, tratamentos, preparacao_fisica, tecnicas_rugby) VALUES
-                ('Fase 1', '1 a 14 dias', 'Mobilização passiva, Exercícios isométricos', 'Avaliação de edema, Avaliação de ADM', 'Crioterapia,Eletroterapia,Exercícios de mobilização passiva', 'Isometria de quadríceps (Progressão),Exercícios de ADM (Progressão)', 'Tackle:1,Passe:1,Scrum:1,Ruck:1,Treino em campo:1'),
-                ('Fase 2', '15 a 28 dias', 'Exercícios em CCA, Bicicleta estacionária', 'Teste de força muscular, Avaliação de marcha', 'Exercícios ativos,Treino de marcha,Fortalecimento', 'Leg Press (Progressão),Agachamento (Restrição),Bicicleta (Completo)', 'Tackle:1,Passe:2,Scrum:1,Ruck:1,Treino em campo:1'),
-                ('Fase 3', '29 a 90 dias', 'Exercícios em CCF, Corrida em linha reta', 'Teste de agilidade, Avaliação funcional', 'Exercícios pliométricos,Treino de corrida,Core', 'Agachamento (Progressão),Corrida (Progressão),Pliometria (Restrição)', 'Tackle:1,Passe:3,Scrum:2,Ruck:2,Treino em campo:2'),
-                ('Fase 4', '91 a 180 dias', 'Exercícios específicos do rugby, Treino com bola', 'Teste de salto, Y-Balance Test', 'Treino específico,Agilidade,Potência', 'Pliometria (Progressão),Agilidade (Progressão),Potência (Progressão)', 'Tackle:2,Passe:3,Scrum:2,Ruck:2,Treino em campo:3'),
-                ('Fase 5', '181 a 240 dias', 'Retorno gradual ao treino com equipe', 'Testes específicos do rugby', 'Treino com equipe,Contato gradual,Jogo simulado', 'Treino completo (Progressão),Contato (Progressão)', 'Tackle:2,Passe:3,Scrum:3,Ruck:3,Treino em campo:3'),
-                ('Alta', 'após 240 dias', 'Retorno completo às atividades', '-', 'Manutenção,Prevenção', 'Treino completo (Completo)', 'Tackle:3,Passe:3,Scrum:3,Ruck:3,Treino em campo:3')
-            """)
-        
-        # Insere dados mocados se a tabela de pacientes estiver vazia
-        if conn.execute("SELECT COUNT(*) FROM pacientes").fetchone()[0] == 0:
-            # Lista de nomes fictícios de atletas
-            atletas_mock = [
-                ("João Silva", "Pilar", "Bandeirantes Rugby"),
-                ("Pedro Santos", "Hooker", "São José Rugby"),
-                ("Lucas Oliveira", "Segunda Linha", "Pasteur Athletique"),
-                ("Matheus Souza", "Terceira Linha", "Jacareí Rugby"),
-                ("Gabriel Costa", "Scrum-half", "São Paulo Athletic Club"),
-                ("Rafael Pereira", "Fly-half", "Curitiba Rugby"),
-                ("Thiago Lima", "Centro", "Niterói Rugby"),
-                ("Bruno Fernandes", "Ponta", "Desterro Rugby"),
-                ("Diego Alves", "Fullback", "Charrua Rugby"),
-                ("Marcelo Rocha", "Pilar", "BH Rugby"),
-                ("Felipe Santos", "Hooker", "Guanabara Rugby"),
-                ("André Costa", "Segunda Linha", "Albatroz Rugby"),
-                ("Ricardo Oliveira", "Terceira Linha", "Rio Branco Rugby"),
-                ("Gustavo Silva", "Scrum-half", "Urutu Rugby"),
-                ("Henrique Lima", "Fly-half", "Templários Rugby"),
-                ("Carlos Eduardo", "Centro", "Vitória Rugby"),
-                ("Paulo Roberto", "Ponta", "Recife Rugby"),
-                ("Fernando Souza", "Fullback", "Goianos Rugby"),
-                ("Roberto Carlos", "Pilar", "Brasília Rugby"),
-                ("José Antonio", "Hooker", "Cuiabá Rugby"),
-                ("Miguel Santos", "Segunda Linha", "Londrina Rugby"),
-                ("Daniel Costa", "Terceira Linha", "Maringá Rugby"),
-                ("Alexandre Lima", "Scrum-half", "Cascavel Rugby"),
-                ("Marcos Paulo", "Fly-half", "Blumenau Rugby"),
-                ("Victor Hugo", "Centro", "Floripa Rugby"),
-                ("Leonardo Silva", "Ponta", "Porto Alegre Rugby"),
-                ("Eduardo Santos", "Fullback", "Pelotas Rugby"),
-                ("Rodrigo Costa", "Pilar", "Santa Maria Rugby"),
-                ("Fábio Lima", "Hooker", "Caxias Rugby"),
-                ("Guilherme Souza", "Segunda Linha", "Bento Rugby"),
-                ("Renato Silva", "Terceira Linha", "Farrapos Rugby"),
-                ("Maurício Santos", "Scrum-half", "Serra Rugby"),
-                ("Augusto Lima", "Fly-half", "Universitário Rugby"),
-                ("Caio Costa", "Centro", "ABC Rugby"),
-                ("Igor Santos", "Ponta", "Natal Rugby"),
-                ("Leandro Silva", "Fullback", "Maceió Rugby"),
-                ("Júlio César", "Pilar", "Aracaju Rugby"),
-                ("Márcio Lima", "Hooker", "Salvador Rugby"),
-                ("Nelson Costa", "Segunda Linha", "Vitória Rugby"),
-                ("Otávio Santos", "Terceira Linha", "Vila Velha Rugby"),
-                ("Pablo Silva", "Scrum-half", "Espírito Santo Rugby"),
-                ("Quintino Lima", "Fly-half", "Juiz de Fora Rugby"),
-                ("Rogério Costa", "Centro", "Uberlândia Rugby"),
-                ("Sérgio Santos", "Ponta", "Uberaba Rugby"),
-                ("Tiago Silva", "Fullback", "Montes Claros Rugby"),
-                ("Ulisses Lima", "Pilar", "Ouro Preto Rugby"),
-                ("Vitor Costa", "Hooker", "Lavras Rugby"),
-                ("Wagner Santos", "Segunda Linha", "Pouso Alegre Rugby"),
-                ("Xavier Silva", "Terceira Linha", "Poços Rugby"),
-                ("Yuri Lima", "Scrum-half", "Varginha Rugby")
-            ]
-
-            # Insere os atletas
-            for nome, posicao, clube in atletas_mock:
-                # Gera uma data de nascimento aleatória entre 1990 e 2000
-                ano = int(conn.execute("SELECT 1990 + abs(random() % 10)").fetchone()[0])
-                mes = int(conn.execute("SELECT 1 + abs(random() % 12)").fetchone()[0])
-                dia = int(conn.execute("SELECT 1 + abs(random() % 28)").fetchone()[0])
-                data_nascimento = datetime(ano, mes, dia).date()
-                
-                # Insere o atleta
-                conn.execute("""
-                    INSERT INTO pacientes (nome, data_nascimento, posicao, clube)
-                    VALUES (?, ?, ?, ?)
-                """, [nome, data_nascimento, posicao, clube])
-                
-                # Obtém o ID do atleta inserido
-                atleta_id = conn.execute("SELECT id FROM pacientes WHERE nome = ?", [nome]).fetchone()[0]
-                
-                # Define aleatoriamente se o atleta terá lesão (70% de chance)
-                if int(conn.execute("SELECT abs(random() % 100)").fetchone()[0]) < 70:
-                    # Tipos de lesão possíveis
-                    tipos_lesao = [
-                        "LCA", "LCP", "Menisco", "Ligamento Colateral", "Tendinite Patelar",
-                        "Luxação de Ombro", "Ruptura de Manguito Rotador", "Lesão de Labrum",
-                        "Fratura de Clavícula", "Entorse de Tornozelo"
-                    ]
-                    tipo_lesao = tipos_lesao[int(conn.execute("SELECT abs(random() % 10)").fetchone()[0])]
-                    
-                    # Gera uma data de lesão nos últimos 2 anos
-                    dias_atras_lesao = int(conn.execute("SELECT 1 + abs(random() % 730)").fetchone()[0])
-                    data_lesao = datetime.now().date() - timedelta(days=dias_atras_lesao)
-                    
-                    # Data da cirurgia alguns dias após a lesão
-                    dias_ate_cirurgia = int(conn.execute("SELECT 3 + abs(random() % 30)").fetchone()[0])
-                    data_cirurgia = data_lesao + timedelta(days=dias_ate_cirurgia)
-                    
-                    # Insere a lesão
-                    conn.execute("""
-                        INSERT INTO lesoes (paciente_id, tipo_lesao, data_lesao, data_cirurgia, observacoes)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, [atleta_id, tipo_lesao, data_lesao, data_cirurgia, "Lesão durante partida oficial"])
-                    
-                    # Atualiza a data da cirurgia no paciente
-                    conn.execute("""
-                        UPDATE pacientes 
-                        SET data_cirurgia = ? 
-                        WHERE id = ?
-                    """, [data_cirurgia, atleta_id])
-                    
-                    # Calcula em qual fase o atleta está baseado na data da cirurgia
-                    dias_desde_cirurgia = (datetime.now().date() - data_cirurgia).days
-                    
-                    # Define a fase atual
-                    fase_atual = None
-                    if dias_desde_cirurgia <= 14:
-                        fase_atual = "Fase 1"
-                    elif dias_desde_cirurgia <= 28:
-                        fase_atual = "Fase 2"
-                    elif dias_desde_cirurgia <= 90:
-                        fase_atual = "Fase 3"
-                    elif dias_desde_cirurgia <= 180:
-                        fase_atual = "Fase 4"
-                    elif dias_desde_cirurgia <= 240:
-                        fase_atual = "Fase 5"
-                    else:
-                        fase_atual = "Alta"
-                    
-                    # Registra o progresso
-                    if fase_atual:
-                        conn.execute("""
-                            INSERT INTO progresso (paciente_id, fase, data_inicio, data_fim, status)
-                            VALUES (?, ?, ?, ?, 'Em andamento')
-                        """, [atleta_id, fase_atual, data_cirurgia, None])
-
-        return conn
+        with secao('banco'):
+            if PASTA_CLUBES:
+                # clubes_configurados recusa clubes que dividiriam o mesmo arquivo de banco
+                clubes = clubes_configurados(config)
+                clube_sessao = clube_usuario(config, username) or st.sidebar.selectbox("Clube", clubes)
+                if clube_sessao is None:
+                    raise ValueError("nenhum clube configurado em config.yaml (campo 'clube' dos usuários)")
+                banco = obter_banco_clube(clube_sessao)
+            else:
+                clube_sessao = None
+                banco = obter_banco()
     except Exception as e:
-        if "Conflicting lock" in str(e):
-            # Se falhar por causa do lock, tenta em modo read-only
-            st.warning("Banco de dados aberto em modo somente leitura devido a outro processo estar usando-o.")
-            return duckdb.connect('SAGRA.db', read_only=True)
-        else:
-            # Se for outro erro, mostra o erro e para
-            st.error(f"Erro ao conectar ao banco de dados: {str(e)}")
+        st.error(f"Erro ao conectar ao banco de dados: {str(e)}")
+        finalizar_rastro(rastro)
         st.stop()
 
-# Se autenticado, mostra o conteúdo principal
-if authentication_status:
+    # Mantém a fase atual de todos os atletas em dia (uma vez por processo)
+    iniciar_recalculo_periodico(banco)
+
+    # Exportação incremental para Parquet, se SAGRA_EXPORTACAO estiver definida (uma vez por processo)
+    iniciar_exportacao_periodica(banco)
+
+    if banco.somente_leitura:
+        st.warning("Banco de dados aberto em modo somente leitura devido a outro processo estar usando-o.")
+
+    # Empresta um cursor do pool para esta execução do script
+    conn = banco.adquirir_cursor()
+    # Cursores adicionais da execução (consultas consolidadas), fechados ao final
+    recursos = ExitStack()
     try:
-        # Inicializa a conexão com o banco de dados
-        conn = init_database()
 
         # Mostra o menu de logout e boas-vindas na sidebar
-        with st.sidebar:
+        with st.sidebar, secao('sidebar'):
             st.title("🏉 SAGRA")
             st.write(f'Bem-vindo *{name}*')
-            authenticator.logout('Logout', 'main')
+            botao_logout(config)
             st.divider()
             
             # Menu de Navegação
@@ -310,7 +201,8 @@ if authentication_status:
                 ["📊 Dashboard",
                  "👥 Cadastro de Atletas",
                  "🏥 Cadastro de Lesões",
-                 "🔍 Busca e Relatórios"]
+                 "🔍 Busca e Relatórios",
+                 "📈 Análise de Coortes"]
             )
             
             # Filtros específicos para busca
@@ -322,58 +214,40 @@ if authentication_status:
                 )
                 
                 if busca_tipo == "Por Atleta":
-                    # Busca todos os atletas no banco
-                    atletas = conn.execute("SELECT DISTINCT nome FROM pacientes ORDER BY nome").df()
-                    atleta_selecionado = st.selectbox("Selecione o Atleta", atletas['nome'].tolist())
+                    # Busca os atletas pelo início do nome
+                    atleta_selecionado, atleta_id = seletor_atleta(conn, "Atleta", "busca")
                 elif busca_tipo == "Por Lesão":
-                    lesoes = conn.execute("SELECT DISTINCT tipo_lesao FROM lesoes ORDER BY tipo_lesao").df()
-                    lesao_selecionada = st.selectbox("Tipo de Lesão", lesoes['tipo_lesao'].tolist())
+                    ids_lesoes = tipos_lesao_registrados(conn)
+                    lesao_selecionada = st.selectbox("Tipo de Lesão", list(ids_lesoes))
+                    tipo_lesao_id = ids_lesoes.get(lesao_selecionada)
                 elif busca_tipo == "Por Período":
                     data_inicio = st.date_input("Data Inicial")
                     data_fim = st.date_input("Data Final")
             
             st.divider()
 
+        definir_tela(f"{menu_option} / {busca_tipo}" if menu_option == "🔍 Busca e Relatórios" else menu_option)
+
         # Conteúdo principal baseado na seleção do menu
         if menu_option == "📊 Dashboard":
+            from graficos import grafico_status_exercicios
+
             st.title("Dashboard - Visão Geral")
             
-            # Estatísticas gerais em cards do Streamlit
+            # Estatísticas gerais em cards do Streamlit (métricas já calculadas em resumo_dashboard)
+            resumo = ler_resumo(conn)
             col1, col2, col3 = st.columns(3)
             with col1:
-                total_atletas = conn.execute("SELECT COUNT(DISTINCT nome) as total FROM pacientes").df()['total'][0]
-                st.metric("Total de Atletas", total_atletas)
+                st.metric("Total de Atletas", resumo['total_atletas'])
             with col2:
-                atletas_ativos = conn.execute("""
-                    SELECT COUNT(DISTINCT p.nome) as total 
-                    FROM pacientes p 
-                    WHERE EXISTS (
-                        SELECT 1 FROM progresso pr 
-                        WHERE pr.paciente_id = p.id 
-                        AND pr.status = 'Em andamento'
-                    )
-                """).df()['total'][0]
-                st.metric("Atletas em Tratamento", atletas_ativos)
+                st.metric("Atletas em Tratamento", resumo['atletas_em_tratamento'])
             with col3:
-                total_lesoes = conn.execute("SELECT COUNT(DISTINCT tipo_lesao) as total FROM lesoes").df()['total'][0]
-                st.metric("Tipos de Lesões", total_lesoes)
+                st.metric("Tipos de Lesões", resumo['tipos_lesao_registrados'])
             
-            # Lista dos últimos atletas cadastrados
+            # Lista dos últimos atletas cadastrados (a lesão é buscada só para os cinco)
             st.subheader("Últimos Atletas Cadastrados")
-            ultimos_atletas = conn.execute("""
-                SELECT 
-                    p.nome, 
-                    p.data_cirurgia,
-                    (SELECT tipo_lesao 
-                     FROM lesoes l 
-                     WHERE l.paciente_id = p.id 
-                     ORDER BY l.data_lesao DESC 
-                     LIMIT 1) as lesao
-                FROM pacientes p
-                ORDER BY data_cirurgia DESC
-                LIMIT 5
-            """).df()
-            st.dataframe(ultimos_atletas, hide_index=True, use_container_width=True)
+            ultimos = ultimos_atletas(conn)
+            st.dataframe(ultimos, hide_index=True, use_container_width=True)
 
             # Container para o formulário de novo paciente
             with st.container():
@@ -391,78 +265,46 @@ if authentication_status:
                         max_value=datetime.now().date()
                     )
 
+                # Protocolos em cache (limites de cada fase já convertidos em dias); com protocolos
+                # por tipo de lesão, o cronograma exibido é o do protocolo escolhido
+                registro_protocolos = obter_registro(conn)
+                protocolos = registro_protocolos.protocolos
+                protocolo = protocolos[st.selectbox(
+                    "Protocolo", list(protocolos), format_func=lambda id_: protocolos[id_].nome,
+                    help="O recálculo diário usa o protocolo do tipo da lesão cadastrada do atleta"
+                )] if len(protocolos) > 1 else registro_protocolos.padrao
+
                 # Processamento do formulário
                 if nome_atleta and data_cirurgia:
                     try:
-                        # Registra ou atualiza o paciente
-                        conn.execute("""
-                            INSERT INTO pacientes (nome, data_cirurgia)
-                            VALUES (?, ?)
-                            ON CONFLICT (nome) DO UPDATE SET
-                                data_cirurgia = excluded.data_cirurgia;
-                        """, [nome_atleta, data_cirurgia])
-                        
-                        # Obtém o ID do paciente
-                        paciente_id = conn.execute("""
-                            SELECT id FROM pacientes WHERE nome = ?
-                        """, [nome_atleta]).fetchone()[0]
-                    
-                        # Busca as fases do banco de dados
-                        fases_df = conn.execute("""
-                            SELECT 
-                                id,
-                                fase::VARCHAR as fase,
-                                periodo_aproximado::VARCHAR as periodo_aproximado,
-                                atividades_liberadas::VARCHAR as atividades_liberadas,
-                                testes_especificos::VARCHAR as testes_especificos,
-                                tratamentos::VARCHAR as tratamentos,
-                                preparacao_fisica::VARCHAR as preparacao_fisica,
-                                tecnicas_rugby::VARCHAR as tecnicas_rugby
-                            FROM fases_reabilitacao
-                            ORDER BY id
-                        """).df()
                         
                         # Cálculo das datas de cada fase
-                        dados_fases = []
-                        data_atual = data_cirurgia
-                        
-                        # Processamento de cada fase
-                        for _, row in fases_df.iterrows():
-                            dias = extrair_dias(row['periodo_aproximado'])
+                        with secao('cronograma'):
+                            dados_fases = []
+                            for item in protocolo.cronograma(data_cirurgia):
+                                fase = item['fase']
                             
-                            # Cálculo das datas de início e fim de cada fase
-                            if row['fase'] == 'Fase 1':
-                                data_inicio = data_atual
-                                data_fim = data_inicio + timedelta(days=dias)
-                            elif row['fase'] == 'Alta':
-                                data_inicio = data_cirurgia + timedelta(days=240)
-                                data_fim = data_inicio + timedelta(days=30)
-                            else:
-                                data_inicio = data_atual + timedelta(days=1)
-                                data_fim = data_inicio + timedelta(days=dias - 1)
-                            
-                            # Processamento dos tratamentos
-                            tratamentos = row['tratamentos'].split(',') if row['tratamentos'] else []
+                                # Tratamentos já separados em itens
+                                tratamentos = [item.rotulo for item in fase.itens_de('tratamentos')]
                             
-                            # Montagem do dicionário de dados da fase
-                            dados_fases.append({
-                                'Fase': str(row['fase']),
-                                'Data Início': data_inicio.strftime('%d/%m/%Y'),
-                                'Data Fim': data_fim.strftime('%d/%m/%Y'),
-                                'Duração (dias)': str(dias) if row['fase'] != 'Alta' else 'Contínuo',
-                                'Atividades': str(row['atividades_liberadas']),
-                                'Testes': str(row['testes_especificos']),
-                                'Tratamentos': tratamentos,
-                                'Preparacao_Fisica': str(row['preparacao_fisica']),
-                                'tecnicas_rugby': str(row['tecnicas_rugby'])
-                            })
-                            data_atual = data_fim
+                                # Montagem do dicionário de dados da fase
+                                dados_fases.append({
+                                    'Fase': fase.fase,
+                                    'Data Início': item['data_inicio'].strftime('%d/%m/%Y'),
+                                    'Data Fim': item['data_fim'].strftime('%d/%m/%Y'),
+                                    'Duração (dias)': str(fase.duracao) if fase.duracao is not None else 'Contínuo',
+                                    'Atividades': fase.atividades_liberadas,
+                                    'Testes': fase.testes_especificos,
+                                    'Tratamentos': tratamentos,
+                                    'Preparacao_Fisica': fase.preparacao_fisica,
+                                    'tecnicas_rugby': fase.tecnicas_rugby
+                                })
                         
                         # Exibição das informações do paciente
                         st.subheader(f'Cronograma de Reabilitação para: {nome_atleta}')
                         
                         # Datas importantes
-                        data_alta = data_cirurgia + timedelta(days=240)
+                        data_alta = data_cirurgia + timedelta(days=protocolo.dias_alta)
                         col1, col2 = st.columns(2)
                         with col1:
                             st.info(f'**Data da Cirurgia:** {data_cirurgia.strftime("%d/%m/%Y")}')
@@ -487,7 +329,7 @@ if authentication_status:
                         
                         # Detalhamento das fases
                         st.subheader('Detalhamento das Fases')
-                        for fase in dados_fases:
+                        for fase, fase_protocolo in zip(dados_fases, protocolo.fases):
                             with st.expander(f"{fase['Fase']} ({fase['Data Início']} a {fase['Data Fim']})"):
                                 col1, col2, col3 = st.columns(3)
                                 
@@ -504,44 +346,49 @@ if authentication_status:
                                 
                                 with col3:
                                     st.write("**Preparação Física:**")
-                                    for exercicio in fase['Preparacao_Fisica'].split(','):
-                                        status = exercicio.strip()
-                                        if '(Completo)' in status:
-                                            st.success(f"- {status}")
-                                        elif '(Restrição)' in status:
-                                            st.error(f"- {status}")
-                                        elif '(Progressão)' in status:
-                                            st.warning(f"- {status}")
+                                    for exercicio in fase_protocolo.itens_de('preparacao_fisica'):
+                                        if exercicio.status == 'Completo':
+                                            st.success(f"- {exercicio.rotulo}")
+                                        elif exercicio.status == 'Restrição':
+                                            st.error(f"- {exercicio.rotulo}")
+                                        elif exercicio.status == 'Progressão':
+                                            st.warning(f"- {exercicio.rotulo}")
                                         else:
-                                            st.write(f"- {status}")
+                                            st.write(f"- {exercicio.rotulo}")
                         
                         # Progresso do tratamento
                         st.subheader('Progresso do Tratamento')
                         dias_desde_cirurgia = (datetime.now().date() - data_cirurgia).days
-                        progresso = min(100, max(0, (dias_desde_cirurgia / 240) * 100))
+                        progresso = min(100, max(0, (dias_desde_cirurgia / protocolo.dias_alta) * 100))
                         
                         # Barra de progresso (valor entre 0 e 1)
                         st.progress(max(0, min(1, progresso / 100)))
                         st.write(f"Progresso Total: {progresso:.1f}% ({dias_desde_cirurgia} dias desde a cirurgia)")
                         
-                        # Identificação e registro da fase atual
+                        # Identificação da fase atual
                         fase_atual = None
-                        for fase in dados_fases:
-                            data_inicio = datetime.strptime(fase['Data Início'], '%d/%m/%Y').date()
-                            data_fim = datetime.strptime(fase['Data Fim'], '%d/%m/%Y').date()
-                            if data_inicio <= datetime.now().date() <= data_fim:
-                                fase_atual = fase
-                                st.success(f"**Fase Atual:** {fase['Fase']}")
-                                
-                                # Registra progresso
-                                conn.execute("""
-                                    INSERT INTO progresso (paciente_id, fase, data_inicio, data_fim, status)
-                                    VALUES (?, ?, ?, ?, 'Em andamento')
-                                    ON CONFLICT (paciente_id, fase, data_inicio) DO UPDATE
-                                    SET status = 'Em andamento',
-                                        data_fim = excluded.data_fim
-                                """, [paciente_id, fase['Fase'], data_inicio, data_fim])
-                                break
+                        inicio_fase = fim_fase = None
+                        indice_atual = protocolo.indice_fase(dias_desde_cirurgia)
+                        if indice_atual is not None:
+                            fase_atual = dados_fases[indice_atual]
+                            st.success(f"**Fase Atual:** {fase_atual['Fase']}")
+                            inicio_fase, fim_fase = protocolo.limites(indice_atual)
+                        
+                        # Registro explícito: nada é gravado enquanto o nome está sendo digitado
+                        if st.button("💾 Registrar Acompanhamento"):
+                            escritas = registrar_acompanhamento(
+                                conn,
+                                nome_atleta,
+                                data_cirurgia,
+                                protocolo.fases[indice_atual].id if fase_atual else None,
+                                data_cirurgia + timedelta(days=inicio_fase) if fase_atual else None,
+                                data_cirurgia + timedelta(days=fim_fase) if fase_atual else None,
+                                clube_sessao
+                            )
+                            if escritas:
+                                st.success("Acompanhamento registrado com sucesso!")
+                            else:
+                                st.info("Nenhuma alteração a registrar.")
 
                         # Métricas do progresso
                         semana_atual = dias_desde_cirurgia // 7
@@ -566,26 +413,19 @@ if authentication_status:
                                 st.write("**📊 Testes e Avaliações**")
                                 st.warning(fase_atual['Testes'] if fase_atual['Testes'] != '-' else "Nenhum teste específico nesta fase")
                                 
-                                # Análise dos exercícios
+                                # Análise dos exercícios (contagem por status dos itens já separados)
                                 st.subheader('Status dos Exercícios')
-                                exercicios = fase_atual['Preparacao_Fisica'].split(',')
+                                contagem = protocolo.fases[indice_atual].contagem_status('preparacao_fisica')
                                 status_exercicios = {
-                                    'Completo': len([ex for ex in exercicios if '(Completo)' in ex]),
-                                    'Em Progressão': len([ex for ex in exercicios if '(Progressão)' in ex]),
-                                    'Com Restrição': len([ex for ex in exercicios if '(Restrição)' in ex])
+                                    'Completo': contagem['Completo'],
+                                    'Em Progressão': contagem['Progressão'],
+                                    'Com Restrição': contagem['Restrição']
                                 }
                                 
-                                fig_pizza = px.pie(
-                                    values=list(status_exercicios.values()),
-                                    names=list(status_exercicios.keys()),
-                                    title='Distribuição dos Exercícios por Status',
-                                    color_discrete_map={
-                                        'Completo': 'green',
-                                        'Em Progressão': 'orange',
-                                        'Com Restrição': 'red'
-                                    }
-                                )
-                                st.plotly_chart(fig_pizza, use_container_width=True)
+                                with secao('grafico_status'):
+                                    # Figura em cache pela contagem (reaproveitada enquanto a contagem não muda)
+                                    fig_pizza = grafico_status_exercicios(status_exercicios)
+                                    st.plotly_chart(fig_pizza, use_container_width=True)
                                 
                                 # Recomendações
                                 st.subheader('Recomendações e Próximos Passos')
@@ -605,38 +445,60 @@ if authentication_status:
                         st.error(f"Erro ao processar dados: {str(e)}")
 
         elif menu_option == "👥 Cadastro de Atletas":
+            from importacao import COLUNAS_IMPORTACAO, importar_arquivo
+
             st.title("Cadastro de Atletas")
             # Interface para cadastro de novo atleta
             with st.form("cadastro_atleta"):
                 nome_atleta = st.text_input("Nome do Atleta")
                 data_nascimento = st.date_input("Data de Nascimento")
-                posicao = st.selectbox("Posição", ["Pilar", "Hooker", "Segunda Linha", "Terceira Linha", "Scrum-half", "Fly-half", "Centro", "Ponta", "Fullback"])
-                clube = st.text_input("Clube")
+                posicao = st.selectbox("Posição", POSICOES)
+                clube = st.text_input("Clube", value=clube_sessao or "", disabled=clube_sessao is not None)
                 submitted = st.form_submit_button("Cadastrar Atleta")
                 
                 if submitted:
                     try:
-                        conn.execute("""
-                            INSERT INTO pacientes (nome, data_nascimento, posicao, clube)
-                            VALUES (?, ?, ?, ?)
-                        """, [nome_atleta, data_nascimento, posicao, clube])
+                        cadastrar_atleta(conn, nome_atleta, data_nascimento, posicao, clube)
                         st.success("Atleta cadastrado com sucesso!")
                     except Exception as e:
                         st.error(f"Erro ao cadastrar atleta: {str(e)}")
 
+            # Importação em lote de atletas ou lesões (CSV ou Parquet)
+            st.subheader("Importação em Lote")
+            with st.form("importacao"):
+                tipo_importacao = st.radio("Conteúdo do arquivo", list(COLUNAS_IMPORTACAO),
+                                           format_func=lambda tipo: "Atletas" if tipo == 'atletas' else "Lesões",
+                                           horizontal=True)
+                st.caption("Colunas — atletas: " + ", ".join(COLUNAS_IMPORTACAO['atletas'])
+                           + " · lesões: " + ", ".join(COLUNAS_IMPORTACAO['lesoes']))
+                arquivo = st.file_uploader("Arquivo", type=['csv', 'parquet'])
+                importar = st.form_submit_button("Importar")
+
+                if importar and arquivo is not None:
+                    # O DuckDB lê o arquivo do disco: o upload é gravado em um arquivo temporário
+                    extensao = os.path.splitext(arquivo.name)[1].lower()
+                    with tempfile.NamedTemporaryFile(suffix=extensao, delete=False) as temporario:
+                        temporario.write(arquivo.getbuffer())
+                    try:
+                        resultado = importar_arquivo(conn, tipo_importacao, temporario.name, clube_sessao)
+                        st.success(f"{resultado['importadas']} de {resultado['lidas']} linhas importadas.")
+                        if len(resultado['rejeitadas']):
+                            st.warning(f"{len(resultado['rejeitadas'])} linhas recusadas:")
+                            st.dataframe(resultado['rejeitadas'], hide_index=True)
+                    except Exception as e:
+                        st.error(f"Erro ao importar arquivo: {str(e)}")
+                    finally:
+                        os.remove(temporario.name)
+
         elif menu_option == "🏥 Cadastro de Lesões":
             st.title("Cadastro de Lesões")
+            # Busca o atleta fora do formulário, para que a lista acompanhe o texto digitado
+            atleta_selecionado, atleta_id = seletor_atleta(conn, "Atleta", "cadastro_lesao")
+            
             # Interface para cadastro de lesão
             with st.form("cadastro_lesao"):
-                # Busca atletas cadastrados
-                atletas = conn.execute("SELECT id, nome FROM pacientes ORDER BY nome").df()
-                atleta_selecionado = st.selectbox("Atleta", atletas['nome'].tolist())
-                
-                tipo_lesao = st.selectbox("Tipo de Lesão", [
-                    "LCA", "LCP", "Menisco", "Ligamento Colateral", "Tendinite Patelar",
-                    "Luxação de Ombro", "Ruptura de Manguito Rotador", "Lesão de Labrum",
-                    "Fratura de Clavícula", "Entorse de Tornozelo"
-                ])
+                ids_tipos = tipos_lesao(conn)
+                tipo_lesao = st.selectbox("Tipo de Lesão", list(ids_tipos))
                 data_lesao = st.date_input("Data da Lesão")
                 data_cirurgia = st.date_input("Data da Cirurgia")
                 observacoes = st.text_area("Observações")
@@ -644,175 +506,115 @@ if authentication_status:
                 
                 if submitted:
                     try:
-                        # Obtém o ID do atleta
-                        atleta_id = conn.execute("SELECT id FROM pacientes WHERE nome = ?", [atleta_selecionado]).fetchone()[0]
-                        
-                        conn.execute("""
-                            INSERT INTO lesoes (paciente_id, tipo_lesao, data_lesao, data_cirurgia, observacoes)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, [atleta_id, tipo_lesao, data_lesao, data_cirurgia, observacoes])
-                        st.success("Lesão cadastrada com sucesso!")
+                        if atleta_id is None:
+                            st.warning("Selecione um atleta.")
+                        else:
+                            cadastrar_lesao(conn, atleta_id, ids_tipos[tipo_lesao], data_lesao, data_cirurgia, observacoes)
+                            st.success("Lesão cadastrada com sucesso!")
                     except Exception as e:
                         st.error(f"Erro ao cadastrar lesão: {str(e)}")
 
         elif menu_option == "🔍 Busca e Relatórios":
             st.title("Busca e Relatórios")
             if busca_tipo == "Por Atleta":
+                from graficos import grafico_duracao_fases, grafico_evolucao_sessoes
+                from sessoes import DIAS_RECENTES, SEMANAS_CURVA, curva_semanal, registrar_sessoes, sessoes_recentes
+                from risco import RegrasRisco, avaliar_atleta
+
                 if atleta_selecionado:
                     # Exibe informações do atleta
-                    info_atleta = conn.execute("""
-                        SELECT 
-                            p.*,
-                            l.tipo_lesao,
-                            CAST(l.data_lesao AS DATE) as data_lesao,
-                            CAST(l.data_cirurgia AS DATE) as data_cirurgia,
-                            l.observacoes as obs_lesao,
-                            pr.fase as fase_atual,
-                            CAST(pr.data_inicio AS DATE) as inicio_fase,
-                            pr.status,
-                            CASE 
-                                WHEN l.data_cirurgia IS NOT NULL THEN 
-                                    (CURRENT_DATE - CAST(l.data_cirurgia AS DATE))
-                                ELSE 0 
-                            END as dias_desde_cirurgia,
-                            CASE 
-                                WHEN l.data_cirurgia IS NOT NULL THEN 
-                                    (CAST(l.data_cirurgia AS DATE) + 240 - CURRENT_DATE)
-                                ELSE NULL 
-                            END as dias_ate_alta,
-                            CASE 
-                                WHEN l.data_cirurgia IS NOT NULL THEN 
-                                    LEAST(100, GREATEST(0, CAST((CURRENT_DATE - CAST(l.data_cirurgia AS DATE)) AS FLOAT) / 240 * 100))
-                                ELSE 0 
-                            END as progresso
-                        FROM pacientes p
-                        LEFT JOIN lesoes l ON l.paciente_id = p.id
-                        LEFT JOIN progresso pr ON pr.paciente_id = p.id
-                        WHERE p.nome = ?
-                        ORDER BY pr.data_inicio DESC
-                        LIMIT 1
-                    """, [atleta_selecionado]).df()
+                    registro_protocolos = obter_registro(conn)
+                    info_atleta = relatorio_atleta(conn, atleta_id, registro=registro_protocolos)
+                    lesao = info_atleta['lesao'] or {}
                     
                     st.subheader(f"Relatório de Evolução - {atleta_selecionado}")
                     
                     # Informações básicas em cards
                     col1, col2, col3 = st.columns(3)
                     with col1:
-                        st.info(f"**🏃 Posição:** {info_atleta['posicao'][0]}")
+                        st.info(f"**🏃 Posição:** {info_atleta['posicao']}")
                     with col2:
-                        st.info(f"**🏉 Clube:** {info_atleta['clube'][0]}")
+                        st.info(f"**🏉 Clube:** {info_atleta['clube']}")
                     with col3:
-                        st.info(f"**🏥 Tipo de Lesão:** {info_atleta['tipo_lesao'][0]}")
+                        st.info(f"**🏥 Tipo de Lesão:** {lesao.get('tipo_lesao')}")
+                    st.caption(f"Protocolo de reabilitação: {info_atleta['protocolo']}")
 
                     # Timeline do tratamento
                     st.subheader("📅 Timeline do Tratamento")
-                    data_lesao = info_atleta['data_lesao'][0]
-                    data_cirurgia = info_atleta['data_cirurgia'][0]
+                    data_lesao = lesao.get('data_lesao')
+                    data_cirurgia = lesao.get('data_cirurgia')
                     
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
                         st.metric("Data da Lesão", 
-                                 data_lesao.strftime("%d/%m/%Y") if pd.notna(data_lesao) else "N/A")
+                                 data_lesao.strftime("%d/%m/%Y") if data_lesao else "N/A")
                     with col2:
                         st.metric("Data da Cirurgia", 
-                                 data_cirurgia.strftime("%d/%m/%Y") if pd.notna(data_cirurgia) else "N/A")
+                                 data_cirurgia.strftime("%d/%m/%Y") if data_cirurgia else "N/A")
                     with col3:
-                        dias_tratamento = info_atleta['dias_desde_cirurgia'][0] if pd.notna(info_atleta['dias_desde_cirurgia'][0]) else 0
-                        st.metric("Dias em Tratamento", f"{dias_tratamento} dias")
+                        st.metric("Dias em Tratamento", f"{info_atleta['dias_desde_cirurgia']} dias")
                     with col4:
-                        dias_alta = info_atleta['dias_ate_alta'][0] if pd.notna(info_atleta['dias_ate_alta'][0]) else None
+                        dias_alta = info_atleta['dias_ate_alta']
                         st.metric("Dias até Alta Prevista", 
                                  f"{dias_alta} dias" if dias_alta is not None else "N/A")
 
-                    # Progresso do tratamento
-                    if pd.notna(data_cirurgia):
+                    # Progresso do tratamento (contado da cirurgia ou, sem ela, da lesão)
+                    if info_atleta['inicio_tratamento']:
                         st.subheader("📊 Progresso do Tratamento")
-                        progresso = float(info_atleta['progresso'][0])  # Converte para float padrão
+                        progresso = info_atleta['progresso']
                         
                         # Barra de progresso (valor entre 0 e 1)
-                        st.progress(float(progresso) / 100.0)  # Garante que seja float
+                        st.progress(progresso / 100.0)
                         st.write(f"Progresso Total: {progresso:.1f}%")
                         
-                        # Histórico de fases
-                        historico_fases = conn.execute("""
-                            SELECT 
-                                fase,
-                                data_inicio,
-                                data_fim,
-                                status,
-                                julian(COALESCE(data_fim, CURRENT_DATE)) - julian(data_inicio) as dias_fase
-                            FROM progresso
-                            WHERE paciente_id = (SELECT id FROM pacientes WHERE nome = ?)
-                            ORDER BY data_inicio
-                        """, [atleta_selecionado]).df()
+                        # Gráfico de evolução por fases (um único trace, em cache pelo histórico)
+                        if info_atleta['historico']:
+                            with secao('grafico_fases'):
+                                fig_fases = grafico_duracao_fases(info_atleta['historico'])
+                                st.plotly_chart(fig_fases, use_container_width=True)
                         
-                        # Gráfico de evolução por fases
-                        if not historico_fases.empty:
-                            fig_fases = go.Figure()
-                            
-                            for idx, fase in historico_fases.iterrows():
-                                fig_fases.add_trace(go.Bar(
-                                    name=fase['fase'],
-                                    x=[fase['fase']],
-                                    y=[fase['dias_fase']],
-                                    text=f"{fase['dias_fase']:.0f} dias",
-                                    textposition='auto',
-                                ))
+                        # Detalhes da fase atual (itens já separados no protocolo em cache)
+                        detalhes_fase = info_atleta['fase_atual']
+                        fase_protocolo = registro_protocolos.fase_por_id(detalhes_fase['fase_id']) if detalhes_fase else None
+                        if fase_protocolo:
+                            st.subheader(f"📋 Detalhes da Fase Atual: {detalhes_fase['fase']}")
                             
-                            fig_fases.update_layout(
-                                title="Duração de Cada Fase (em dias)",
-                                xaxis_title="Fases",
-                                yaxis_title="Dias",
-                                showlegend=False
-                            )
-                            
-                            st.plotly_chart(fig_fases, use_container_width=True)
-                        
-                        # Busca detalhes da fase atual
-                        fase_atual = info_atleta['fase_atual'][0] if 'fase_atual' in info_atleta else None
-                        if fase_atual:
-                            detalhes_fase = conn.execute("""
-                                SELECT *
-                                FROM fases_reabilitacao
-                                WHERE fase = ?
-                            """, [fase_atual]).df()
-                            
-                            if not detalhes_fase.empty:
-                                st.subheader(f"📋 Detalhes da Fase Atual: {fase_atual}")
-                                
-                                # Atividades e restrições
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.write("**🏃 Atividades Liberadas**")
-                                    for atividade in detalhes_fase['atividades_liberadas'][0].split(','):
-                                        st.success(f"✓ {atividade.strip()}")
-                                    
-                                    st.write("**🎯 Testes Específicos**")
-                                    for teste in detalhes_fase['testes_especificos'][0].split(','):
-                                        st.info(f"• {teste.strip()}")
+                            # Atividades e restrições
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                st.write("**🏃 Atividades Liberadas**")
+                                for atividade in fase_protocolo.itens_de('atividades_liberadas'):
+                                    st.success(f"✓ {atividade.rotulo}")
                                 
-                                with col2:
-                                    st.write("**💪 Preparação Física**")
-                                    for prep in detalhes_fase['preparacao_fisica'][0].split(','):
-                                        status = prep.strip()
-                                        if '(Completo)' in status:
-                                            st.success(f"✓ {status}")
-                                        elif '(Restrição)' in status:
-                                            st.error(f"⚠ {status}")
-                                        else:
-                                            st.warning(f"↗ {status}")
+                                st.write("**🎯 Testes Específicos**")
+                                for teste in fase_protocolo.itens_de('testes_especificos'):
+                                    st.info(f"• {teste.rotulo}")
+                            
+                            with col2:
+                                st.write("**💪 Preparação Física**")
+                                for prep in fase_protocolo.itens_de('preparacao_fisica'):
+                                    if prep.status == 'Completo':
+                                        st.success(f"✓ {prep.rotulo}")
+                                    elif prep.status == 'Restrição':
+                                        st.error(f"⚠ {prep.rotulo}")
+                                    else:
+                                        st.warning(f"↗ {prep.rotulo}")
                         
                         # Análise de Risco e Recomendações
                         st.subheader("🎯 Análise de Risco e Recomendações")
                         
-                        # Calcula o nível de risco baseado no progresso
-                        nivel_risco = "Alto" if progresso < 33 else "Médio" if progresso < 66 else "Baixo"
+                        # Nível de risco pelas regras configuradas (avanço no protocolo, fase, dor e tipo de lesão)
+                        regras_risco = RegrasRisco.da_configuracao(config)
+                        with secao('risco'):
+                            avaliacao = avaliar_atleta(conn, atleta_id, registro_protocolos, regras_risco)
+                        nivel_risco = avaliacao['nivel_risco']
                         cor_risco = "red" if nivel_risco == "Alto" else "orange" if nivel_risco == "Médio" else "green"
                         
                         col1, col2 = st.columns(2)
                         with col1:
                             st.write("**Nível de Risco para Retorno**")
                             st.markdown(f"<p style='color: {cor_risco}; font-size: 24px;'>{nivel_risco}</p>", unsafe_allow_html=True)
+                            st.caption(f"Pontuação de risco: {avaliacao['pontuacao']:.0f} de 100")
                             
                             st.write("**Fatores de Risco:**")
                             if nivel_risco == "Alto":
@@ -852,45 +654,180 @@ if authentication_status:
                                 - Realizar aquecimento adequado
                                 """)
                             
-                            # Previsão de retorno
+                            # Previsão de retorno pela alta prevista no protocolo
                             st.write("**⏱ Previsão de Retorno às Atividades:**")
-                            if info_atleta['dias_desde_cirurgia'][0] <= 90:
-                                st.error("Retorno total previsto em 6-8 meses")
-                            elif info_atleta['dias_desde_cirurgia'][0] <= 180:
-                                st.warning("Retorno total previsto em 2-4 meses")
+                            dias_ate_alta = avaliacao['dias_ate_alta']
+                            alta_prevista = avaliacao['alta_prevista'].strftime('%d/%m/%Y')
+                            if dias_ate_alta <= 0:
+                                st.success(f"Alta prevista no protocolo alcançada em {alta_prevista}")
+                            elif dias_ate_alta <= regras_risco.dias_retorno_proximo:
+                                st.success(f"Retorno total previsto em breve ({alta_prevista})")
+                            elif nivel_risco == "Alto":
+                                st.error(f"Retorno total previsto em cerca de {round(dias_ate_alta / 30)} meses ({alta_prevista})")
                             else:
-                                st.success("Retorno total previsto em breve")
+                                st.warning(f"Retorno total previsto em cerca de {round(dias_ate_alta / 30)} meses ({alta_prevista})")
+
+                    # Evolução das sessões (agregados semanais do atleta); o registro vem antes
+                    # da curva, que assim já inclui a sessão gravada nesta execução
+                    st.subheader("🏋️ Evolução das Sessões")
+                    with st.expander("Registrar Sessão"), st.form("registro_sessao"):
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            data_sessao = st.date_input("Data da Sessão")
+                            exercicio = st.text_input("Exercício")
+                            series = st.number_input("Séries", min_value=0, step=1, value=3)
+                            repeticoes = st.number_input("Repetições", min_value=0, step=1, value=10)
+                        with col2:
+                            carga_kg = st.number_input("Carga (kg)", min_value=0.0, step=0.5)
+                            dor = st.slider("Dor (0 a 10)", 0, 10, 0)
+                            amplitude_graus = st.number_input("Amplitude de Movimento (graus)", min_value=0.0,
+                                                              max_value=360.0, step=1.0)
+                        registrar = st.form_submit_button("Registrar Sessão")
+
+                        if registrar:
+                            try:
+                                resultado = registrar_sessoes(conn, [{
+                                    'paciente_id': atleta_id, 'data': data_sessao, 'exercicio': exercicio,
+                                    'series': series, 'repeticoes': repeticoes, 'carga_kg': carga_kg,
+                                    'dor': dor, 'amplitude_graus': amplitude_graus or None,
+                                }])
+                                if resultado['gravadas']:
+                                    st.success("Sessão registrada com sucesso!")
+                                else:
+                                    st.warning(f"Sessão recusada: {resultado['rejeitadas'][0][1]}")
+                            except Exception as e:
+                                st.error(f"Erro ao registrar sessão: {str(e)}")
+
+                    with secao('sessoes'):
+                        curva = curva_semanal(conn, atleta_id)
+                    if len(curva):
+                        ultima = curva.iloc[-1]
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Dias com Sessão (última semana)", int(ultima['dias_sessao']))
+                        with col2:
+                            st.metric("Volume (última semana)", f"{ultima['volume_kg']:.0f} kg")
+                        with col3:
+                            st.metric("Dor Média (última semana)",
+                                      f"{ultima['dor_media']:.1f}" if ultima['dor_media'] == ultima['dor_media'] else "N/A")
+                        st.plotly_chart(grafico_evolucao_sessoes(curva), use_container_width=True)
+                        with st.expander(f"Sessões dos últimos {DIAS_RECENTES} dias"):
+                            st.dataframe(sessoes_recentes(conn, atleta_id), hide_index=True)
+                    else:
+                        st.info(f"Nenhuma sessão registrada nas últimas {SEMANAS_CURVA} semanas.")
             
             elif busca_tipo == "Por Lesão":
                 if lesao_selecionada:
-                    # Lista atletas com a lesão selecionada
-                    atletas_lesao = conn.execute("""
-                        SELECT p.nome, p.data_cirurgia, pr.status
-                        FROM pacientes p
-                        JOIN lesoes l ON l.paciente_id = p.id
-                        LEFT JOIN progresso pr ON pr.paciente_id = p.id
-                        WHERE l.tipo_lesao = ?
-                        ORDER BY p.data_cirurgia DESC
-                    """, [lesao_selecionada]).df()
+                    # Lista uma página dos atletas com a lesão selecionada
+                    estado = paginacao('pagina_lesao', tipo_lesao_id)
+                    atletas_lesao, proxima = atletas_por_lesao(conn, tipo_lesao_id, estado['chaves'][-1])
                     
                     st.subheader(f"Atletas com {lesao_selecionada}")
                     st.dataframe(atletas_lesao, hide_index=True)
+                    controles_paginacao('pagina_lesao', proxima, contar_atletas_por_lesao(conn, tipo_lesao_id))
             
             elif busca_tipo == "Por Período":
                 if data_inicio and data_fim:
-                    # Lista atletas que iniciaram tratamento no período
-                    atletas_periodo = conn.execute("""
-                        SELECT p.nome, l.tipo_lesao, p.data_cirurgia, pr.status
-                        FROM pacientes p
-                        JOIN lesoes l ON l.paciente_id = p.id
-                        LEFT JOIN progresso pr ON pr.paciente_id = p.id
-                        WHERE p.data_cirurgia BETWEEN ? AND ?
-                        ORDER BY p.data_cirurgia
-                    """, [data_inicio, data_fim]).df()
+                    # Lista uma página dos atletas que iniciaram tratamento no período
+                    estado = paginacao('pagina_periodo', (data_inicio, data_fim))
+                    atletas_periodo, proxima = atletas_por_periodo(conn, data_inicio, data_fim, estado['chaves'][-1])
                     
                     st.subheader(f"Atletas no Período: {data_inicio.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}")
                     st.dataframe(atletas_periodo, hide_index=True)
+                    controles_paginacao('pagina_periodo', proxima, contar_atletas_por_periodo(conn, data_inicio, data_fim))
+
+        elif menu_option == "📈 Análise de Coortes":
+            from coortes import AGRUPAMENTOS, LIMITE_GRUPOS, atraso_alta, duracao_fases, fases_por_semana
+            from risco import LIMITE_LISTA_RISCO, NIVEIS_RISCO, RegrasRisco, avaliar_elenco, em_risco, proximos_retorno
+
+            st.title("Análise de Coortes")
+
+            # No modo por clube, usuários sem clube podem analisar todos os clubes juntos
+            conn_coortes = conn
+            if PASTA_CLUBES and clube_usuario(config, username) is None and st.checkbox("Todos os clubes"):
+                conn_coortes = recursos.enter_context(cursor_consolidado(clubes_configurados(config)))
+            # Protocolos do conjunto analisado (fases de protocolos diferentes com o mesmo nome somadas)
+            registro_protocolos = obter_registro(conn_coortes)
+            ordem_fases = registro_protocolos.nomes_fases()
+
+            # Mediana de dias por fase, por grupo de atletas (agregados em cache)
+            st.subheader("Duração das Fases")
+            rotulos_agrupamento = {'tipo_lesao': "Tipo de Lesão", 'clube': "Clube", 'posicao': "Posição"}
+            agrupamento = st.selectbox("Agrupar por", list(AGRUPAMENTOS), format_func=rotulos_agrupamento.get)
+            with secao('duracao_fases'):
+                duracoes = duracao_fases(conn_coortes, agrupamento)
+            if duracoes.empty:
+                st.info("Nenhuma fase concluída registrada.")
+            else:
+                tabela = duracoes.pivot(index='grupo', columns='fase', values='mediana_dias')
+                tabela = tabela.reindex(index=duracoes['grupo'].unique(),
+                                        columns=[fase for fase in ordem_fases if fase in tabela.columns])
+                tabela.index.name = rotulos_agrupamento[agrupamento]
+                st.dataframe(tabela, use_container_width=True)
+                st.caption(f"Mediana de dias das fases concluídas · {LIMITE_GRUPOS} grupos com mais atletas")
+
+            # Atletas em tratamento cuja fase registrada está atrás da prevista pelo protocolo
+            st.subheader("Atraso em Relação ao Protocolo")
+            with secao('atraso_alta'):
+                atraso = atraso_alta(conn_coortes, registro_protocolos)
+            resumo_atraso = atraso['resumo']
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Atrasados no Protocolo",
+                          f"{resumo_atraso['atrasados']:.0f} de {resumo_atraso['em_tratamento']:.0f}")
+            with col2:
+                st.metric("Mediana de Dias de Atraso", f"{resumo_atraso['mediana_dias_alem']:.0f}"
+                          if resumo_atraso['atrasados'] else "-")
+            with col3:
+                st.metric("90% Até", f"{resumo_atraso['p90_dias_alem']:.0f} dias"
+                          if resumo_atraso['atrasados'] else "-")
+            st.caption(f"Atletas fora da fase final cuja fase registrada já deveria ter terminado · "
+                       f"{resumo_atraso['apos_alta']:.0f} já passaram da alta prevista")
+            if not atraso['faixas'].empty:
+                col1, col2 = st.columns(2)
+                with col1:
+                    faixas = atraso['faixas'].rename(columns={'de': "Dias de atraso", 'atletas': "Atletas"})
+                    st.bar_chart(faixas, x="Dias de atraso", y="Atletas")
+                with col2:
+                    st.dataframe(atraso['por_tipo_lesao'], hide_index=True, use_container_width=True)
+
+            # Atletas em cada fase no início de cada semana
+            st.subheader("Atletas por Fase e Semana")
+            with secao('fases_por_semana'):
+                semanal = fases_por_semana(conn_coortes)
+            grafico_semanal = semanal.pivot(index='semana', columns='fase', values='atletas')
+            st.line_chart(grafico_semanal[[fase for fase in ordem_fases if fase in grafico_semanal.columns]])
+
+            # Risco e retorno de todo o elenco em uma única avaliação vetorizada (em cache)
+            st.subheader("Risco e Retorno ao Jogo")
+            regras_risco = RegrasRisco.da_configuracao(config)
+            with secao('risco_elenco'):
+                elenco = avaliar_elenco(conn_coortes, registro_protocolos, regras_risco)
+            em_tratamento = elenco[(elenco['dias_desde_cirurgia'] >= 0) & (elenco['dias_ate_alta'] >= 0)]
+            niveis = em_tratamento['nivel_risco'].value_counts()
+            colunas_nivel = st.columns(len(NIVEIS_RISCO))
+            for coluna, nivel in zip(colunas_nivel, NIVEIS_RISCO):
+                with coluna:
+                    st.metric(f"Risco {nivel}", int(niveis.get(nivel, 0)))
+            colunas_lista = {'nome': "Atleta", 'clube': "Clube", 'tipo_lesao': "Tipo de Lesão",
+                             'protocolo': "Protocolo", 'dias_desde_cirurgia': "Dias", 'pontuacao': "Pontuação", 'alta_prevista': "Alta Prevista"}
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**Em Risco**")
+                st.dataframe(em_risco(elenco)[list(colunas_lista)].rename(columns=colunas_lista),
+                             hide_index=True, use_container_width=True)
+            with col2:
+                st.write(f"**Próximos do Retorno ({regras_risco.dias_retorno_proximo} dias)**")
+                st.dataframe(proximos_retorno(elenco, regras_risco)[list(colunas_lista)].rename(columns=colunas_lista),
+                             hide_index=True, use_container_width=True)
+            st.caption(f"Atletas entre a cirurgia e a alta prevista · {LIMITE_LISTA_RISCO} por lista")
 
     except Exception as e:
         st.error(f"Erro ao inicializar o sistema: {str(e)}")
-        st.stop() 
\ No newline at end of file
+        st.stop()
+    finally:
+        recursos.close()
+        banco.liberar_cursor(conn)
+        registro = finalizar_rastro(rastro)
+        if PERFIL_ATIVO and registro:
+            painel_desenvolvedor(banco, registro)
@@ -1,53 +1,178 @@
+-- SAGRA - Esquema do banco de dados (versão 6)
+-- Bancos novos são criados a partir deste arquivo; bancos existentes são
+-- atualizados pelas migrações de migracoes.py. Ao alterar o esquema, crie uma
+-- nova migração e atualize este arquivo e migracoes.VERSAO_ESQUEMA juntos.
+
+-- Sequências para os IDs
+CREATE SEQUENCE seq_pacientes START 1;
+CREATE SEQUENCE seq_lesoes START 1;
+CREATE SEQUENCE seq_fases START 1;
+CREATE SEQUENCE seq_progresso START 1;
+CREATE SEQUENCE seq_tipos_lesao START 1;
+CREATE SEQUENCE seq_itens_protocolo START 1;
+CREATE SEQUENCE seq_protocolos START 1;
+
+-- Tipos enumerados dos itens do protocolo
+CREATE TYPE status_item AS ENUM ('Completo', 'Progressão', 'Restrição');
+CREATE TYPE campo_protocolo AS ENUM (
+    'atividades_liberadas', 'testes_especificos', 'tratamentos',
+    'preparacao_fisica', 'tecnicas_rugby'
+);
+
+-- Controle de versão do esquema
+CREATE TABLE schema_versao (
+    versao INTEGER PRIMARY KEY,
+    aplicada_em TIMESTAMP DEFAULT current_timestamp
+);
+
 -- Tabela de Pacientes (Atletas)
 CREATE TABLE pacientes (
-    id INTEGER PRIMARY KEY,
-    nome VARCHAR NOT NULL UNIQUE,
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_pacientes'),
+    nome VARCHAR UNIQUE NOT NULL,
     data_nascimento DATE,
     posicao VARCHAR,
     clube VARCHAR,
     data_cirurgia DATE
 );
 
+-- Tabela de Tipos de Lesão
+CREATE TABLE tipos_lesao (
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_tipos_lesao'),
+    nome VARCHAR UNIQUE NOT NULL
+);
+
 -- Tabela de Lesões
 CREATE TABLE lesoes (
-    id INTEGER PRIMARY KEY,
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_lesoes'),
     paciente_id INTEGER NOT NULL,
-    tipo_lesao VARCHAR NOT NULL,
+    tipo_lesao_id INTEGER NOT NULL,
     data_lesao DATE,
     data_cirurgia DATE,
     observacoes TEXT,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+    FOREIGN KEY (tipo_lesao_id) REFERENCES tipos_lesao(id)
+);
+
+-- Protocolos de reabilitação por tipo de lesão e tratamento (ver protocolo.RegistroProtocolos).
+-- tipo_lesao_id NULL: protocolo padrão, usado pelos tipos sem protocolo próprio (o de ID 1);
+-- cirurgico NULL: vale para lesões com e sem cirurgia
+CREATE TABLE protocolos (
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_protocolos'),
+    nome VARCHAR UNIQUE NOT NULL,
+    tipo_lesao_id INTEGER,
+    cirurgico BOOLEAN,
+    FOREIGN KEY (tipo_lesao_id) REFERENCES tipos_lesao(id),
+    UNIQUE(tipo_lesao_id, cirurgico)
 );
 
--- Tabela de Fases de Reabilitação
+-- Tabela de Fases de Reabilitação (fases de cada protocolo, em ordem de ID; sem chave
+-- estrangeira para protocolos porque a coluna é acrescentada por ALTER TABLE nas migrações)
 CREATE TABLE fases_reabilitacao (
-    id INTEGER PRIMARY KEY,
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_fases'),
     fase VARCHAR NOT NULL,
     periodo_aproximado VARCHAR NOT NULL,
     atividades_liberadas TEXT,
     testes_especificos TEXT,
     tratamentos TEXT,
     preparacao_fisica TEXT,
-    tecnicas_rugby TEXT
+    tecnicas_rugby TEXT,
+    protocolo_id INTEGER DEFAULT 1
+);
+
+-- Itens dos campos de texto das fases, já separados (ver protocolo.reconstruir_itens_protocolo)
+CREATE TABLE itens_protocolo (
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_itens_protocolo'),
+    fase_id INTEGER NOT NULL,
+    campo campo_protocolo NOT NULL,
+    ordem INTEGER NOT NULL,
+    item VARCHAR NOT NULL,
+    status status_item,
+    nivel INTEGER,
+    FOREIGN KEY (fase_id) REFERENCES fases_reabilitacao(id),
+    UNIQUE(fase_id, campo, ordem)
 );
 
 -- Tabela de Progresso
 CREATE TABLE progresso (
-    id INTEGER PRIMARY KEY,
+    id INTEGER PRIMARY KEY DEFAULT nextval('seq_progresso'),
     paciente_id INTEGER NOT NULL,
-    fase VARCHAR NOT NULL,
+    fase_id INTEGER NOT NULL,
     data_inicio DATE NOT NULL,
     data_fim DATE,
     status VARCHAR DEFAULT 'Em andamento',
     FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-    UNIQUE(paciente_id, fase, data_inicio)
+    FOREIGN KEY (fase_id) REFERENCES fases_reabilitacao(id),
+    UNIQUE(paciente_id, fase_id, data_inicio)
 );
 
+-- Métricas do Dashboard mantidas pelas operações de escrita (ver resumo.py)
+CREATE TABLE resumo_dashboard (
+    metrica VARCHAR PRIMARY KEY,
+    valor BIGINT NOT NULL,
+    atualizado_em TIMESTAMP DEFAULT current_timestamp
+);
+
+-- Registro diário das sessões de reabilitação, somente inserção (ver sessoes.py).
+-- Sem chave primária, índices nem chaves estrangeiras, para que os lotes não paguem
+-- manutenção de índice; cada lote entra ordenado por data, então os grupos de linhas
+-- ficam agrupados por período e as consultas por data descartam os demais pelas
+-- estatísticas de mínimo e máximo. Dor de 0 a 10; amplitude de movimento em graus.
+CREATE TABLE sessoes (
+    paciente_id INTEGER NOT NULL,
+    data DATE NOT NULL,
+    exercicio VARCHAR NOT NULL,
+    series SMALLINT,
+    repeticoes SMALLINT,
+    carga_kg DOUBLE,
+    dor TINYINT,
+    amplitude_graus DOUBLE,
+    registrado_em TIMESTAMP NOT NULL DEFAULT current_timestamp
+);
+
+-- Agregados semanais das sessões por atleta, somados a cada lote (dias: um bit por
+-- dia da semana com sessão, começando pela segunda-feira)
+CREATE TABLE sessoes_semanais (
+    paciente_id INTEGER NOT NULL,
+    semana DATE NOT NULL,
+    dias UTINYINT NOT NULL,
+    exercicios INTEGER NOT NULL,
+    volume_kg DOUBLE NOT NULL,
+    carga_maxima_kg DOUBLE,
+    dor_soma INTEGER NOT NULL,
+    dor_registros INTEGER NOT NULL,
+    dor_maxima TINYINT,
+    amplitude_maxima_graus DOUBLE,
+    PRIMARY KEY (paciente_id, semana)
+);
+
+-- Índices dos caminhos de consulta mais usados
+-- (pacientes não recebe índices secundários: no DuckDB, atualizar uma tabela
+--  indexada referenciada por chave estrangeira viola a restrição)
+CREATE INDEX idx_lesoes_paciente ON lesoes(paciente_id);
+CREATE INDEX idx_lesoes_tipo ON lesoes(tipo_lesao_id);
+CREATE INDEX idx_progresso_paciente ON progresso(paciente_id);
+CREATE INDEX idx_itens_protocolo_item ON itens_protocolo(item);
+
+-- Protocolo padrão (ajustado para reconstrução do LCA) e suas fases
+INSERT INTO protocolos (nome) VALUES ('Padrão');
+
 -- Inserir fases padrão de reabilitação
-INSERT INTO fases_reabilitacao (id, fase, periodo_aproximado, atividades_liberadas, testes_especificos, tratamentos, preparacao_fisica, tecnicas_rugby) VALUES
-(1, 'Fase 1', '1 a 14 dias', 'Mobilização passiva, Exercícios isométricos', 'Avaliação de edema, Avaliação de ADM', 'Crioterapia,Eletroterapia,Exercícios de mobilização passiva', 'Isometria de quadríceps (Progressão),Exercícios de ADM (Progressão)', 'Tackle:1,Passe:1,Scrum:1,Ruck:1,Treino em campo:1'),
-(2, 'Fase 2', '15 a 28 dias', 'Exercícios em CCA, Bicicleta estacionária', 'Teste de força muscular, Avaliação de marcha', 'Exercícios ativos,Treino de marcha,Fortalecimento', 'Leg Press (Progressão),Agachamento (Restrição),Bicicleta (Completo)', 'Tackle:1,Passe:2,Scrum:1,Ruck:1,Treino em campo:1'),
-(3, 'Fase 3', '29 a 90 dias', 'Exercícios em CCF, Corrida em linha reta', 'Teste de agilidade, Avaliação funcional', 'Exercícios pliométricos,Treino de corrida,Core', 'Agachamento (Progressão),Corrida (Progressão),Pliometria (Restrição)', 'Tackle:1,Passe:3,Scrum:2,Ruck:2,Treino em campo:2'),
-(4, 'Fase 4', '91 a 180 dias', 'Exercícios específicos do rugby, Treino com bola', 'Teste de salto, Y-Balance Test', 'Treino específico,Agilidade,Potência', 'Pliometria (Progressão),Agilidade (Progressão),Potência (Progressão)', 'Tackle:2,Passe:3,Scrum:2,Ruck:2,Treino em campo:3'),
-(5, 'Fase 5', '181 a 240 dias', 'Retorno gradual ao treino com equipe', 'Testes específicos do rugby', 'Treino com equipe,Contato gradual,Jogo simulado', 'Treino completo (Progressão),Contato (Progressão)', 'Tackle:2,Passe:3,Scrum:3,Ruck:3,Treino em campo:3'),
-(6, 'Alta', 'após 240 dias', 'Retorno completo às atividades', '-', 'Manutenção,Prevenção', 'Treino completo (Completo)', 'Tackle:3,Passe:3,Scrum:3,Ruck:3,Treino em campo:3'); 
\ No newline at end of file
+INSERT INTO fases_reabilitacao (fase, periodo_aproximado, atividades_liberadas, testes_especificos, tratamentos, preparacao_fisica, tecnicas_rugby) VALUES
+('Fase 1', '1 a 14 dias', 'Mobilização passiva, Exercícios isométricos', 'Avaliação de edema, Avaliação de ADM', 'Crioterapia,Eletroterapia,Exercícios de mobilização passiva', 'Isometria de quadríceps (Progressão),Exercícios de ADM (Progressão)', 'Tackle:1,Passe:1,Scrum:1,Ruck:1,Treino em campo:1'),
+('Fase 2', '15 a 28 dias', 'Exercícios em CCA, Bicicleta estacionária', 'Teste de força muscular, Avaliação de marcha', 'Exercícios ativos,Treino de marcha,Fortalecimento', 'Leg Press (Progressão),Agachamento (Restrição),Bicicleta (Completo)', 'Tackle:1,Passe:2,Scrum:1,Ruck:1,Treino em campo:1'),
+('Fase 3', '29 a 90 dias', 'Exercícios em CCF, Corrida em linha reta', 'Teste de agilidade, Avaliação funcional', 'Exercícios pliométricos,Treino de corrida,Core', 'Agachamento (Progressão),Corrida (Progressão),Pliometria (Restrição)', 'Tackle:1,Passe:3,Scrum:2,Ruck:2,Treino em campo:2'),
+('Fase 4', '91 a 180 dias', 'Exercícios específicos do rugby, Treino com bola', 'Teste de salto, Y-Balance Test', 'Treino específico,Agilidade,Potência', 'Pliometria (Progressão),Agilidade (Progressão),Potência (Progressão)', 'Tackle:2,Passe:3,Scrum:2,Ruck:2,Treino em campo:3'),
+('Fase 5', '181 a 240 dias', 'Retorno gradual ao treino com equipe', 'Testes específicos do rugby', 'Treino com equipe,Contato gradual,Jogo simulado', 'Treino completo (Progressão),Contato (Progressão)', 'Tackle:2,Passe:3,Scrum:3,Ruck:3,Treino em campo:3'),
+('Alta', 'após 240 dias', 'Retorno completo às atividades', '-', 'Manutenção,Prevenção', 'Treino completo (Completo)', 'Tackle:3,Passe:3,Scrum:3,Ruck:3,Treino em campo:3');
+
+-- Inserir tipos de lesão padrão
+INSERT INTO tipos_lesao (nome) VALUES
+('LCA'), ('LCP'), ('Menisco'), ('Ligamento Colateral'), ('Tendinite Patelar'),
+('Luxação de Ombro'), ('Ruptura de Manguito Rotador'), ('Lesão de Labrum'),
+('Fratura de Clavícula'), ('Entorse de Tornozelo');
+
+-- Resumo do banco vazio (sem atletas nem lesões)
+INSERT INTO resumo_dashboard (metrica, valor) VALUES
+('total_atletas', 0), ('atletas_em_tratamento', 0), ('tipos_lesao_registrados', 0);
+
+INSERT INTO schema_versao (versao) VALUES (6);
@@ -0,0 +1,338 @@
+# SAGRA - Sessões de reabilitação
+# Descrição: Registro diário das sessões de cada atleta (exercício, séries,
+#            repetições, carga, dor e amplitude de movimento). A tabela sessoes
+#            só recebe inserções, em lotes: cada lote é validado em SQL, entra com
+#            um único INSERT ... SELECT ordenado por data (os grupos de linhas do
+#            DuckDB ficam agrupados por período) e soma seus agregados semanais em
+#            sessoes_semanais na mesma transação. As curvas de evolução do
+#            relatório leem apenas os agregados semanais do atleta, pela chave
+#            primária, sem varrer o registro completo.
+#
+# Uso: python sessoes.py importar sessoes.csv --banco SAGRA.db
+#      python sessoes.py reconstruir --banco SAGRA.db
+#
+# Colunas do arquivo (a primeira linha do CSV é o cabeçalho; datas em AAAA-MM-DD ou DD/MM/AAAA):
+#   atleta (nome do atleta), data, exercicio, series, repeticoes, carga_kg, dor, amplitude_graus
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from cadastro import contador_escritas
+from escritor import executar_escrita
+from risco import invalidar_risco
+
+# Colunas de cada sessão, na ordem da tabela
+COLUNAS_SESSAO = ['paciente_id', 'data', 'exercicio', 'series', 'repeticoes', 'carga_kg', 'dor', 'amplitude_graus']
+
+# Tipos das colunas numéricas de uma sessão
+TIPOS_NUMERICOS = {
+    'series': 'SMALLINT',
+    'repeticoes': 'SMALLINT',
+    'carga_kg': 'DOUBLE',
+    'dor': 'TINYINT',
+    'amplitude_graus': 'DOUBLE',
+}
+
+# Colunas do arquivo de importação; as obrigatórias vêm primeiro
+COLUNAS_ARQUIVO = ['atleta', 'data', 'exercicio'] + list(TIPOS_NUMERICOS)
+
+# Escala de dor (EVA) e maior amplitude de movimento aceita (em graus)
+DOR_MAXIMA = 10
+AMPLITUDE_MAXIMA_GRAUS = 360
+
+# Número de semanas exibidas nas curvas de evolução
+SEMANAS_CURVA = 26
+
+# Dias de sessões recentes exibidos no relatório do atleta
+DIAS_RECENTES = 28
+
+# Motivo de recusa de cada linha do lote (_lote tem as colunas tipadas e 'invalido',
+# preenchido na leitura de arquivos quando um valor não pôde ser convertido)
+_VALIDACAO = f"""
+    CREATE OR REPLACE TEMP TABLE _validado AS
+    SELECT
+        l.*,
+        CASE
+            WHEN l.invalido IS NOT NULL THEN l.invalido
+            WHEN l.data IS NULL THEN 'data vazia'
+            WHEN l.exercicio IS NULL THEN 'exercicio vazio'
+            WHEN p.id IS NULL THEN 'atleta não encontrado'
+            WHEN l.dor NOT BETWEEN 0 AND {DOR_MAXIMA} THEN 'dor fora da escala de 0 a {DOR_MAXIMA}'
+            WHEN l.series < 0 OR l.repeticoes < 0 OR l.carga_kg < 0 THEN 'séries, repetições ou carga negativas'
+            WHEN l.amplitude_graus NOT BETWEEN 0 AND {AMPLITUDE_MAXIMA_GRAUS} THEN 'amplitude_graus inválida'
+        END AS motivo
+    FROM _lote l
+    LEFT JOIN pacientes p ON p.id = l.paciente_id
+"""
+
+# Ordenar por data mantém cada grupo de linhas com um intervalo de datas estreito,
+# o que permite ao DuckDB descartar grupos inteiros nas consultas por período
+_INSERCAO = f"""
+    INSERT INTO sessoes ({', '.join(COLUNAS_SESSAO)})
+    SELECT {', '.join(COLUNAS_SESSAO)}
+    FROM _validado
+    WHERE motivo IS NULL
+    ORDER BY data, paciente_id
+"""
+
+# Agregados semanais de um conjunto de sessões (semana começando na segunda-feira;
+# dias tem um bit por dia da semana com sessão)
+_AGREGADOS_SEMANAIS = """
+    SELECT
+        paciente_id,
+        date_trunc('week', data)::DATE AS semana,
+        bit_or((1 << (isodow(data) - 1))::UTINYINT) AS dias,
+        count(*) AS exercicios,
+        COALESCE(sum(series::DOUBLE * repeticoes * carga_kg), 0) AS volume_kg,
+        max(carga_kg) AS carga_maxima_kg,
+        COALESCE(sum(dor), 0) AS dor_soma,
+        count(dor) AS dor_registros,
+        max(dor) AS dor_maxima,
+        max(amplitude_graus) AS amplitude_maxima_graus
+    FROM {origem}
+    GROUP BY ALL
+"""
+
+# Soma os agregados do lote aos já gravados (greatest ignora NULL)
+_SOMA_SEMANAIS = f"""
+    INSERT INTO sessoes_semanais
+    {_AGREGADOS_SEMANAIS.format(origem='_validado WHERE motivo IS NULL')}
+    ON CONFLICT (paciente_id, semana) DO UPDATE SET
+        dias = dias | EXCLUDED.dias,
+        exercicios = exercicios + EXCLUDED.exercicios,
+        volume_kg = volume_kg + EXCLUDED.volume_kg,
+        carga_maxima_kg = greatest(carga_maxima_kg, EXCLUDED.carga_maxima_kg),
+        dor_soma = dor_soma + EXCLUDED.dor_soma,
+        dor_registros = dor_registros + EXCLUDED.dor_registros,
+        dor_maxima = greatest(dor_maxima, EXCLUDED.dor_maxima),
+        amplitude_maxima_graus = greatest(amplitude_maxima_graus, EXCLUDED.amplitude_maxima_graus)
+"""
+
+
+def _gravar_lote(conn):
+    """
+    Valida o lote em _lote, insere as sessões válidas e soma os agregados semanais na
+    transação em andamento
+    Returns:
+        tuple: Sessões gravadas e linhas recusadas (lista de tuplas com a linha e o motivo)
+    """
+    conn.execute(_VALIDACAO)
+    gravadas = conn.execute(_INSERCAO).fetchone()[0]
+    if gravadas:
+        conn.execute(_SOMA_SEMANAIS)
+    rejeitadas = conn.execute("""
+        SELECT linha, motivo FROM _validado WHERE motivo IS NOT NULL ORDER BY linha
+    """).fetchall()
+    conn.execute("DROP TABLE _validado")
+    conn.execute("DROP TABLE _lote")
+    return gravadas, rejeitadas
+
+
+def _registrar(conn, colunas):
+    """Carrega as listas de colunas em _lote e grava o lote (ver registrar_sessoes)"""
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _lote AS
+        SELECT
+            unnest(range(1, len($paciente_id) + 1)) AS linha,
+            unnest($paciente_id)::INTEGER AS paciente_id,
+            unnest($data)::DATE AS data,
+            NULLIF(trim(unnest($exercicio)::VARCHAR), '') AS exercicio,
+            {', '.join(f"unnest(${c})::{t} AS {c}" for c, t in TIPOS_NUMERICOS.items())},
+            NULL::VARCHAR AS invalido
+    """, colunas)
+    return _gravar_lote(conn)
+
+
+def registrar_sessoes(conn, sessoes):
+    """
+    Registra um lote de sessões em uma única transação
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        sessoes (list): Sessões (dicionários com as chaves de COLUNAS_SESSAO; só
+                        paciente_id, data e exercicio são obrigatórias)
+    Returns:
+        dict: 'recebidas' e 'gravadas' (int) e 'rejeitadas' (lista de tuplas com a
+              posição da sessão no lote, a partir de 1, e o motivo)
+    """
+    if not sessoes:
+        return {'recebidas': 0, 'gravadas': 0, 'rejeitadas': []}
+    colunas = {c: [sessao.get(c) for sessao in sessoes] for c in COLUNAS_SESSAO}
+    gravadas, rejeitadas = executar_escrita(conn, _registrar, colunas)
+    if gravadas:
+        contador_escritas.registrar(emitidas=1)
+        invalidar_risco('sessoes')
+    return {'recebidas': len(sessoes), 'gravadas': gravadas, 'rejeitadas': rejeitadas}
+
+
+def _importar(conn, caminho):
+    """Lê o arquivo em _lote, com os atletas resolvidos pelo nome, e grava o lote (ver importar_sessoes)"""
+    if caminho.lower().endswith(('.parquet', '.pq')):
+        leitura = "read_parquet($caminho)"
+    else:
+        leitura = "read_csv($caminho, header = true, all_varchar = true)"
+    presentes = {linha[0].lower(): linha[0] for linha in conn.execute(
+        f"DESCRIBE SELECT * FROM {leitura}", {'caminho': caminho}
+    ).fetchall()}
+    faltando = [c for c in COLUNAS_ARQUIVO[:3] if c not in presentes]
+    if faltando:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s) no arquivo: {', '.join(faltando)}")
+
+    # Colunas como texto sem espaços nas pontas ('' vira NULL); as ausentes ficam NULL
+    texto = ", ".join(
+        f"NULLIF(trim(CAST(\"{presentes[c]}\" AS VARCHAR)), '') AS {c}" if c in presentes else f"NULL::VARCHAR AS {c}"
+        for c in COLUNAS_ARQUIVO
+    )
+    data = "COALESCE(TRY_CAST(a.data AS DATE), try_strptime(a.data, '%d/%m/%Y')::DATE)"
+    invalido = " ".join(
+        f"WHEN a.{c} IS NOT NULL AND TRY_CAST(a.{c} AS {t}) IS NULL THEN '{c} inválido'"
+        for c, t in TIPOS_NUMERICOS.items()
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _lote AS
+        WITH a AS (SELECT row_number() OVER () AS linha, {texto} FROM {leitura})
+        SELECT
+            a.linha,
+            p.id AS paciente_id,
+            {data} AS data,
+            a.exercicio,
+            {', '.join(f"TRY_CAST(a.{c} AS {t}) AS {c}" for c, t in TIPOS_NUMERICOS.items())},
+            CASE
+                WHEN a.atleta IS NULL THEN 'atleta vazio'
+                WHEN a.data IS NOT NULL AND {data} IS NULL THEN 'data inválida'
+                {invalido}
+            END AS invalido
+        FROM a
+        LEFT JOIN pacientes p ON p.nome = a.atleta
+    """, {'caminho': caminho})
+    lidas = conn.execute("SELECT count(*) FROM _lote").fetchone()[0]
+    return lidas, *_gravar_lote(conn)
+
+
+def importar_sessoes(conn, caminho):
+    """
+    Importa sessões de um arquivo CSV ou Parquet em uma única transação
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+        caminho (str): Caminho do arquivo (.csv ou .parquet)
+    Returns:
+        dict: 'recebidas' e 'gravadas' (int) e 'rejeitadas' (lista de tuplas com a
+              posição da linha no arquivo, sem contar o cabeçalho, e o motivo)
+    """
+    lidas, gravadas, rejeitadas = executar_escrita(conn, _importar, os.path.abspath(caminho))
+    if gravadas:
+        contador_escritas.registrar(emitidas=1)
+        invalidar_risco('sessoes')
+    return {'recebidas': lidas, 'gravadas': gravadas, 'rejeitadas': rejeitadas}
+
+
+def curva_semanal(conn, paciente_id, semanas=SEMANAS_CURVA, hoje=None):
+    """
+    Evolução semanal das sessões de um atleta
+    Args:
+        conn: Conexão ou cursor DuckDB
+        paciente_id (int): ID do atleta
+        semanas (int): Número de semanas, terminando na semana atual
+        hoje (date): Data de referência (padrão: data atual)
+    Returns:
+        DataFrame: semana (date), dias_sessao, exercicios, volume_kg, carga_maxima_kg,
+                   dor_media, dor_maxima e amplitude_maxima_graus (semanas com sessão)
+    """
+    hoje = hoje or datetime.now().date()
+    return conn.execute("""
+        SELECT
+            semana,
+            bit_count(dias) AS dias_sessao,
+            exercicios,
+            volume_kg,
+            carga_maxima_kg,
+            CASE WHEN dor_registros > 0 THEN dor_soma / dor_registros END AS dor_media,
+            dor_maxima,
+            amplitude_maxima_graus
+        FROM sessoes_semanais
+        WHERE paciente_id = $paciente_id
+          AND semana > date_trunc('week', $hoje::DATE)::DATE - 7 * $semanas::INTEGER
+          AND semana <= $hoje::DATE
+        ORDER BY semana
+    """, {'paciente_id': paciente_id, 'semanas': semanas, 'hoje': hoje}).df()
+
+
+def sessoes_recentes(conn, paciente_id, dias=DIAS_RECENTES, hoje=None):
+    """
+    Sessões registradas de um atleta nos últimos dias
+    Args:
+        conn: Conexão ou cursor DuckDB
+        paciente_id (int): ID do atleta
+        dias (int): Número de dias, terminando em hoje
+        hoje (date): Data de referência (padrão: data atual)
+    Returns:
+        DataFrame: Colunas da sessão sem paciente_id, da mais recente para a mais antiga
+    """
+    hoje = hoje or datetime.now().date()
+    # O filtro por data descarta os grupos de linhas de outros períodos antes do filtro por atleta
+    return conn.execute(f"""
+        SELECT {', '.join(COLUNAS_SESSAO[1:])}
+        FROM sessoes
+        WHERE data BETWEEN $inicio AND $hoje
+          AND paciente_id = $paciente_id
+        ORDER BY data DESC, registrado_em DESC
+    """, {'paciente_id': paciente_id, 'inicio': hoje - timedelta(days=dias - 1), 'hoje': hoje}).df()
+
+
+def reconstruir_semanais(conn):
+    """
+    Recalcula todos os agregados semanais a partir do registro de sessões
+    Args:
+        conn: Conexão ou cursor DuckDB com permissão de escrita
+    Returns:
+        int: Número de semanas de atletas gravadas
+    """
+    def recalcular(conn):
+        conn.execute("DELETE FROM sessoes_semanais")
+        return conn.execute(
+            "INSERT INTO sessoes_semanais " + _AGREGADOS_SEMANAIS.format(origem='sessoes')
+        ).fetchone()[0]
+
+    semanas = executar_escrita(conn, recalcular)
+    invalidar_risco('sessoes')
+    return semanas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registro das sessões de reabilitação")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    importacao = subcomandos.add_parser('importar', help="Importa sessões de um arquivo CSV/Parquet")
+    importacao.add_argument('arquivo', help="Arquivo .csv ou .parquet")
+    importacao.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+
+    reconstrucao = subcomandos.add_parser('reconstruir', help="Recalcula os agregados semanais")
+    reconstrucao.add_argument('--banco', default='SAGRA.db', help="Arquivo do banco DuckDB")
+
+    args = parser.parse_args()
+
+    import duckdb
+
+    from migracoes import atualizar_esquema
+
+    conn = duckdb.connect(args.banco)
+    atualizar_esquema(conn)
+    inicio = time.perf_counter()
+    if args.comando == 'importar':
+        resultado = importar_sessoes(conn, args.arquivo)
+        print(f"{resultado['gravadas']} de {resultado['recebidas']} sessões gravadas "
+              f"em {time.perf_counter() - inicio:.2f}s")
+        rejeitadas = resultado['rejeitadas']
+        if rejeitadas:
+            print(f"{len(rejeitadas)} linhas recusadas:")
+            for linha, motivo in rejeitadas[:20]:
+                print(f"  linha {linha}: {motivo}")
+    else:
+        semanas = reconstruir_semanais(conn)
+        print(f"{semanas} semanas de atletas recalculadas em {time.perf_counter() - inicio:.2f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()